@@ -12,18 +12,34 @@ import time
 import traceback
 import http.cookiejar
 import importlib
+import importlib.util
 import os
 import platform
 import argparse
 import threading
 import shutil
 import json
+import atexit
+import queue
+import random
+import sqlite3
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
 from shutil import which
 from dataclasses import dataclass
 from typing import List
 
+# --- Профилирование запуска (--profile-startup / --profile-startup-json PATH) ---
+# Фазы запуска замеряются всегда (это дёшево), а отчёт выводится только при наличии ключа.
+_STARTUP_T0 = time.perf_counter()
+_STARTUP_PHASES = []  # [(название фазы, секунды)]
+
+def record_startup_phase(name: str, started: float):
+    """Добавляет фазу запуска, начавшуюся в момент started (time.perf_counter())."""
+    _STARTUP_PHASES.append((name, time.perf_counter() - started))
+
 system = platform.system().lower()
 
 if system == "windows":
@@ -38,6 +54,15 @@ CHECK_VER = 1  # Проверять версии зависимостей (1) и
 DEBUG = 1  # Включение/выключение отладки
 DEBUG_APPEND = 1 # 0 = перезаписывать лог, 1 = дописывать к существующему
 DEBUG_FILE = 'debug.log' # Имя файла журнала отладки
+DEBUG_FLUSH_INTERVAL = 1.0  # Как часто (сек) фоновый писатель сбрасывает журнал отладки на диск
+DEBUG_MAX_BYTES = 50 * 1024 * 1024  # Размер журнала, после которого он ротируется (debug.log -> debug.log.1); 0 = без ротации
+DEBUG_BACKUP_COUNT = 3  # Сколько старых журналов (debug.log.1 … .N) хранить при ротации
+# Минимальный уровень записи для каждого источника: debug / info / warning / error / off
+#   vdl      — сообщения самого скрипта
+#   ytdlp    — внутренние сообщения yt-dlp (debug — включает verbose-режим yt-dlp)
+#   progress — строки прогресса загрузки yt-dlp ([download] 12.3% ...)
+DEBUG_LEVELS = {'vdl': 'debug', 'ytdlp': 'debug', 'progress': 'info'}
+DEBUG_PROGRESS_SAMPLE_SEC = 5.0  # Строки прогресса пишутся в журнал не чаще одной за столько секунд; 0 = все
 InitialDir = "Video"  # Папка для автоматического выбора сохранения
 
 # --- Настройки вывода плейлистов ---
@@ -54,6 +79,40 @@ COOKIES_GOOGLE = "cookies_google.txt" # Google
 COOKIES_TG = 'cookies_tg.txt'       # Telegram
 
 MAX_RETRIES = 15  # Максимум попыток повторной загрузки при обрывах
+# Паузы между повторами растут экспоненциально (база * 2^(n-1), со случайным разбросом), но не больше RETRY_MAX_DELAY;
+# заголовок Retry-After сервера соблюдается (до RETRY_AFTER_MAX секунд). Для каждого класса ошибки — свой запас попыток.
+RETRY_BASE_DELAYS = {'transport': 1.0, 'throttle': 15.0, 'auth': 1.0, 'fragment': 0.5, 'other': 2.0}  # Первая пауза (сек) по классам ошибок
+RETRY_BUDGETS = {'transport': MAX_RETRIES, 'throttle': 5, 'auth': 1, 'fragment': MAX_RETRIES, 'other': 3}  # Сколько повторов допускается для класса
+RETRY_MAX_DELAY = 60.0  # Предельная пауза между повторами (сек)
+RETRY_AFTER_MAX = 600   # Дольше этого (сек) Retry-After не ждём
+
+# --- Служебные кэши (хранятся рядом со скриптом) ---
+CACHE_DIR = Path(__file__).resolve().parent / ".vdl_cache"  # Папка для кэш-файлов
+VERSION_CACHE_FILE = CACHE_DIR / "versions.json"  # Последние версии пакетов с PyPI
+VERSION_CHECK_TTL = 24 * 3600  # Как часто (сек) сверять версии зависимостей с PyPI
+PO_TOKEN_CACHE = True  # Сохранять найденный PO token на диск и переиспользовать в следующих запусках
+PO_TOKEN_CACHE_FILE = CACHE_DIR / "po_token.json"  # Токен, время получения и провайдер (файл доступен только владельцу)
+PO_TOKEN_REVALIDATE_AGE = 6 * 3600  # Через сколько секунд кэшированный токен перепроверяется через validate_po_token
+METADATA_CACHE = True  # Кэшировать результаты get_video_info на диске (повторный запуск по тому же каналу не извлекает всё заново)
+METADATA_CACHE_DIR = CACHE_DIR / "info"  # Папка кэша метаданных (по файлу .json.gz на запрос)
+METADATA_TTL_LISTING = 6 * 3600  # Срок жизни (сек) списков плейлистов/каналов
+METADATA_TTL_VIDEO = 30 * 60  # Срок жизни (сек) полной информации о видео — ссылки на потоки быстро протухают
+METADATA_CACHE_MAX_MB = 200  # Предельный размер кэша метаданных; при превышении удаляются давно не использованные записи
+COOKIE_CHECK_TTL = 6 * 3600  # Сколько секунд считать неизменный куки-файл валидным без повторной проверки через yt-dlp (0 = проверять всегда)
+COOKIE_CHECK_CACHE_FILE = CACHE_DIR / "cookie_checks.json"  # Результаты успешных проверок куки-файлов
+BROWSER_COOKIE_CACHE_TTL = 0  # Сколько секунд хранить куки, извлечённые из браузера, в .vdl_cache между запусками (0 = только в пределах запуска)
+BROWSER_COOKIE_MEMORY_TTL = 5 * 60  # Сколько секунд прочитанные из браузера куки используются повторно без нового чтения браузера
+ARCHIVE_FILE = Path(__file__).resolve().parent / "vdl_archive.sqlite3"  # База скачанных видео (платформа + id) для режима --sync
+SYNC_MODE = False  # True (ключ --sync) — видео из архива пропускаются ещё до запроса информации о них
+INFO_PREFETCH_AHEAD = 3  # Для скольких следующих задач заранее (в фоне) получать информацию о видео, пока качается текущее (0 = выкл.)
+INFO_PREFETCH_WORKERS = {'default': 2, 'youtube': 2, 'facebook': 1}  # Сколько одновременных фоновых запросов информации допускается для платформы (0 = не делать предзагрузку)
+PLAYLIST_FETCH_WORKERS = 4  # Сколько вложенных плейлистов одного уровня запрашивается одновременно при обходе канала
+PLAYLIST_FETCH_MAX = 8  # Общий предел одновременных запросов плейлистов при обходе (на все уровни вместе)
+YDL_POOL_MAX_IDLE = 6  # Сколько готовых экземпляров YoutubeDL держать для повторного использования (0 = не переиспользовать)
+FFMPEG_CACHE_FILE = CACHE_DIR / "ffmpeg.json"  # Найденный ffmpeg/ffprobe, его версия и поддерживаемые muxer'ы/протоколы
+BGUTIL_DISCOVERY_CACHE_FILE = CACHE_DIR / "bgutil_module.json"  # Под каким именем импортируется провайдер bgutil (или что он не найден)
+BGUTIL_HTTP_CACHE_FILE = CACHE_DIR / "bgutil_http.json"  # Какой путь HTTP-провайдера PO token ответил в прошлый раз
+PO_TOKEN_RACE = True  # Запускать способы получения PO token одновременно (первый найденный побеждает); False = по очереди
 
 # --- Настройки для работы с новыми YouTube SABR / PO-Token сценариями ---
 # PO token — служебный токен (пример: "web.gvs+XXX") используемый для получения
@@ -109,101 +168,304 @@ BGUTIL_DOCKER_PORT = _env_override("BGUTIL_DOCKER_PORT", BGUTIL_DOCKER_PORT, lam
 BGUTIL_PROVIDER_BASE_URL = _env_override("BGUTIL_PROVIDER_BASE_URL", BGUTIL_PROVIDER_BASE_URL, str)
 BGUTIL_CONTAINER_SCRIPT_PATH = _env_override("BGUTIL_CONTAINER_SCRIPT_PATH", BGUTIL_CONTAINER_SCRIPT_PATH, str)
 BGUTIL_NO_PROMPT = _env_override("BGUTIL_NO_PROMPT", BGUTIL_NO_PROMPT, lambda s: str(s).strip() == "1")
+VERSION_CHECK_TTL = _env_override("VDL_VERSION_CHECK_TTL", VERSION_CHECK_TTL, lambda s: int(s))
+# VDL_DEBUG_LEVELS="ytdlp=warning,progress=off" — переопределяет только перечисленные источники
+DEBUG_LEVELS = _env_override("VDL_DEBUG_LEVELS", DEBUG_LEVELS,
+                             lambda s: {**DEBUG_LEVELS, **{k.strip(): v.strip().lower() for k, v in
+                                                           (part.split('=', 1) for part in s.split(',') if '=' in part)}})
+DEBUG_PROGRESS_SAMPLE_SEC = _env_override("VDL_DEBUG_PROGRESS_SAMPLE_SEC", DEBUG_PROGRESS_SAMPLE_SEC, lambda s: float(s))
+DEBUG_MAX_BYTES = _env_override("VDL_DEBUG_MAX_BYTES", DEBUG_MAX_BYTES, lambda s: int(s))
+METADATA_CACHE = _env_override("VDL_METADATA_CACHE", METADATA_CACHE,
+                               lambda s: str(s).strip().lower() in ("1", "true", "yes"))
+METADATA_TTL_LISTING = _env_override("VDL_METADATA_TTL_LISTING", METADATA_TTL_LISTING, lambda s: int(s))
+METADATA_TTL_VIDEO = _env_override("VDL_METADATA_TTL_VIDEO", METADATA_TTL_VIDEO, lambda s: int(s))
+METADATA_CACHE_MAX_MB = _env_override("VDL_METADATA_CACHE_MAX_MB", METADATA_CACHE_MAX_MB, lambda s: int(s))
+PO_TOKEN_CACHE = _env_override("VDL_PO_TOKEN_CACHE", PO_TOKEN_CACHE,
+                               lambda s: str(s).strip().lower() in ("1", "true", "yes"))
+PO_TOKEN_REVALIDATE_AGE = _env_override("VDL_PO_TOKEN_REVALIDATE_AGE", PO_TOKEN_REVALIDATE_AGE, lambda s: int(s))
+PO_TOKEN_RACE = _env_override("VDL_PO_TOKEN_RACE", PO_TOKEN_RACE,
+                              lambda s: str(s).strip().lower() in ("1", "true", "yes"))
+COOKIE_CHECK_TTL = _env_override("VDL_COOKIE_CHECK_TTL", COOKIE_CHECK_TTL, lambda s: int(s))
+BROWSER_COOKIE_CACHE_TTL = _env_override("VDL_BROWSER_COOKIE_CACHE_TTL", BROWSER_COOKIE_CACHE_TTL, lambda s: int(s))
+BROWSER_COOKIE_MEMORY_TTL = _env_override("VDL_BROWSER_COOKIE_MEMORY_TTL", BROWSER_COOKIE_MEMORY_TTL, lambda s: int(s))
+# VDL_RETRY_BUDGETS="throttle=3,transport=8" — переопределяет запас повторов только для перечисленных классов
+RETRY_BUDGETS = _env_override("VDL_RETRY_BUDGETS", RETRY_BUDGETS,
+                              lambda s: {**RETRY_BUDGETS, **{k.strip(): int(v) for k, v in
+                                                             (part.split('=', 1) for part in s.split(',') if '=' in part)}})
+RETRY_MAX_DELAY = _env_override("VDL_RETRY_MAX_DELAY", RETRY_MAX_DELAY, lambda s: float(s))
+ARCHIVE_FILE = _env_override("VDL_ARCHIVE_FILE", ARCHIVE_FILE, lambda s: Path(s))
+INFO_PREFETCH_AHEAD = _env_override("VDL_INFO_PREFETCH_AHEAD", INFO_PREFETCH_AHEAD, lambda s: int(s))
+# VDL_INFO_PREFETCH_WORKERS="youtube=3,vk=1" — переопределяет только перечисленные платформы
+INFO_PREFETCH_WORKERS = _env_override("VDL_INFO_PREFETCH_WORKERS", INFO_PREFETCH_WORKERS,
+                                      lambda s: {**INFO_PREFETCH_WORKERS, **{k.strip(): int(v) for k, v in
+                                                                             (part.split('=', 1) for part in s.split(',') if '=' in part)}})
+PLAYLIST_FETCH_WORKERS = _env_override("VDL_PLAYLIST_FETCH_WORKERS", PLAYLIST_FETCH_WORKERS, lambda s: int(s))
+PLAYLIST_FETCH_MAX = _env_override("VDL_PLAYLIST_FETCH_MAX", PLAYLIST_FETCH_MAX, lambda s: int(s))
+YDL_POOL_MAX_IDLE = _env_override("VDL_YDL_POOL_MAX_IDLE", YDL_POOL_MAX_IDLE, lambda s: int(s))
+
+# --- Простые JSON-кэши на диске ---
+_JSON_CACHE_LOCK = threading.Lock()
+
+def _load_json_cache(path) -> dict:
+    """Читает JSON-кэш; при отсутствии или повреждении файла возвращает пустой dict."""
+    try:
+        with _JSON_CACHE_LOCK, open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
 
-## --- Универсальный импорт и автообновление внешних модулей ---
-## Используется для автоматической установки и обновления зависимостей
-def import_or_update(module_name, pypi_name=None, min_version=None, force_check=False):
+def _save_json_cache(path, data: dict, private: bool = False) -> bool:
     """
-    Импортирует модуль, при необходимости устанавливает или обновляет его через pip.
-    Улучшения: локальное разрешение requests, защита pip-вызовов.
+    Атомарно записывает JSON-кэш (через временный файл и os.replace).
+    private=True — файл создаётся с правами 0600 (для секретов вроде PO token).
     """
-    pypi_name = pypi_name or module_name
+    try:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with _JSON_CACHE_LOCK:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600 if private else 0o666)
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, path)
+        return True
+    except Exception as e:
+        log_debug(f"_save_json_cache: не удалось записать {path}: {e}")
+        return False
 
-    # Если не требуется проверка версии — просто импортируем модуль
-    if not CHECK_VER and not force_check:
+def _site_packages_fingerprint() -> str:
+    """
+    Отпечаток установленных пакетов: интерпретатор + mtime каталогов site-packages.
+    Меняется при любой установке/удалении пакета pip'ом — по нему сбрасываются кэши, зависящие от окружения.
+    """
+    import site
+    dirs = []
+    try:
+        dirs += site.getsitepackages()
+    except Exception:
+        pass
+    try:
+        dirs.append(site.getusersitepackages())
+    except Exception:
+        pass
+    parts = [sys.executable]
+    for d in dict.fromkeys(dirs):
         try:
-            return importlib.import_module(module_name)
-        except ImportError:
-            log_debug(f"import_or_update: ImportError: {module_name} ({pypi_name}) не найден")
-            print(f"\n[!] Необходимый модуль {pypi_name} не установлен. Установите его вручную командой:\n    pip install {pypi_name}\nРабота невозможна.")
-            sys.exit(1)
+            parts.append(f"{d}:{os.stat(d).st_mtime_ns}")
+        except OSError:
+            continue
+    return "|".join(parts)
 
-    print(f"Проверяю наличие и актуальность модуля {pypi_name}", end='', flush=True)
+def _fetch_latest_pypi_version(pypi_name: str) -> str | None:
+    """Запрашивает у PyPI номер последней версии пакета (сначала requests, затем urllib)."""
+    latest = None
     try:
-        module = importlib.import_module(module_name)
-        # Попытка получить информацию о последней версии — локально резолвим requests
-        latest = None
+        _requests = importlib.import_module('requests')
+    except Exception:
+        _requests = None
+
+    if _requests is not None:
         try:
-            _requests = importlib.import_module('requests')
-        except Exception:
-            _requests = None
+            resp = _requests.get(f"https://pypi.org/pypi/{pypi_name}/json", timeout=5)
+            if resp.ok:
+                latest = resp.json().get('info', {}).get('version')
+        except Exception as _req_err:
+            log_debug(f"_fetch_latest_pypi_version: requests->PyPI failed: {_req_err}")
 
-        if _requests is not None:
-            try:
-                resp = _requests.get(f"https://pypi.org/pypi/{pypi_name}/json", timeout=5)
-                if resp.ok:
-                    latest = resp.json().get('info', {}).get('version')
-            except Exception as _req_err:
-                log_debug(f"import_or_update: requests->PyPI failed: {_req_err}")
+    if not latest:
+        try:
+            import urllib.request
+            with urllib.request.urlopen(f"https://pypi.org/pypi/{pypi_name}/json", timeout=5) as u:
+                info_json = json.load(u)
+                latest = info_json.get('info', {}).get('version')
+        except Exception as _url_err:
+            log_debug(f"_fetch_latest_pypi_version: urllib->PyPI failed: {_url_err}")
+    return latest
+
+def _prefetch_latest_versions(pypi_names) -> dict:
+    """
+    Возвращает {pypi_name: последняя версия} с учётом кэша VERSION_CACHE_FILE.
+    Пока запись моложе VERSION_CHECK_TTL — к PyPI не обращаемся вовсе.
+    Устаревшие записи запрашиваются параллельно, поэтому время проверки определяется
+    самым медленным ответом, а не суммой всех.
+    Неудачная проверка тоже фиксируется, чтобы без сети не ждать таймаутов на каждом старте.
+    """
+    names = list(dict.fromkeys(pypi_names))
+    cache = _load_json_cache(VERSION_CACHE_FILE)
+    now = time.time()
+    result = {}
+    stale = []
+    for name in names:
+        entry = cache.get(name) or {}
+        try:
+            age = now - float(entry.get('checked', 0))
+        except (TypeError, ValueError):
+            age = None
+        if age is not None and 0 <= age < VERSION_CHECK_TTL:
+            log_debug(f"_prefetch_latest_versions: версия {name} из кэша ({entry.get('latest')}, возраст {int(age)} с)")
+            result[name] = entry.get('latest')
+        else:
+            stale.append(name)
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(8, len(stale))) as pool:
+            fetched = dict(zip(stale, pool.map(_fetch_latest_pypi_version, stale)))
+        for name, latest in fetched.items():
+            prev = (cache.get(name) or {}).get('latest')
+            cache[name] = {'latest': latest or prev, 'checked': now}
+            result[name] = latest
+        _save_json_cache(VERSION_CACHE_FILE, cache)
+    return result
+
+class _LazyModule:
+    """
+    Прокси модуля, который импортируется при первом обращении к атрибуту.
+    Используется для тяжёлых необязательных зависимостей (tkinter, browser_cookie3, psutil, ffmpeg-python),
+    чтобы обычный запуск не тратил время на их импорт.
+    """
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    t0 = time.perf_counter()
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+                    log_debug(f"Отложенный импорт {self.__dict__['_name']}: {time.perf_counter() - t0:.3f} с")
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "загружен" if self.loaded else "не загружен"
+        return f"<отложенный модуль {self.__dict__['_name']} ({state})>"
+
+def _module_available(module_name: str) -> bool:
+    """Проверяет, что модуль установлен, не импортируя его."""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+# Модули, которые должны импортироваться только по требованию; если они оказались в sys.modules сразу
+# после запуска — значит, кто-то снова импортирует их на верхнем уровне (см. _check_lazy_imports)
+LAZY_IMPORT_MODULES = ('tkinter', 'browser_cookie3', 'psutil', 'ffmpeg')
 
+## --- Универсальный импорт и автообновление внешних модулей ---
+## Используется для автоматической установки и обновления зависимостей
+def import_dependencies(specs):
+    """
+    Стартовая проверка сразу всех зависимостей.
+    specs — список кортежей (module_name, pypi_name, force_check[, lazy]); force_check=True — проверять версию
+    даже при выключенном CHECK_VER.
+    lazy=True — модуль не импортируется при старте: проверяется только его наличие (find_spec)
+    и версия (по метаданным пакета), а вместо модуля возвращается _LazyModule.
+    Сначала параллельно узнаём последние версии на PyPI (с учётом кэша), затем
+    одним вызовом pip ставим недостающие и одним — обновляем устаревшие пакеты.
+    Возвращает dict {module_name: module}.
+    """
+    modules = {}
+    missing = []   # (module_name, pypi_name)
+    outdated = []  # (module_name, pypi_name, installed, latest)
+    lazy_names = {spec[0] for spec in specs if len(spec) > 3 and spec[3]}
+
+    checked = [spec[1] for spec in specs if CHECK_VER or spec[2]]
+    print(f"Проверяю наличие и актуальность модулей: {', '.join(spec[1] for spec in specs)}", end='', flush=True)
+    t_phase = time.perf_counter()
+    latest_map = _prefetch_latest_versions(checked) if checked else {}
+    record_startup_phase("зависимости: версии с PyPI", t_phase)
+
+    for module_name, pypi_name, force_check, *_ in specs:
+        t_phase = time.perf_counter()
+        try:
+            if module_name in lazy_names:
+                if not _module_available(module_name):
+                    raise ImportError(module_name)
+                modules[module_name] = _LazyModule(module_name)
+            else:
+                modules[module_name] = importlib.import_module(module_name)
+                record_startup_phase(f"зависимости: import {module_name}", t_phase)
+        except ImportError:
+            if not CHECK_VER and not force_check:
+                log_debug(f"import_dependencies: ImportError: {module_name} ({pypi_name}) не найден")
+                print(f"\n[!] Необходимый модуль {pypi_name} не установлен. Установите его вручную командой:\n    pip install {pypi_name}\nРабота невозможна.")
+                sys.exit(1)
+            missing.append((module_name, pypi_name))
+            continue
+        latest = latest_map.get(pypi_name)
         if not latest:
+            continue
+        try:
             try:
-                import urllib.request, json
-                with urllib.request.urlopen(f"https://pypi.org/pypi/{pypi_name}/json", timeout=5) as u:
-                    info_json = json.load(u)
-                    latest = info_json.get('info', {}).get('version')
-            except Exception as _url_err:
-                log_debug(f"import_or_update: urllib->PyPI failed: {_url_err}")
-
-        if latest:
-            try:
-                installed = None
-                try:
-                    installed = get_version(pypi_name)
-                except Exception:
-                    installed = getattr(module, '__version__', None)
-                if installed and parse_version(installed) < parse_version(latest):
-                    print()
-                    print(f"[!] Доступна новая версия {pypi_name}: {installed} → {latest}. Обновляем...", end='', flush=True)
-                    log_debug(f"import_or_update: обновление {pypi_name}: {installed} → {latest}")
-                    try:
-                        subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", pypi_name])
-                        module = importlib.reload(module)
-                    except Exception as pip_e:
-                        log_debug(f"import_or_update: pip upgrade failed: {pip_e}")
-            except Exception as e:
-                log_debug(f"import_or_update: версия/обновление check failed: {e}")
-        print(" - OK")
-        # min_version check
-        if min_version:
-            try:
-                installed = None
+                installed = get_version(pypi_name)
+            except Exception:
+                installed = None if module_name in lazy_names else getattr(modules[module_name], '__version__', None)
+            if installed and parse_version(installed) < parse_version(latest):
+                outdated.append((module_name, pypi_name, installed, latest))
+        except Exception as e:
+            log_debug(f"import_dependencies: версия/обновление check failed для {pypi_name}: {e}")
+
+    if outdated:
+        print()
+        for _, pypi_name, installed, latest in outdated:
+            print(f"[!] Доступна новая версия {pypi_name}: {installed} → {latest}.")
+            log_debug(f"import_dependencies: обновление {pypi_name}: {installed} → {latest}")
+        print("Обновляем...", end='', flush=True)
+        t_phase = time.perf_counter()
+        try:
+            subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade"] + [p for _, p, _, _ in outdated])
+            for module_name, _, _, _ in outdated:
+                if isinstance(modules[module_name], _LazyModule):
+                    continue  # ещё не импортирован — при первом обращении загрузится новая версия
                 try:
-                    installed = get_version(pypi_name)
-                except Exception:
-                    installed = getattr(module, '__version__', None)
-                if installed and parse_version(installed) < parse_version(min_version):
-                    print()
-                    print(f"[!] Требуется версия {min_version} для {pypi_name}, обновляем...")
-                    log_debug(f"import_or_update: обновление до min_version {min_version}")
-                    try:
-                        subprocess.check_call([sys.executable, "-m", "pip", "install", f"{pypi_name}>={min_version}"])
-                        module = importlib.reload(module)
-                    except Exception as pip_e:
-                        log_debug(f"import_or_update: pip install >=min_version failed: {pip_e}")
-            except Exception as e:
-                log_debug(f"import_or_update: min_version check failed: {e}")
-        return module
-    except ImportError:
-        log_debug(f"import_or_update: {module_name} not installed, attempting pip install {pypi_name}")
-        print(f"[!] {pypi_name} не установлен. Устанавливаем...")
+                    modules[module_name] = importlib.reload(modules[module_name])
+                except Exception as e:
+                    log_debug(f"import_dependencies: reload {module_name} failed: {e}")
+        except Exception as pip_e:
+            log_debug(f"import_dependencies: pip upgrade failed: {pip_e}")
+        record_startup_phase("зависимости: pip install --upgrade", t_phase)
+
+    if missing:
+        print()
+        names = [p for _, p in missing]
+        log_debug(f"import_dependencies: не установлены {names}, attempting pip install")
+        print(f"[!] Не установлены: {', '.join(names)}. Устанавливаем...")
+        t_phase = time.perf_counter()
         try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", pypi_name])
-            return importlib.import_module(module_name)
+            subprocess.check_call([sys.executable, "-m", "pip", "install"] + names)
         except Exception as e:
-            log_debug(f"import_or_update: pip install failed: {e}")
-            print(f"[!] Не удалось автоматически установить {pypi_name}: {e}")
-            raise
+            log_debug(f"import_dependencies: pip install failed: {e}")
+        importlib.invalidate_caches()
+        record_startup_phase("зависимости: pip install", t_phase)
+        for module_name, pypi_name in missing:
+            try:
+                if module_name in lazy_names:
+                    if not _module_available(module_name):
+                        raise ImportError(f"{module_name} не найден после установки")
+                    modules[module_name] = _LazyModule(module_name)
+                else:
+                    modules[module_name] = importlib.import_module(module_name)
+            except Exception as e:
+                log_debug(f"import_dependencies: pip install failed: {e}")
+                print(f"[!] Не удалось автоматически установить {pypi_name}: {e}")
+                raise
+    print(" - OK")
+    return modules
 
 # --- Временный (сессионный) хардкод PO token ---
 def _find_po_token_in_text(text: str) -> str | None:
@@ -259,92 +521,125 @@ def _mask_po_token(tok: str | None, head: int = 6, tail: int = 6) -> str:
     # Общий случай
     return s[:head] + "..." + s[-tail:]
 
+def _tcp_port_open(base_url: str, timeout: float = 0.5) -> bool:
+    """Дешёвая проверка: принимает ли хост:порт из base_url TCP-соединения (без HTTP-запросов)."""
+    import socket
+    from urllib.parse import urlsplit
+    try:
+        parts = urlsplit(base_url if "://" in base_url else "http://" + base_url)
+        host = parts.hostname or "127.0.0.1"
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except Exception as e:
+        log_debug(f"_tcp_port_open: {base_url} недоступен -> {e}")
+        return False
+
+def _token_from_http_response(resp) -> str | None:
+    """Достаёт PO token из ответа провайдера: сначала JSON-ключи, затем поиск в тексте (даже при 404/500)."""
+    if resp is None:
+        return None
+    token = None
+    try:
+        j = resp.json()
+        if isinstance(j, dict):
+            for key in ("poToken", "po_token", "pot", "token"):
+                if key in j and j[key]:
+                    token = str(j[key])
+                    break
+    except Exception:
+        pass
+    if not token and resp.text:
+        token = _find_po_token_in_text(resp.text)
+    # Нормализуем: некоторые провайдеры возвращают poToken БЕЗ префикса web.gvs+
+    if token and not token.startswith("web.gvs+"):
+        token = "web.gvs+" + token
+    return token
+
 def _probe_http_provider(base_url: str, timeout: int = 3) -> str | None:
-    """Пробуем получить токен от локального HTTP-провайдера (Docker/Node server)."""
+    """
+    Пробуем получить токен от локального HTTP-провайдера (Docker/Node server).
+    1) TCP-preflight: если порт закрыт — сразу выходим, не тратя таймауты на каждый путь.
+    2) Путь, ответивший в прошлый раз (BGUTIL_HTTP_CACHE_FILE), пробуется первым.
+    3) Остальные пути опрашиваются параллельно через одну сессию с пулом соединений; первый токен побеждает.
+    """
     try:
         if not requests:
             log_debug("_probe_http_provider: requests не доступен, пропуск HTTP probe")
             return None
-        # расширенный набор путей и анализ тела/JSON даже при 404/500
+        if not _tcp_port_open(base_url, timeout=min(1.0, timeout)):
+            log_debug(f"_probe_http_provider: порт провайдера закрыт ({base_url}) — HTTP probe пропущен")
+            return None
+
+        # расширенный набор путей и анализ тела/JSON даже при 404/500; /get_pot дополнительно пробуем POST
         probe_paths = ["/generate", "/generate_once", "/pot", "/token", "/once", "/api/generate", "/", "/get_pot"]
-        for p in probe_paths:
+        probes = [("GET", p) for p in probe_paths] + [("POST", "/get_pot")]
+
+        base = base_url.rstrip("/")
+        cache = _load_json_cache(BGUTIL_HTTP_CACHE_FILE)
+        remembered = cache.get(base)
+        if isinstance(remembered, list) and len(remembered) == 2:
+            remembered = tuple(remembered)
+            if remembered in probes:
+                probes.remove(remembered)
+                probes.insert(0, remembered)
+            else:
+                remembered = None
+        else:
+            remembered = None
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=len(probes))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        def _probe(method: str, path: str) -> str | None:
             # Формируем URL корректно (учитываем возможный trailing slash в base_url и leading slash в p)
-            url = base_url.rstrip("/") + (p if p.startswith("/") else "/" + p)
-            resp = None
+            url = base + (path if path.startswith("/") else "/" + path)
             try:
-                log_debug(f"_probe_http_provider: GET {url}")
-                resp = requests.get(url, timeout=timeout)
+                log_debug(f"_probe_http_provider: {method} {url}")
+                if method == "POST":
+                    # пустой JSON — сервер обычно игнорирует тело
+                    resp = session.post(url, json={}, timeout=timeout)
+                else:
+                    resp = session.get(url, timeout=timeout)
             except Exception as e:
-                log_debug(f"_probe_http_provider: GET {url} -> {e}")
-                resp = None
-
-            body = resp.text if resp is not None else ""
-            token = None
+                log_debug(f"_probe_http_provider: {method} {url} -> {e}")
+                return None
+            return _token_from_http_response(resp)
 
-            # Попытка распарсить JSON-ответ (если есть)
+        def _found(method: str, path: str, token: str) -> str:
+            masked = _mask_po_token(token)
+            log_debug(f"_probe_http_provider: найден token в {method} {base}{path} -> {masked}")
             try:
-                if resp is not None:
-                    j = resp.json()
-                    if isinstance(j, dict):
-                        for key in ("poToken", "po_token", "pot", "token"):
-                            if key in j and j[key]:
-                                token = str(j[key])
-                                break
+                print(Fore.GREEN + f"PO token найден через HTTP-провайдера ({method}): {masked}" + Style.RESET_ALL)
             except Exception:
                 pass
+            if remembered != (method, path):
+                cache[base] = [method, path]
+                _save_json_cache(BGUTIL_HTTP_CACHE_FILE, cache)
+            return token
 
-            # Если не нашли в JSON — ищем regex в тексте
-            if not token and body:
-                token = _find_po_token_in_text(body)
-
-            if token:
-                # Нормализуем: некоторые провайдеры возвращают poToken БЕЗ префикса web.gvs+
-                if not token.startswith("web.gvs+"):
-                    token = "web.gvs+" + token
-                masked = _mask_po_token(token)
-                log_debug(f"_probe_http_provider: найден token в GET {url} -> {masked}")
-                try:
-                    print(Fore.GREEN + f"PO token найден через HTTP-провайдера (GET): {masked}" + Style.RESET_ALL)
-                except Exception:
-                    pass
-                return token
+        try:
+            # Сначала — путь, ответивший в прошлый раз
+            if remembered:
+                token = _probe(*remembered)
+                if token:
+                    return _found(*remembered, token)
+                probes = probes[1:]
 
-            # Если путь /get_pot (или похожий) — попробуем POST независимо от результата GET
-            if p.endswith("get_pot") or p.endswith("/get_pot"):
-                try:
-                    post_url = url
-                    payload = {}  # пустой JSON/формы — сервер обычно игнорирует тело
-                    log_debug(f"_probe_http_provider: POST {post_url}")
-                    resp2 = requests.post(post_url, json=payload, timeout=timeout)
-                    body2 = resp2.text if resp2 is not None else ""
-                    token = None
-                    try:
-                        j2 = resp2.json() if resp2 is not None else None
-                        if isinstance(j2, dict):
-                            for key in ("poToken", "po_token", "pot", "token"):
-                                if key in j2 and j2[key]:
-                                    token = str(j2[key])
-                                    break
-                    except Exception:
-                        pass
-                    if not token and body2:
-                        token = _find_po_token_in_text(body2)
+            # Не используем with: при найденном токене не ждём завершения остальных запросов
+            pool = ThreadPoolExecutor(max_workers=len(probes), thread_name_prefix="pot-http")
+            try:
+                futures = {pool.submit(_probe, m, p): (m, p) for m, p in probes}
+                for fut in as_completed(futures):
+                    token = fut.result()
                     if token:
-                        # Нормализуем: некоторые провайдеры возвращают poToken БЕЗ префикса web.gvs+
-                        if not token.startswith("web.gvs+"):
-                            token = "web.gvs+" + token
-                        masked = _mask_po_token(token)
-                        log_debug(f"_probe_http_provider: найден token в POST {post_url} -> {masked}")
-                        try:
-                            print(Fore.GREEN + f"PO token найден через HTTP-провайдера (POST): {masked}" + Style.RESET_ALL)
-                        except Exception:
-                            pass
-                        return token
-                except Exception as e2:
-                    log_debug(f"_probe_http_provider: POST {url} -> {e2}")
-                    # продолжим пробовать другие пути
-                    continue
-        # конец цикла probe_paths
+                        return _found(*futures[fut], token)
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+        finally:
+            session.close()
     except Exception as e:
         log_debug(f"_probe_http_provider: исключение -> {e}")
     return None
@@ -599,11 +894,236 @@ def _ensure_container_running(image: str, name: str, port: int = 4416, timeout:
     log_debug(f"_ensure_container_running: не удалось запустить контейнер {name}")
     return False
 
+# --- Дисковый кэш PO token ---
+# Формат PO_TOKEN_CACHE_FILE: {"token", "acquired", "validated", "provider"}.
+# Токен из кэша используется без проверки, пока он моложе PO_TOKEN_REVALIDATE_AGE;
+# после этого — одна лёгкая проверка validate_po_token, и только при её неудаче — полный перебор провайдеров.
+
+def _load_cached_po_token(test_url: str | None = None, cookie_file: str | None = None) -> str | None:
+    """
+    Возвращает PO token из дискового кэша или None.
+    Если токен старше PO_TOKEN_REVALIDATE_AGE и передан test_url — перепроверяет его;
+    невалидный токен удаляется из кэша. Без test_url устаревший токен не возвращается.
+    """
+    if not PO_TOKEN_CACHE:
+        return None
+    entry = _load_json_cache(PO_TOKEN_CACHE_FILE)
+    token = entry.get('token')
+    if not token:
+        return None
+    try:
+        if not isinstance(token, str):
+            raise TypeError(f"token: {type(token).__name__}")
+        checked_at = max(float(entry.get('acquired') or 0), float(entry.get('validated') or 0))
+    except (TypeError, ValueError) as e:
+        # повреждённый или отредактированный вручную файл — запись считаем недействительной
+        invalidate_cached_po_token(f"некорректная запись в кэше ({e})")
+        return None
+    age = time.time() - checked_at
+    masked = _mask_po_token(token)
+    if 0 <= age < PO_TOKEN_REVALIDATE_AGE:
+        log_debug(f"_load_cached_po_token: токен из кэша ({entry.get('provider')}, {int(age)} с) -> {masked}")
+        return token
+    if not test_url:
+        log_debug(f"_load_cached_po_token: токен в кэше устарел ({int(age)} с), проверить не на чем — пропускаем")
+        return None
+    log_debug(f"_load_cached_po_token: токен в кэше старше {PO_TOKEN_REVALIDATE_AGE} с — перепроверяем")
+    if validate_po_token(token, test_url, cookie_file=cookie_file, timeout=8):
+        entry['validated'] = time.time()
+        _save_json_cache(PO_TOKEN_CACHE_FILE, entry, private=True)
+        log_debug(f"_load_cached_po_token: кэшированный токен подтверждён -> {masked}")
+        return token
+    invalidate_cached_po_token("не прошёл перепроверку")
+    return None
+
+def _store_cached_po_token(token: str, provider: str):
+    """Сохраняет свежеполученный PO token в дисковый кэш вместе с временем получения и провайдером."""
+    if not PO_TOKEN_CACHE or not token:
+        return
+    entry = {'token': token, 'acquired': time.time(), 'validated': None, 'provider': provider}
+    if _save_json_cache(PO_TOKEN_CACHE_FILE, entry, private=True):
+        log_debug(f"_store_cached_po_token: токен от '{provider}' сохранён в {PO_TOKEN_CACHE_FILE}")
+
+def invalidate_cached_po_token(reason: str = ""):
+    """Удаляет PO token из дискового кэша (например, если он перестал проходить проверку)."""
+    try:
+        if PO_TOKEN_CACHE_FILE.exists():
+            PO_TOKEN_CACHE_FILE.unlink()
+            log_debug(f"invalidate_cached_po_token: кэш PO token удалён ({reason})")
+    except Exception as e:
+        log_debug(f"invalidate_cached_po_token: не удалось удалить {PO_TOKEN_CACHE_FILE}: {e}")
+
+# --- Стратегии получения PO token ---
+# Каждая стратегия независима: возвращает токен или None и не трогает окружение.
+# stop — threading.Event; в режиме гонки выставляется, когда токен уже найден другой стратегией,
+# чтобы оставшиеся не начинали новых (долгих) шагов.
+
+def _is_plausible_po_token(tok: str | None) -> bool:
+    """Быстрая проверка формата токена (без сетевых запросов): web.gvs+<base64-подобная строка>."""
+    if not tok:
+        return False
+    return re.fullmatch(r'(?:web\.gvs\+)?[A-Za-z0-9_\-+/]{16,}={0,2}', str(tok).strip()) is not None
+
+def _pot_strategy_http(timeout: int, stop: threading.Event) -> str | None:
+    """HTTP-провайдер bgutil (быстрая попытка)."""
+    return _probe_http_provider(BGUTIL_PROVIDER_BASE_URL, timeout=3)
+
+def _pot_strategy_docker_logs(timeout: int, stop: threading.Event) -> str | None:
+    """Поиск токена в логах docker-контейнера провайдера."""
+    if shutil.which("docker") is None:
+        return None
+    return _probe_docker_logs(BGUTIL_DOCKER_NAME, tail=2000)
+
+def _pot_strategy_docker_exec(timeout: int, stop: threading.Event) -> str | None:
+    """docker exec generate_once.js (если контейнер запущен или автозапуск удастся)."""
+    if shutil.which("docker") is None:
+        return None
+    if not _ensure_container_running(BGUTIL_DOCKER_IMAGE, BGUTIL_DOCKER_NAME, port=int(BGUTIL_DOCKER_PORT), timeout=20):
+        return None
+    candidate_paths = [
+        BGUTIL_CONTAINER_SCRIPT_PATH,
+        "/app/build/generate_once.js",
+        "/app/server/build/generate_once.js",
+        "/server/build/generate_once.js",
+    ]
+    for cp in candidate_paths:
+        if stop.is_set():
+            return None
+        tok = _probe_docker_exec_generate(BGUTIL_DOCKER_NAME, script_path_in_container=cp, timeout=20)
+        if tok:
+            return tok
+    return None
+
+def _pot_strategy_local_node(timeout: int, stop: threading.Event) -> str | None:
+    """Локальный node-скрипт bgutil (если есть)."""
+    home = Path.home()
+    candidates = []
+    if os.environ.get("BGUTIL_SCRIPT_PATH"):
+        candidates.append(Path(os.environ.get("BGUTIL_SCRIPT_PATH")))
+    candidates += [
+        home / "bgutil-ytdlp-pot-provider" / "server" / "build" / "generate_once.js",
+        home / "bgutil-ytdlp-pot-provider" / "server" / "build" / "generate.js",
+        Path.cwd() / "bgutil-ytdlp-pot-provider" / "server" / "build" / "generate_once.js",
+    ]
+    for c in candidates:
+        if stop.is_set():
+            return None
+        try:
+            if c and c.exists():
+                token = _try_run_node_script(c, timeout=timeout)
+                if token:
+                    return token
+        except Exception as e:
+            log_debug(f"retrieve_po_token_auto: local script {c} -> {e}")
+    return None
+
+def _pot_strategy_auto_download(timeout: int, stop: threading.Event) -> str | None:
+    """Автозагрузка generate_once.js (по умолчанию и/или из BGUTIL_SCRIPT_URL) и запуск через node."""
+    node_cmd = shutil.which(os.environ.get("BGUTIL_NODE_CMD", "node"))
+    if not node_cmd:
+        return None
+    import tempfile, urllib.request
+    default_raw = "https://raw.githubusercontent.com/brainicism/bgutil-ytdlp-pot-provider/master/server/build/generate_once.js"
+    urls = [default_raw]
+    if os.environ.get("BGUTIL_SCRIPT_URL"):
+        urls.append(os.environ.get("BGUTIL_SCRIPT_URL"))
+    for script_url in urls:
+        if stop.is_set():
+            return None
+        try:
+            tmpd = Path(tempfile.mkdtemp(prefix="bgutil_"))
+            dst = tmpd / "generate_once.js"
+            log_debug(f"retrieve_po_token_auto: auto-download {script_url} -> {dst}")
+            urllib.request.urlretrieve(script_url, str(dst))
+            token = _try_run_node_script(dst, timeout=timeout)
+            if token:
+                return token
+        except Exception as e:
+            log_debug(f"retrieve_po_token_auto: auto download/run {script_url} failed -> {e}")
+    return None
+
+# Порядок важен для последовательного режима (от быстрых к медленным)
+PO_TOKEN_STRATEGIES = [
+    ("http", _pot_strategy_http),
+    ("docker_logs", _pot_strategy_docker_logs),
+    ("docker_exec", _pot_strategy_docker_exec),
+    ("local_node", _pot_strategy_local_node),
+    ("auto_download", _pot_strategy_auto_download),
+]
+# Стратегии с побочными эффектами (запуск/скачивание docker-контейнера, загрузка и запуск удалённого JS):
+# в гонке не участвуют и запускаются по очереди, только если безопасные стратегии токена не нашли
+PO_TOKEN_SIDE_EFFECT_STRATEGIES = {"docker_exec", "auto_download"}
+
+def _run_po_token_strategy(name: str, func, timeout: int, stop: threading.Event) -> str | None:
+    """Выполняет одну стратегию с замером времени; возвращает токен, только если он прошёл проверку формата."""
+    t0 = time.monotonic()
+    token = None
+    try:
+        token = func(timeout, stop)
+    except Exception as e:
+        log_debug(f"retrieve_po_token_auto[{name}]: исключение -> {e}")
+    elapsed = time.monotonic() - t0
+    if token and not _is_plausible_po_token(token):
+        log_debug(f"retrieve_po_token_auto[{name}]: {elapsed:.2f} с, отброшен токен неверного формата -> {_mask_po_token(token)}")
+        token = None
+    else:
+        log_debug(f"retrieve_po_token_auto[{name}]: {elapsed:.2f} с, {'токен найден' if token else 'нет токена'}")
+    return token
+
+def _race_po_token_strategies(timeout: int) -> tuple[str | None, str | None]:
+    """
+    Запускает безопасные стратегии одновременно (daemon-потоки) и возвращает (token, provider) первой успешной.
+    Остальные не прерываются принудительно (subprocess/сеть), но получают сигнал stop и их результат игнорируется.
+    Стратегии из PO_TOKEN_SIDE_EFFECT_STRATEGIES выполняются по очереди и только если гонка не дала токена.
+    """
+    import queue
+    stop = threading.Event()
+    results = queue.Queue()
+    racers = [(n, f) for n, f in PO_TOKEN_STRATEGIES if n not in PO_TOKEN_SIDE_EFFECT_STRATEGIES]
+
+    def _worker(name, func):
+        results.put((name, _run_po_token_strategy(name, func, timeout, stop)))
+
+    for name, func in racers:
+        threading.Thread(target=_worker, args=(name, func), name=f"po-token-{name}", daemon=True).start()
+
+    # Общий предел ожидания гонки: локальный node-скрипт укладывается примерно в 2*timeout
+    deadline = time.monotonic() + max(timeout, 20) * 2
+    pending = len(racers)
+    try:
+        while pending:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                log_debug("retrieve_po_token_auto: гонка стратегий — общий таймаут истёк")
+                break
+            try:
+                name, token = results.get(timeout=left)
+            except queue.Empty:
+                continue
+            pending -= 1
+            if token:
+                log_debug(f"retrieve_po_token_auto: гонка выиграна стратегией '{name}'")
+                return token, name
+    finally:
+        stop.set()
+
+    fallback_stop = threading.Event()
+    for name, func in PO_TOKEN_STRATEGIES:
+        if name in PO_TOKEN_SIDE_EFFECT_STRATEGIES:
+            token = _run_po_token_strategy(name, func, timeout, fallback_stop)
+            if token:
+                return token, name
+    return None, None
+
 def retrieve_po_token_auto(timeout:int = 30) -> str | None:
     """
     Попытки автоматически получить PO token.
-    Порядок: env -> HTTP probe -> docker logs -> docker exec generate_once.js -> локальные node -> auto-download -> автозапуск docker.
-    При успешном получении — устанавливает os.environ[YTDLP_PO_TOKEN_ENV].
+    Порядок: env -> дисковый кэш -> стратегии PO_TOKEN_STRATEGIES
+    (HTTP probe, docker logs, docker exec generate_once.js с автозапуском контейнера, локальные node, auto-download).
+    При PO_TOKEN_RACE безопасные стратегии запускаются одновременно и побеждает первый токен правильного формата,
+    а docker exec (с автозапуском контейнера) и auto-download выполняются после них, только если токена нет;
+    иначе все стратегии выполняются по очереди. Время каждой стратегии пишется в debug-лог.
+    При успешном получении — устанавливает os.environ[YTDLP_PO_TOKEN_ENV] и сохраняет токен в PO_TOKEN_CACHE_FILE.
     """
     try:
         # 0) уже задан в окружении
@@ -612,144 +1132,41 @@ def retrieve_po_token_auto(timeout:int = 30) -> str | None:
             log_debug("retrieve_po_token_auto: token уже в окружении")
             return env_tok
 
-        docker_available = shutil.which("docker") is not None
-        docker_name = BGUTIL_DOCKER_NAME
-        docker_image = BGUTIL_DOCKER_IMAGE
-        provider_base = BGUTIL_PROVIDER_BASE_URL
-
-        # 1) HTTP probe (быстрая попытка)
-        token = _probe_http_provider(provider_base, timeout=3)
-        if token:
-            os.environ[YTDLP_PO_TOKEN_ENV] = token
-            masked = _mask_po_token(token)
-            log_debug(f"retrieve_po_token_auto: token найден через HTTP probe -> {masked}")
-            try:
-                print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
-            except Exception:
-                pass
-            if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
-                try:
-                    subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, token], check=False)
-                except Exception:
-                    pass
-            return token
+        # 0a) дисковый кэш прошлых запусков (без проверки — её делает вызывающая сторона)
+        cached = _load_cached_po_token()
+        if cached:
+            return cached
 
-        # 2) поиск в логах Docker
-        if docker_available:
-            tok = _probe_docker_logs(docker_name, tail=2000)
-            if tok:
-                os.environ[YTDLP_PO_TOKEN_ENV] = tok
-                masked = _mask_po_token(tok)
-                log_debug(f"retrieve_po_token_auto: token найден в логах docker -> {masked}")
-                try:
-                    print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
-                except Exception:
-                    pass
-                if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
-                    try:
-                        subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, tok], check=False)
-                    except Exception:
-                        pass
-                return tok
-
-            # 3) docker exec generate_once.js (если контейнер запущен или автозапуск удастся)
-            ran = _ensure_container_running(docker_image, docker_name, port=int(BGUTIL_DOCKER_PORT), timeout=20)
-            if ran:
-                candidate_paths = [
-                    BGUTIL_CONTAINER_SCRIPT_PATH,
-                    "/app/build/generate_once.js",
-                    "/app/server/build/generate_once.js",
-                    "/server/build/generate_once.js",
-                ]
-                for cp in candidate_paths:
-                    tok = _probe_docker_exec_generate(docker_name, script_path_in_container=cp, timeout=20)
-                    if tok:
-                        os.environ[YTDLP_PO_TOKEN_ENV] = tok
-                        masked = _mask_po_token(tok)
-                        log_debug(f"retrieve_po_token_auto: token получен через docker exec generate_once.js -> {masked}")
-                        try:
-                            print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
-                        except Exception:
-                            pass
-                        if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
-                            try:
-                                subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, tok], check=False)
-                            except Exception:
-                                pass
-                        return tok
+        t0 = time.monotonic()
+        token, provider = None, None
+        if PO_TOKEN_RACE:
+            token, provider = _race_po_token_strategies(timeout)
+        else:
+            stop = threading.Event()
+            for name, func in PO_TOKEN_STRATEGIES:
+                token = _run_po_token_strategy(name, func, timeout, stop)
+                if token:
+                    provider = name
+                    break
 
-        # 4) локальный node-скрипт (если есть)
-        home = Path.home()
-        candidates = []
-        if os.environ.get("BGUTIL_SCRIPT_PATH"):
-            candidates.append(Path(os.environ.get("BGUTIL_SCRIPT_PATH")))
-        candidates += [
-            home / "bgutil-ytdlp-pot-provider" / "server" / "build" / "generate_once.js",
-            home / "bgutil-ytdlp-pot-provider" / "server" / "build" / "generate.js",
-            Path.cwd() / "bgutil-ytdlp-pot-provider" / "server" / "build" / "generate_once.js",
-        ]
-        for c in candidates:
-            try:
-                if c and c.exists():
-                    token = _try_run_node_script(c, timeout=timeout)
-                    if token:
-                        masked = _mask_po_token(token)
-                        log_debug(f"retrieve_po_token_auto: token получен локальным node-скриптом -> {masked}")
-                        try:
-                            print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
-                        except Exception:
-                            pass
-                        os.environ[YTDLP_PO_TOKEN_ENV] = token
-                        return token
-            except Exception as e:
-                log_debug(f"retrieve_po_token_auto: local script {c} -> {e}")
-                continue
+        if not token:
+            log_debug(f"retrieve_po_token_auto: не удалось получить PO token автоматически ({time.monotonic() - t0:.2f} с)")
+            return None
 
-        # 5) автозагрузка remote script (node available)
-        script_url = os.environ.get("BGUTIL_SCRIPT_URL")
-        node_cmd = shutil.which(os.environ.get("BGUTIL_NODE_CMD", "node"))
-        if node_cmd:
-            default_raw = "https://raw.githubusercontent.com/brainicism/bgutil-ytdlp-pot-provider/master/server/build/generate_once.js"
+        os.environ[YTDLP_PO_TOKEN_ENV] = token
+        masked = _mask_po_token(token)
+        log_debug(f"retrieve_po_token_auto: token получен стратегией '{provider}' за {time.monotonic() - t0:.2f} с -> {masked}")
+        try:
+            print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
+        except Exception:
+            pass
+        if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
             try:
-                import tempfile, urllib.request
-                tmpd = Path(tempfile.mkdtemp(prefix="bgutil_"))
-                dst = tmpd / "generate_once.js"
-                log_debug(f"retrieve_po_token_auto: auto-download {default_raw} -> {dst}")
-                urllib.request.urlretrieve(default_raw, str(dst))
-                token = _try_run_node_script(dst, timeout=timeout)
-                if token:
-                    masked = _mask_po_token(token)
-                    log_debug(f"retrieve_po_token_auto: token получен из auto-download скрипта -> {masked}")
-                    try:
-                        print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
-                    except Exception:
-                        pass
-                    os.environ[YTDLP_PO_TOKEN_ENV] = token
-                    return token
-            except Exception as e:
-                log_debug(f"retrieve_po_token_auto: auto download/run default script failed -> {e}")
-            if script_url:
-                try:
-                    import tempfile, urllib.request
-                    tmpd = Path(tempfile.mkdtemp(prefix="bgutil_"))
-                    dst = tmpd / "generate_once.js"
-                    log_debug(f"retrieve_po_token_auto: auto-download {script_url} -> {dst}")
-                    urllib.request.urlretrieve(script_url, str(dst))
-                    token = _try_run_node_script(dst, timeout=timeout)
-                    if token:
-                        masked = _mask_po_token(token)
-                        log_debug(f"retrieve_po_token_auto: token получен из auto-download(script_url) -> {masked}")
-                        try:
-                            print(Fore.GREEN + f"PO token установлен автоматически: {masked}" + Style.RESET_ALL)
-                        except Exception:
-                            pass
-                        os.environ[YTDLP_PO_TOKEN_ENV] = token
-                        return token
-                except Exception as e:
-                    log_debug(f"retrieve_po_token_auto: auto download/run script_url failed -> {e}")
-
-        log_debug("retrieve_po_token_auto: не удалось получить PO token автоматически")
-        return None
+                subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, token], check=False)
+            except Exception:
+                pass
+        _store_cached_po_token(token, provider)
+        return token
     except Exception as e:
         log_debug(f"retrieve_po_token_auto: исключение -> {e}")
         return None
@@ -772,7 +1189,7 @@ def validate_po_token(token: str, test_url: str, cookie_file: str | None = None,
         if cookie_file:
             ydl_opts['cookiefile'] = cookie_file
         # Не делаем глубоких попыток — один быстрый вызов
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with pooled_ydl(ydl_opts) as ydl:
             info = ydl.extract_info(test_url, download=False)
         # Если info получено — токен явно рабочий
         if info:
@@ -801,9 +1218,68 @@ def validate_po_token(token: str, test_url: str, cookie_file: str | None = None,
         log_debug(f"validate_po_token: исключение при валидации token: {exc}\n{traceback.format_exc()}")
         return False
 
-# NOTE: Вызов retrieve_po_token_auto отложен вниз, после импортов и инициализации colorama.
-# Здесь лишь оставляем заглушку, чтобы не выполнять сетевые/IO операции во время определения модуля.
-# retrieve_po_token_auto будет вызываться ниже, после init(autoreset=True).
+# --- Ленивое получение PO token ---
+# При импорте токен НЕ ищется: провайдеры (HTTP, docker, node, загрузка скрипта) опрашиваются только
+# когда токен действительно может понадобиться — для YouTube-ссылки или при SABR-ошибке.
+# start_po_token_prefetch() запускает поиск в фоновом потоке сразу после определения платформы,
+# чтобы он шёл параллельно с проверкой куков и получением метаданных;
+# get_auto_po_token() забирает результат (при необходимости дожидаясь его).
+_PO_TOKEN_LOCK = threading.Lock()
+_PO_TOKEN_THREAD = None
+
+def _po_token_worker(timeout: int, test_url: str | None = None):
+    """
+    Фоновая задача: однократный поиск PO token, результат сохраняется в AUTO_PO_TOKEN.
+    Сначала — дисковый кэш (с перепроверкой на test_url, если токен устарел), затем цепочка провайдеров.
+    """
+    global AUTO_PO_TOKEN
+    try:
+        token = _load_cached_po_token(test_url) if test_url else None
+        if not token:
+            token = retrieve_po_token_auto(timeout=timeout)
+        if token:
+            # НЕ записываем автоматически в os.environ — сохраняем в отложенную переменную.
+            AUTO_PO_TOKEN = token
+            log_debug("YTDLP PO token найден автоматически (отложено) -> " + _mask_po_token(token))
+        else:
+            log_debug("Автоматическое получение PO token не удалось.")
+    except Exception as e:
+        log_debug(f"_po_token_worker: исключение -> {e}")
+
+def start_po_token_prefetch(timeout: int = 30, test_url: str | None = None) -> bool:
+    """
+    Запускает фоновый поиск PO token (не более одного раза за процесс).
+    Ничего не делает, если токен уже известен (env или AUTO_PO_TOKEN).
+    test_url — ссылка для перепроверки устаревшего токена из дискового кэша.
+    Возвращает True, если поиск запущен сейчас или уже идёт/завершён.
+    """
+    global _PO_TOKEN_THREAD
+    with _PO_TOKEN_LOCK:
+        if _PO_TOKEN_THREAD is not None:
+            return True
+        if AUTO_PO_TOKEN or os.environ.get(YTDLP_PO_TOKEN_ENV):
+            return False
+        if globals().get('_bgutil_was_missing'):
+            log_debug("bgutil-ytdlp-pot-provider был установлен при старте — ищем PO token в фоне.")
+        log_debug("start_po_token_prefetch: запуск фонового поиска PO token")
+        _PO_TOKEN_THREAD = threading.Thread(target=_po_token_worker, args=(timeout, test_url), name="po-token-prefetch", daemon=True)
+        _PO_TOKEN_THREAD.start()
+        return True
+
+def get_auto_po_token(timeout: float | None = 30, test_url: str | None = None) -> str | None:
+    """
+    Возвращает автоматически найденный PO token.
+    Если поиск ещё не запускался — запускает его; ждёт результата не дольше timeout секунд
+    (timeout=0 — только проверить готовый результат, не блокируя).
+    """
+    if AUTO_PO_TOKEN:
+        return AUTO_PO_TOKEN
+    start_po_token_prefetch(test_url=test_url)
+    thread = _PO_TOKEN_THREAD
+    if thread is not None and thread.is_alive() and timeout != 0:
+        log_debug(f"get_auto_po_token: ожидаем фоновый поиск PO token (до {timeout} с)")
+        thread.join(timeout)
+    return AUTO_PO_TOKEN
 
 # Поведение по умолчанию (без внешних переменных)
 # YTDLP_ALLOW_MISSING_POT_DEFAULT — если True, будет по умолчанию включён missing_pot (НЕ РЕКОМЕНДУЕТСЯ для общей публики)
@@ -850,6 +1326,10 @@ MIN_DISPLAY_MS = 200           # Минимальная длительность
 INTER_CAPTION_GAP_MS = 0       # Межтитровый интервал, ms
 
 debug_file_initialized = False  # Флаг инициализации файла журнала отладки
+_DEBUG_QUEUE = queue.SimpleQueue()  # Очередь строк журнала для фонового писателя
+_DEBUG_WRITER = None                # Поток-писатель журнала (запускается при первой записи)
+_DEBUG_WRITER_LOCK = threading.Lock()
+_DEBUG_STOP = object()              # Маркер завершения работы писателя
 
 # Класс для хранения информации о субтитре (индекс, время начала/конца, текст)
 @dataclass
@@ -885,34 +1365,134 @@ try:
 except ImportError:
     from importlib_metadata import version as get_version, PackageNotFoundError  # type: ignore
 
-def log_debug(message):
+def _debug_writer_loop():
     """
-    Записывает сообщение в файл журнала отладки, если DEBUG включён.
-    Поддержка: Windows, MacOS, Linux.
+    Фоновый писатель журнала отладки: держит DEBUG_FILE открытым, пишет строки пачками
+    и сбрасывает буфер на диск не реже DEBUG_FLUSH_INTERVAL секунд.
+    Элементы очереди: строка, threading.Event (запрос flush) или _DEBUG_STOP.
     """
     global debug_file_initialized
+    mode = 'a' if DEBUG_APPEND else 'w'
+    try:
+        f = open(DEBUG_FILE, mode, encoding='utf-8')
+    except Exception as e:
+        try:
+            sys.stderr.write(f"log_debug: не удалось открыть {DEBUG_FILE}: {e}\n")
+        except Exception:
+            pass
+        return
+    try:
+        if DEBUG_APPEND:
+            # В режиме дописывания — добавляем разделитель и заголовок нового сеанса
+            f.write(f"\n{'='*60}\n--- Начинается новый сеанс отладки [{datetime.now()}] ---\n")
+        debug_file_initialized = True
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = _DEBUG_QUEUE.get(timeout=DEBUG_FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+            # Забираем всё, что накопилось, одной пачкой
+            batch = [item] if item is not None else []
+            while True:
+                try:
+                    batch.append(_DEBUG_QUEUE.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            waiters = []
+            for rec in batch:
+                if rec is _DEBUG_STOP:
+                    stop = True
+                elif isinstance(rec, threading.Event):
+                    waiters.append(rec)
+                else:
+                    f.write(rec)
+            if stop or waiters or time.monotonic() - last_flush >= DEBUG_FLUSH_INTERVAL:
+                try:
+                    f.flush()
+                except Exception:
+                    pass
+                last_flush = time.monotonic()
+            if DEBUG_MAX_BYTES and f.tell() >= DEBUG_MAX_BYTES:
+                f = _rotate_debug_file(f)
+            for ev in waiters:
+                ev.set()
+            if stop:
+                return
+    finally:
+        f.close()
 
-    # Если отладка выключена — ничего не делаем
+def _rotate_debug_file(f):
+    """Ротация журнала по размеру: debug.log -> debug.log.1 -> … -> debug.log.N; возвращает новый открытый файл."""
+    try:
+        f.close()
+        for i in range(DEBUG_BACKUP_COUNT - 1, 0, -1):
+            src = f"{DEBUG_FILE}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{DEBUG_FILE}.{i + 1}")
+        if DEBUG_BACKUP_COUNT > 0:
+            os.replace(DEBUG_FILE, f"{DEBUG_FILE}.1")
+    except Exception as e:
+        try:
+            sys.stderr.write(f"log_debug: ошибка ротации {DEBUG_FILE}: {e}\n")
+        except Exception:
+            pass
+    # При DEBUG_BACKUP_COUNT = 0 старый журнал просто обрезается
+    f = open(DEBUG_FILE, 'w', encoding='utf-8')
+    f.write(f"--- Журнал продолжен после ротации [{datetime.now()}] ---\n")
+    return f
+
+def _ensure_debug_writer():
+    """Запускает поток-писатель журнала (один раз за процесс)."""
+    global _DEBUG_WRITER
+    if _DEBUG_WRITER is not None:
+        return
+    with _DEBUG_WRITER_LOCK:
+        if _DEBUG_WRITER is None:
+            _DEBUG_WRITER = threading.Thread(target=_debug_writer_loop, name="debug-log-writer", daemon=True)
+            _DEBUG_WRITER.start()
+
+def flush_debug_log(timeout: float = 5.0):
+    """Дожидается, пока все поставленные в очередь строки журнала будут записаны на диск."""
+    if _DEBUG_WRITER is None or not _DEBUG_WRITER.is_alive():
+        return
+    ev = threading.Event()
+    _DEBUG_QUEUE.put(ev)
+    ev.wait(timeout)
+
+@atexit.register
+def _close_debug_log():
+    """При выходе из программы дописывает очередь журнала и закрывает файл."""
+    if _DEBUG_WRITER is None or not _DEBUG_WRITER.is_alive():
+        return
+    _DEBUG_QUEUE.put(_DEBUG_STOP)
+    _DEBUG_WRITER.join(5.0)
+
+_LOG_LEVEL_ORDER = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40, 'off': 100}
+
+def debug_enabled(source: str = 'vdl', level: str = 'debug') -> bool:
+    """Будет ли записано сообщение данного источника и уровня (см. DEBUG_LEVELS)."""
     if not DEBUG:
+        return False
+    threshold = _LOG_LEVEL_ORDER.get(str(DEBUG_LEVELS.get(source, 'debug')).lower(), 10)
+    return _LOG_LEVEL_ORDER.get(level, 10) >= threshold
+
+def log_debug(message, source: str = 'vdl', level: str = 'debug'):
+    """
+    Записывает сообщение в файл журнала отладки, если DEBUG включён
+    и уровень сообщения не ниже порога источника в DEBUG_LEVELS.
+    Строка только ставится в очередь — запись в файл выполняет фоновый поток,
+    поэтому вызов не делает файловых операций на горячем пути (прогресс yt-dlp и т.п.).
+    Поддержка: Windows, MacOS, Linux.
+    """
+    # Если отладка выключена или источник отфильтрован — ничего не делаем
+    if not debug_enabled(source, level):
         return
 
-    # Формируем строку для записи в лог
-    log_line = f"[{datetime.now()}] {message}\n"
-
-    # Если файл ещё не инициализирован — открываем в нужном режиме
-    if not debug_file_initialized:
-        mode = 'a' if DEBUG_APPEND else 'w'
-        with open(DEBUG_FILE, mode, encoding='utf-8') as f:
-            if DEBUG_APPEND:
-                # В режиме дописывания — добавляем разделитель и заголовок нового сеанса
-                f.write(f"\n{'='*60}\n--- Начинается новый сеанс отладки [{datetime.now()}] ---\n")
-            # В режиме 'w' — просто записываем первую строку
-            f.write(log_line)
-        debug_file_initialized = True
-    else:
-        # Если файл уже инициализирован — просто дописываем строку
-        with open(DEBUG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_line)
+    # Время фиксируем в момент вызова, а не записи
+    _DEBUG_QUEUE.put(f"[{datetime.now()}] {message}\n")
+    _ensure_debug_writer()
 
 # --- Импорт сторонних модулей через универсальную функцию ---
 try:
@@ -932,11 +1512,23 @@ except Exception:
 from glob import glob
 
 # --- Импорт сторонних модулей с автоматической установкой/обновлением ---
-yt_dlp = import_or_update('yt_dlp', force_check=True)
-
-# Гарантируем наличие requests и packaging, т.к. код активно их использует
-requests = import_or_update('requests')
-packaging = import_or_update('packaging')
+# Все зависимости проверяются одним этапом: версии на PyPI запрашиваются параллельно,
+# pip вызывается не более одного раза на установку и одного на обновление.
+# force_check=True — проверять версию даже при CHECK_VER = 0 (yt-dlp часто обновляется).
+_startup_modules = import_dependencies([
+    ('yt_dlp', 'yt_dlp', True),
+    # requests и packaging активно используются кодом
+    ('requests', 'requests', False),
+    ('packaging', 'packaging', False),
+    # Тяжёлые модули, нужные лишь в отдельных сценариях, импортируются по первому обращению (lazy=True)
+    ('browser_cookie3', 'browser_cookie3', False, True),
+    ('colorama', 'colorama', False),
+    ('psutil', 'psutil', False, True),
+    ('ffmpeg', 'ffmpeg-python', False, True),
+])
+yt_dlp = _startup_modules['yt_dlp']
+requests = _startup_modules['requests']
+packaging = _startup_modules['packaging']
 
 # Если packaging только что установился — получить корректный parse_version
 try:
@@ -945,15 +1537,17 @@ except Exception:
     # parse_version уже определён ранее как fallback — оставляем его
     pass
 
-browser_cookie3 = import_or_update('browser_cookie3')
-colorama = import_or_update('colorama')
-psutil = import_or_update('psutil')
-ffmpeg = import_or_update('ffmpeg', 'ffmpeg-python')
+browser_cookie3 = _startup_modules['browser_cookie3']
+colorama = _startup_modules['colorama']
+psutil = _startup_modules['psutil']
+ffmpeg = _startup_modules['ffmpeg']
 
 # Проверим заранее, был ли пакет bgutil-ytdlp-pot-provider установлен до запуска.
+_t_phase = time.perf_counter()
 _bgutil_pkg = "bgutil-ytdlp-pot-provider"
 bgutil_ytdlp_pot_provider = None
 _bgutil_was_missing = False
+_bgutil_module_name = None
 
 # Варианты имён, которые могут экспортироваться модулем (проверим локально сначала)
 _candidates = list(dict.fromkeys([
@@ -966,10 +1560,27 @@ _candidates = list(dict.fromkeys([
     "yt_dlp_plugins.extractor.getpot_bgutil",     # прямой импорт подмодуля плъгина
 ]))
 
+# 0) Результат прошлого поиска (BGUTIL_DISCOVERY_CACHE_FILE): пока site-packages не менялись,
+#    сразу импортируем найденное тогда имя или, если тогда ничего не нашлось, пропускаем pip и сканирование.
+_bgutil_cached = _load_json_cache(BGUTIL_DISCOVERY_CACHE_FILE)
+_bgutil_cache_hit = _bgutil_cached.get('fingerprint') == _site_packages_fingerprint()
+if _bgutil_cache_hit:
+    if _bgutil_cached.get('module'):
+        try:
+            bgutil_ytdlp_pot_provider = importlib.import_module(_bgutil_cached['module'])
+            _bgutil_module_name = _bgutil_cached['module']
+            log_debug(f"Импорт провайдера как '{_bgutil_module_name}' (по кэшу поиска).")
+        except Exception as e:
+            log_debug(f"Кэш поиска провайдера устарел ('{_bgutil_cached['module']}': {e}) — ищем заново.")
+            _bgutil_cache_hit = False
+    else:
+        log_debug(f"{_bgutil_pkg}: по кэшу поиска модуль не найден, site-packages не менялись — поиск пропущен.")
+
 # 1) Сначала пробуем импортировать все кандидаты локально (без pip)
-for cand in _candidates:
+for cand in ([] if _bgutil_cache_hit else _candidates):
     try:
         bgutil_ytdlp_pot_provider = importlib.import_module(cand)
+        _bgutil_module_name = cand
         log_debug(f"Импорт провайдера успешен как '{cand}' (локально).")
         break
     except Exception:
@@ -977,7 +1588,7 @@ for cand in _candidates:
 
 # 2) Если ни один из вариантов не импортировался — делаем одну попытку установки/проверки,
 #    затем сканируем sys.path на предмет топ‑левел модулей, подходящих под пакет, и пробуем импортировать их.
-if not bgutil_ytdlp_pot_provider:
+if not bgutil_ytdlp_pot_provider and not _bgutil_cache_hit:
     try:
         log_debug(f"Модуль {_bgutil_pkg} не найден локально — пробуем установить (однократно) через pip.")
         print(f"[!] {_bgutil_pkg} не установлен. Устанавливаем...")
@@ -1003,6 +1614,7 @@ if not bgutil_ytdlp_pot_provider:
         for cand in sorted(found_candidates):
             try:
                 bgutil_ytdlp_pot_provider = importlib.import_module(cand)
+                _bgutil_module_name = cand
                 _bgutil_was_missing = True
                 log_debug(f"Провайдер установлен/импортирован как '{cand}' после установки.")
                 break
@@ -1013,8 +1625,13 @@ if not bgutil_ytdlp_pot_provider:
         log_debug(f"Не удалось установить/импортировать {_bgutil_pkg}: {e}")
         bgutil_ytdlp_pot_provider = None
 
-if not bgutil_ytdlp_pot_provider:
-    # Если пакет установлен pip'ом, но мы всё ещё не нашли топ‑левел модуль — не пытаться снова при каждом старте.
+# Запоминаем результат вместе с отпечатком site-packages (после возможной установки pip'ом)
+if not _bgutil_cache_hit:
+    _save_json_cache(BGUTIL_DISCOVERY_CACHE_FILE, {'fingerprint': _site_packages_fingerprint(), 'module': _bgutil_module_name})
+
+if not bgutil_ytdlp_pot_provider and not _bgutil_cache_hit:
+    # Если пакет установлен pip'ом, но мы всё ещё не нашли топ‑левел модуль — не пытаться снова при каждом старте
+    # (результат сохранён в BGUTIL_DISCOVERY_CACHE_FILE, подсказка показывается один раз).
     log_debug(f"Не удалось импортировать/установить {_bgutil_pkg} при старте. Пакет может быть установлен под другим именем.")
     # Показать краткую подсказку пользователю (без повторных pip вызовов)
     _fore = globals().get('Fore')
@@ -1024,47 +1641,154 @@ if not bgutil_ytdlp_pot_provider:
     print(prefix + f"[!] Пакет {_bgutil_pkg} установлен, но его топ-левел модуль не найден автоматически.\n"
           f"Если вы уверены, что пакет установлен, выполните вручную в Python: import <module_name>\n"
           f"и укажите корректное имя модуля в скрипте (переменная _candidates)." + reset)
+record_startup_phase("bgutil: поиск/установка провайдера PO token", _t_phase)
 
+_t_phase = time.perf_counter()
 from yt_dlp.utils import DownloadError
-from browser_cookie3 import BrowserCookieError
 from colorama import init, Fore, Style
 
-try:
-    from tkinter import filedialog, Tk
-    import tkinter as tk
-except ImportError:
+# tkinter нужен только для диалога выбора папки на Windows — импортируем при первом использовании
+if _module_available('tkinter'):
+    tk = _LazyModule('tkinter')
+    filedialog = _LazyModule('tkinter.filedialog')
+else:
     tk = None
     filedialog = None
+record_startup_phase("импорт yt_dlp.utils / colorama", _t_phase)
 
+_t_phase = time.perf_counter()
 init(autoreset=True)  # Инициализация colorama и автоматический сброс цвета после каждого print
+record_startup_phase("colorama init", _t_phase)
 
-# --- Попытка безопасно автоматически получить PO token (вызов только после инициализации зависимостей) ---
-try:
-    _env_token = os.environ.get(YTDLP_PO_TOKEN_ENV)
-    if not _env_token:
-        # Если пакет bgutil только что был установлен при старте — логируем это и делаем попытку получить токен.
-        if globals().get('_bgutil_was_missing'):
-            log_debug("bgutil-ytdlp-pot-provider был установлен при старте — пробуем получить PO token сразу.")
-            print(Fore.YELLOW + "bgutil-плагин установлен — пытаемся автоматически получить PO token..." + Style.RESET_ALL)
-        _token = retrieve_po_token_auto()
-        if _token:
-            # НЕ записываем автоматически в os.environ — сохраняем в отложенную переменную.
-            AUTO_PO_TOKEN = _token
-            masked = _mask_po_token(_token)
-            log_debug("YTDLP PO token найден автоматически (отложено) -> " + masked)
-            print(Fore.GREEN + "Автоматически получен PO token (будет применён при необходимости)." + Style.RESET_ALL)
-        else:
-            log_debug("Автоматическое получение PO token не удалось.")
-except Exception as _:
-    log_debug("Не удалось выполнить автоматическую установку PO token после инициализации зависимостей.")
+def _check_lazy_imports() -> list:
+    """
+    Контроль регрессий импорта: какие из LAZY_IMPORT_MODULES уже загружены.
+    Вызывается сразу после инициализации модуля — непустой результат означает, что
+    тяжёлый модуль снова импортируется на верхнем уровне (напрямую или через другую зависимость).
+    """
+    eager = [name for name in LAZY_IMPORT_MODULES if name in sys.modules]
+    if eager:
+        log_debug(f"ВНИМАНИЕ: при запуске импортированы модули, которые должны загружаться отложенно: {eager}")
+    return eager
+
+_EAGER_HEAVY_IMPORTS = _check_lazy_imports()
+
+def check_lazy_imports_isolated(top: int = 10) -> int:
+    """
+    Проверка регрессий импорта (ключ --check-lazy-imports): скрипт импортируется в отдельном чистом процессе
+    под python -X importtime, и проверяется, что ни один из LAZY_IMPORT_MODULES не загружен при старте.
+    Печатает самые долгие импорты. Возвращает код выхода: 0 — всё в порядке, 1 — регрессия или сбой проверки.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    code = ("import importlib.util, json, sys; "
+            "spec = importlib.util.spec_from_file_location('vdl_import_check', sys.argv[1]); "
+            "m = importlib.util.module_from_spec(spec); spec.loader.exec_module(m); "
+            "print('VDL_EAGER=' + json.dumps(m._EAGER_HEAVY_IMPORTS))")
+    try:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code, str(Path(__file__).resolve())],
+                              capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=600)
+    except Exception as e:
+        print(Fore.RED + f"Не удалось выполнить проверку импорта: {e}" + Style.RESET_ALL)
+        return 1
+    marker = [line for line in proc.stdout.splitlines() if line.startswith('VDL_EAGER=')]
+    if proc.returncode != 0 or not marker:
+        print(Fore.RED + f"Импорт скрипта в отдельном процессе завершился с ошибкой (код {proc.returncode}):" + Style.RESET_ALL)
+        print(proc.stderr[-2000:])
+        return 1
+    eager = json.loads(marker[-1][len('VDL_EAGER='):])
+
+    # строки -X importtime: "import time:  self [us] | cumulative | imported package"
+    timings = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if line.startswith('import time:') and len(parts) == 3 and parts[1].strip().isdigit():
+            timings.append((int(parts[1]), parts[2].strip()))
+    if timings:
+        print(Fore.CYAN + f"Самые долгие импорты (накопительно, мс):" + Style.RESET_ALL)
+        for cumulative, name in sorted(timings, reverse=True)[:top]:
+            print(f"  {cumulative / 1000:8.1f}  {name}")
+    if eager:
+        print(Fore.RED + f"Регрессия: при запуске импортированы модули, которые должны загружаться отложенно: {', '.join(eager)}" + Style.RESET_ALL)
+        return 1
+    print(Fore.GREEN + f"OK: {', '.join(LAZY_IMPORT_MODULES)} при запуске не импортируются." + Style.RESET_ALL)
+    return 0
+
+class CookieStore:
+    """
+    Общее хранилище куков из Netscape-файлов для прямых HTTP-запросов (fallback, HLS-фрагменты, HEAD).
+    Каждый файл разбирается один раз и перечитывается только при изменении mtime/размера;
+    для запроса выдаются только куки, подходящие к хосту ссылки (результат кэшируется по хосту).
+    Поддержка: Windows, MacOS, Linux.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}  # {путь: (mtime_ns, размер, MozillaCookieJar, {хост: dict куков})}
+
+    def _entry(self, cookie_file):
+        path = str(Path(cookie_file).resolve())
+        st = os.stat(path)
+        entry = self._files.get(path)
+        if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+            jar = http.cookiejar.MozillaCookieJar(path)
+            jar.load(ignore_discard=True, ignore_expires=True)
+            entry = (st.st_mtime_ns, st.st_size, jar, {})
+            self._files[path] = entry
+            log_debug(f"CookieStore: загружен {path} ({len(jar)} куков)")
+        return entry
+
+    def cookies_for(self, cookie_file, url) -> dict:
+        """
+        Куки файла cookie_file, относящиеся к хосту url, в виде dict для requests.
+        Пустой dict — файла нет, он не читается или подходящих куков нет.
+        """
+        if not cookie_file:
+            return {}
+        from urllib.parse import urlparse
+        host = (urlparse(url).hostname or '').lower()
+        try:
+            with self._lock:
+                _, _, jar, by_host = self._entry(cookie_file)
+                if host not in by_host:
+                    by_host[host] = {
+                        c.name: c.value for c in jar
+                        if host == c.domain.lstrip('.').lower() or host.endswith('.' + c.domain.lstrip('.').lower())
+                    }
+                return by_host[host]
+        except Exception as e:
+            log_debug(f"CookieStore: не удалось прочитать {cookie_file}: {e}")
+            return {}
 
-def check_url_exists(url):
+COOKIE_STORE = CookieStore()
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+def http_session():
+    """
+    Общая requests.Session для прямых HTTP-запросов: соединения с одним хостом переиспользуются
+    (важно для сотен HLS-фрагментов и HEAD-проверок).
+    Сессия не запоминает куки из Set-Cookie: иначе куки одного запроса (или одного куки-файла)
+    уходили бы в следующие запросы и на другие сайты. Куки передаются в каждый запрос явно — COOKIE_STORE.cookies_for.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            session = requests.Session()
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=8)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+def check_url_exists(url, cookie_file=None):
     """
     Проверка наличия файла через HEAD-запрос
     Поддержка: Windows, MacOS, Linux.
     """
     try:
-        resp = requests.head(url, allow_redirects=True, timeout=7)
+        resp = http_session().head(url, allow_redirects=True, timeout=7, cookies=COOKIE_STORE.cookies_for(cookie_file, url))
         return resp.status_code == 200
     except Exception as e:
         log_debug(f"[Fallback] HEAD-запрос не удался для {url}: {e}")
@@ -1073,13 +1797,14 @@ def check_url_exists(url):
 def fallback_download(url):
     """
     Fallback-скачивание: попытка автоматического поиска видео на странице.
+    Возвращает True, если скачан хотя бы один найденный поток/файл.
     Поддержка: Windows, MacOS, Linux.
     """
     print("\n" + Fore.YELLOW + "[Fallback] yt-dlp не поддерживает этот сайт. Будет предпринята попытка автоматического поиска видео на странице..." + Style.RESET_ALL)
     log_debug(f"[Fallback] Запуск fallback-скачивания для URL: {url}")
 
     try:
-        resp = requests.get(url, timeout=15)
+        resp = http_session().get(url, timeout=15)
         if not resp.ok or not resp.text:
             # --- Пробуем разные куки-файлы для обхода 403 ---
             cookie_candidates = ["cookies.txt"] + sorted([
@@ -1089,13 +1814,14 @@ def fallback_download(url):
             for cookie_file in cookie_candidates:
                 if Path(cookie_file).is_file():
                     try:
-                        cj = http.cookiejar.MozillaCookieJar(cookie_file)
-                        cj.load(ignore_discard=True, ignore_expires=True)
-                        cookies = requests.utils.dict_from_cookiejar(cj)
-                        resp2 = requests.get(url, timeout=15, cookies=cookies)
+                        cookies = COOKIE_STORE.cookies_for(cookie_file, url)
+                        if not cookies:
+                            log_debug(f"[Fallback] В {cookie_file} нет куков для этого сайта — пропуск")
+                            continue
+                        resp2 = http_session().get(url, timeout=15, cookies=cookies)
                         if resp2.ok and resp2.text:
                             print(Fore.GREEN + f"[Fallback] Получено HTML с помощью куки-файла: {cookie_file}" + Style.RESET_ALL)
-                            html = resp2.text
+                            resp = resp2
                             break
                     except Exception as e:
                         log_debug(f"[Fallback] Ошибка с куки-файлом {cookie_file}: {e}")
@@ -1170,10 +1896,10 @@ def fallback_download(url):
                             ydl_opts['extractor_args'] = xa
                             log_debug(f"fallback_download: перед запуском yt-dlp добавлены extractor_args: {xa}")
                         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                            ydl.download([playlist_links[0]])
+                            return ydl.download([playlist_links[0]]) == 0
                 except Exception as e:
                     print(Fore.RED + f"Ошибка при скачивании потока: {e}" + Style.RESET_ALL)
-            return
+            return False
 
         # Добавляем найденные ссылки
         video_links.update(iframe_srcs)
@@ -1257,6 +1983,7 @@ def fallback_download(url):
                 return
 
             # --- Запускаем скачивание через yt-dlp ---
+            downloaded = False
             for abs_link in valid_links:
                 try:
                     print(Fore.YELLOW + f"\nСкачивание: {abs_link}" + Style.RESET_ALL)
@@ -1267,14 +1994,14 @@ def fallback_download(url):
                         ydl_opts['extractor_args'] = xa
                         log_debug(f"fallback_download: перед запуском yt-dlp (valid_links) добавлены extractor_args: {xa}")
                     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([abs_link])
+                        downloaded = ydl.download([abs_link]) == 0 or downloaded
 
                 except Exception as e:
                     print(Fore.RED + f"Ошибка при скачивании {abs_link}: {e}" + Style.RESET_ALL)
                     log_debug(f"[Fallback] Ошибка при скачивании {abs_link}: {e}")
 
             print(Fore.CYAN + "\nСкачивание завершено." + Style.RESET_ALL)
-            return
+            return downloaded
         
         if not video_links:
             print(Fore.YELLOW + "[Fallback] На странице не найдено постоянных ссылок на видео или плейлисты. Возможно, видео загружается динамически через JS или защищённые потоки." + Style.RESET_ALL)
@@ -1287,7 +2014,98 @@ def fallback_download(url):
         return
 
 ## --- Проверка валидности cookie-файла для платформы ---
+# --- Кэш проверок куки-файлов ---
+# Проверка куков — полноценный extract_info, поэтому вердикт запоминается по отпечатку файла
+# (платформа, путь, размер, SHA-1 содержимого). Положительный вердикт хранится на диске COOKIE_CHECK_TTL секунд,
+# отрицательный — только до конца процесса (пользователь может тут же заменить файл).
+# mtime в ключ не входит: yt-dlp перезаписывает куки-файл при закрытии, не меняя его смысла;
+# по (размер, mtime) лишь пропускается повторное хеширование в пределах процесса.
+_COOKIE_VERDICTS = {}  # {ключ: bool} — вердикты этого процесса
+_COOKIE_HASHES = {}    # {путь: (размер, mtime_ns, sha1)}
+
+def cookie_file_fingerprint(cookie_path) -> str | None:
+    """
+    Отпечаток содержимого куки-файла («путь|размер|sha1») или None, если файл недоступен.
+    Хэш пересчитывается, только если изменились размер или mtime.
+    """
+    import hashlib
+    try:
+        path = Path(cookie_path).resolve()
+        st = path.stat()
+        memo = _COOKIE_HASHES.get(str(path))
+        if memo and memo[:2] == (st.st_size, st.st_mtime_ns):
+            digest = memo[2]
+        else:
+            digest = hashlib.sha1(path.read_bytes()).hexdigest()
+            _COOKIE_HASHES[str(path)] = (st.st_size, st.st_mtime_ns, digest)
+        return f"{path}|{st.st_size}|{digest}"
+    except OSError as e:
+        log_debug(f"cookie_file_fingerprint: {cookie_path}: {e}")
+        return None
+
+def _cookie_verdict_key(platform: str, cookie_path: str) -> str | None:
+    """Ключ вердикта для куки-файла или None, если файл недоступен."""
+    fingerprint = cookie_file_fingerprint(cookie_path)
+    return f"{platform}|{fingerprint}" if fingerprint else None
+
+def _cookie_check_age(checked_at, now: float):
+    """Сколько секунд назад пройдена сохранённая проверка; None — записи нет или она повреждена (считается промахом)."""
+    if checked_at is None:
+        return None
+    try:
+        age = now - float(checked_at)
+    except (TypeError, ValueError):
+        log_debug(f"cookie_file_is_valid: повреждённая запись кэша проверки куков: {checked_at!r}")
+        return None
+    return age if age >= 0 else None
+
 def cookie_file_is_valid(platform: str, cookie_path: str, test_url: str = None) -> bool:
+    """
+    Проверяет, «жив» ли куки-файл (см. _probe_cookie_file); результат для неизменного файла берётся из кэша.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    key = _cookie_verdict_key(platform, cookie_path)
+    if key is not None:
+        if key in _COOKIE_VERDICTS:
+            log_debug(f"cookie_file_is_valid: вердикт из памяти процесса для {cookie_path}: {_COOKIE_VERDICTS[key]}")
+            return _COOKIE_VERDICTS[key]
+        age = _cookie_check_age(_load_json_cache(COOKIE_CHECK_CACHE_FILE).get(key), time.time())
+        if age is not None and age < COOKIE_CHECK_TTL:
+            log_debug(f"cookie_file_is_valid: {cookie_path} не менялся и прошёл проверку {int(age)} с назад")
+            _COOKIE_VERDICTS[key] = True
+            return True
+    verdict = _probe_cookie_file(platform, cookie_path, test_url)
+    if key is not None:
+        _COOKIE_VERDICTS[key] = verdict
+        if verdict and COOKIE_CHECK_TTL > 0:
+            now = time.time()
+            data = {}
+            for k, v in _load_json_cache(COOKIE_CHECK_CACHE_FILE).items():
+                age = _cookie_check_age(v, now)
+                if age is not None and age < COOKIE_CHECK_TTL:
+                    data[k] = v
+            data[key] = now
+            _save_json_cache(COOKIE_CHECK_CACHE_FILE, data, private=True)
+    return verdict
+
+def forget_cookie_verdict(cookie_path: str):
+    """
+    Забывает сохранённые вердикты проверки куки-файла (например, когда сайт ответил 403 с этими куками).
+    Поддержка: Windows, MacOS, Linux.
+    """
+    try:
+        marker = f"|{Path(cookie_path).resolve()}|"
+    except OSError:
+        return
+    for key in [k for k in _COOKIE_VERDICTS if marker in k]:
+        _COOKIE_VERDICTS.pop(key, None)
+    data = _load_json_cache(COOKIE_CHECK_CACHE_FILE)
+    kept = {k: v for k, v in data.items() if marker not in k}
+    if len(kept) != len(data):
+        _save_json_cache(COOKIE_CHECK_CACHE_FILE, kept, private=True)
+        log_debug(f"forget_cookie_verdict: сброшен вердикт для {cookie_path}")
+
+def _probe_cookie_file(platform: str, cookie_path: str, test_url: str = None) -> bool:
     """
     Проверяет, «жив» ли куки-файл по реальной ссылке (например, на видео).
     Более терпимая логика: при проверке НЕ подставляем extractor_args (PO token),
@@ -1310,7 +2128,7 @@ def cookie_file_is_valid(platform: str, cookie_path: str, test_url: str = None)
             # т.к. это может вызвать принудительный SABR-путь в yt-dlp и скрыть форматы.
             log_debug("cookie_file_is_valid: пропущены extractor_args для youtube (проверка куков, чтобы не провоцировать SABR)")
 
-        with yt_dlp.YoutubeDL(opts) as ydl:
+        with pooled_ydl(opts) as ydl:
             ydl.extract_info(test_url, download=False)
         return True
 
@@ -1339,45 +2157,127 @@ def cookie_file_is_valid(platform: str, cookie_path: str, test_url: str = None)
         log_debug(f"cookie_file_is_valid: исключение при проверке куков: {exc}\n{traceback.format_exc()}")
         return False
 
-def detect_ffmpeg_path():
+_FFMPEG_INFO = None  # Результат поиска ffmpeg в этом процессе (dict или {} если не найден)
+_FFMPEG_LOCK = threading.Lock()
+
+def _locate_ffmpeg():
     """
     Ищет ffmpeg (ffmpeg.exe для Windows, ffmpeg для MacOS/Linux) в локальной папке и в системном PATH.
-    Возвращает путь к ffmpeg или None.
-    Поддержка: Windows, MacOS, Linux.
+    Возвращает (путь к ffmpeg, путь к ffprobe рядом с ним или None) либо (None, None).
     """
     script_dir = Path(sys.argv[0]).resolve().parent
     ffmpeg_filename = "ffmpeg.exe" if system == "windows" else "ffmpeg"
     ffprobe_filename = "ffprobe.exe" if system == "windows" else "ffprobe"
     local_path = script_dir / ffmpeg_filename
     log_debug(f"Поиск ffmpeg: Проверяем локальный путь: {local_path}")
+    found = None
     if Path(local_path).is_file():
         log_debug(f"FFmpeg найден по локальному пути: {local_path}")
-        # Если рядом есть ffprobe — добавим эту директорию в PATH, чтобы ffmpeg.probe и yt-dlp могли его найти
+        found = local_path
+    else:
+        system_path = which("ffmpeg")
+        log_debug(f"Поиск ffmpeg: Проверяем системный PATH: {system_path}")
+        if system_path and Path(system_path).is_file():
+            log_debug(f"FFmpeg найден в системном PATH: {system_path}")
+            found = Path(system_path)
+    if not found:
+        log_debug("FFmpeg не найден ни по локальному пути, ни в системном PATH.")
+        return None, None
+    possible_ffprobe = Path(found).resolve().parent / ffprobe_filename
+    return found, (possible_ffprobe if possible_ffprobe.exists() else None)
+
+def _probe_ffmpeg_capabilities(ffmpeg_bin: str) -> dict:
+    """
+    Однократный опрос возможностей ffmpeg: версия, поддерживаемые muxer'ы и входные протоколы.
+    Результат сохраняется в FFMPEG_CACHE_FILE, чтобы не запускать ffmpeg ради этого при каждом старте.
+    """
+    caps = {'version': None, 'muxers': [], 'protocols': []}
+
+    def _run(*args):
         try:
-            ff_dir = str(Path(local_path).resolve().parent)
-            possible_ffprobe = Path(ff_dir) / ffprobe_filename
-            if possible_ffprobe.exists():
-                os.environ['PATH'] = ff_dir + os.pathsep + os.environ.get('PATH', '')
-                log_debug(f"Добавлена директория с ffprobe в PATH: {ff_dir}")
+            res = subprocess.run([ffmpeg_bin, "-hide_banner", *args], capture_output=True, text=True, timeout=15,
+                                 encoding='utf-8', errors='replace')
+            return res.stdout or ""
         except Exception as e:
-            log_debug(f"detect_ffmpeg_path: не удалось добавить ffprobe в PATH: {e}")
-        return local_path
-    system_path = which("ffmpeg")
-    log_debug(f"Поиск ffmpeg: Проверяем системный PATH: {system_path}")
-    if system_path and Path(system_path).is_file():
-        # Если ffprobe рядом в той же папке — тоже убедимся, что PATH корректен
-        try:
-            ff_dir = str(Path(system_path).resolve().parent)
-            possible_ffprobe = Path(ff_dir) / ffprobe_filename
-            if possible_ffprobe.exists():
+            log_debug(f"_probe_ffmpeg_capabilities: {' '.join(args)} -> {e}")
+            return ""
+
+    m = re.search(r'ffmpeg version (\S+)', _run("-version"))
+    if m:
+        caps['version'] = m.group(1)
+    # Строки вида " E  matroska        Matroska" / " DE mp4 ..." — берём muxer'ы (флаг E)
+    for line in _run("-muxers").splitlines():
+        mm = re.match(r'^\s*D?E\s+(\S+)', line)
+        if mm:
+            caps['muxers'].extend(mm.group(1).split(','))
+    # Вывод -protocols: "Input:" затем список, "Output:" затем список — нужны входные
+    section = None
+    for line in _run("-protocols").splitlines():
+        stripped = line.strip()
+        if stripped.endswith(':'):
+            section = stripped[:-1].lower()
+        elif stripped and section == 'input':
+            caps['protocols'].append(stripped)
+    log_debug(f"_probe_ffmpeg_capabilities: версия {caps['version']}, muxers: {len(caps['muxers'])}, protocols: {caps['protocols']}")
+    return caps
+
+def get_ffmpeg_info() -> dict:
+    """
+    Возвращает сведения о ffmpeg: {'ffmpeg', 'ffprobe', 'version', 'muxers', 'protocols'} или {} если ffmpeg не найден.
+    Поиск выполняется один раз за процесс; результат вместе с возможностями ffmpeg хранится в FFMPEG_CACHE_FILE
+    и переиспользуется, пока не изменились PATH, папка скрипта и mtime бинарника.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    global _FFMPEG_INFO
+    if _FFMPEG_INFO is not None:
+        return _FFMPEG_INFO
+    with _FFMPEG_LOCK:
+        if _FFMPEG_INFO is not None:
+            return _FFMPEG_INFO
+        key = f"{Path(sys.argv[0]).resolve().parent}|{os.environ.get('PATH', '')}"
+        cache = _load_json_cache(FFMPEG_CACHE_FILE)
+        info = None
+        if cache.get('key') == key and cache.get('ffmpeg'):
+            try:
+                if os.stat(cache['ffmpeg']).st_mtime_ns == cache.get('mtime'):
+                    info = cache
+                    log_debug(f"get_ffmpeg_info: ffmpeg из кэша -> {cache['ffmpeg']} ({cache.get('version')})")
+            except OSError:
+                pass
+        if info is None:
+            ffmpeg_path, ffprobe_path = _locate_ffmpeg()
+            if not ffmpeg_path:
+                _FFMPEG_INFO = {}
+                return _FFMPEG_INFO
+            info = {
+                'key': key,
+                'ffmpeg': str(ffmpeg_path),
+                'ffprobe': str(ffprobe_path) if ffprobe_path else None,
+                'mtime': os.stat(ffmpeg_path).st_mtime_ns,
+                **_probe_ffmpeg_capabilities(str(ffmpeg_path)),
+            }
+            _save_json_cache(FFMPEG_CACHE_FILE, info)
+        # Если рядом есть ffprobe — добавим эту директорию в PATH (один раз), чтобы ffmpeg.probe и yt-dlp могли его найти
+        if info.get('ffprobe'):
+            ff_dir = str(Path(info['ffprobe']).parent)
+            if ff_dir not in os.environ.get('PATH', '').split(os.pathsep):
                 os.environ['PATH'] = ff_dir + os.pathsep + os.environ.get('PATH', '')
-                log_debug(f"Добавлена директория с ffprobe в PATH (system): {ff_dir}")
-        except Exception as e:
-            log_debug(f"detect_ffmpeg_path: не удалось обновить PATH для ffprobe: {e}")
-        log_debug(f"FFmpeg найден в системном PATH: {system_path}")
-        return system_path
-    log_debug("FFmpeg не найден ни по локальному пути, ни в системном PATH.")
-    return None
+                log_debug(f"Добавлена директория с ffprobe в PATH: {ff_dir}")
+        _FFMPEG_INFO = info
+        return _FFMPEG_INFO
+
+def ffmpeg_supports(kind: str, name: str) -> bool:
+    """Поддерживает ли найденный ffmpeg muxer/протокол (kind: 'muxers' или 'protocols'), по данным get_ffmpeg_info."""
+    return name in (get_ffmpeg_info().get(kind) or [])
+
+def detect_ffmpeg_path():
+    """
+    Ищет ffmpeg (ffmpeg.exe для Windows, ffmpeg для MacOS/Linux) в локальной папке и в системном PATH.
+    Возвращает путь к ffmpeg или None. Результат запоминается (см. get_ffmpeg_info).
+    Поддержка: Windows, MacOS, Linux.
+    """
+    path = get_ffmpeg_info().get('ffmpeg')
+    return Path(path) if path else None
 
 def clean_url_by_platform(platform: str, url: str) -> str:
     """
@@ -1485,10 +2385,160 @@ def save_cookies_to_netscape_file(cj: http.cookiejar.CookieJar, filename: str):
         log_debug(f"Ошибка при сохранении куков в файл {filename}:\n{traceback.format_exc()}")
         return False
 
-def get_cookies_for_platform(platform: str, cookie_file: str, url: str = None, force_browser: bool = False) -> str | None:
+# --- Кэш куков, извлечённых из браузера ---
+# Чтение хранилища куков браузера (копирование SQLite-базы и расшифровка) медленное, поэтому прочитанная
+# банка куков используется повторно BROWSER_COOKIE_MEMORY_TTL секунд (все видео плейлиста берут одну и ту же).
+# Ошибки чтения (например, база заблокирована открытым браузером) не запоминаются: после закрытия браузера
+# следующая попытка читает его заново. refresh=True (обновление куков после ошибки авторизации) — читать всегда.
+# Один и тот же браузер не читается параллельно; чтение разных браузеров друг друга не блокирует.
+PLATFORM_COOKIE_DOMAINS = {
+    'youtube':  ['youtube.com', 'google.com'],  # fallback
+    'facebook': ['facebook.com'],
+    'vimeo':    ['vimeo.com'],
+    'rutube':   ['rutube.ru'],
+    'vk':       ['vk.com'],
+    'telegram': ['t.me', 'telegram.me'],
+}
+_BROWSER_JARS = {}  # {(браузер, домены): (время чтения, CookieJar)}
+_BROWSER_READ_LOCKS = {}  # {(браузер, домены): Lock}
+_BROWSER_COOKIE_FILES = {}  # {(браузер, домены): (CookieJar, путь к файлу)}
+_BROWSER_JARS_LOCK = threading.Lock()
+
+def get_browser_cookie_jar(browser: str, domains=None, refresh: bool = False):
+    """
+    Возвращает куки браузера ('chrome' / 'firefox'), читая браузер не чаще раза в BROWSER_COOKIE_MEMORY_TTL секунд.
+    domains — домены для browser_cookie3 (берётся первый непустой результат, как раньше в get_cookies_for_platform);
+    None — все куки браузера через экстрактор yt-dlp (то же, что делает опция cookiesfrombrowser).
+    refresh=True — прочитать браузер заново. Ошибки чтения пробрасываются и не кэшируются.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    key = (browser, tuple(domains) if domains else None)
+    with _BROWSER_JARS_LOCK:
+        read_lock = _BROWSER_READ_LOCKS.setdefault(key, threading.Lock())
+    with read_lock:
+        with _BROWSER_JARS_LOCK:
+            cached = _BROWSER_JARS.get(key)
+        if cached and not refresh and time.time() - cached[0] < BROWSER_COOKIE_MEMORY_TTL:
+            return cached[1]
+        started = time.time()
+        try:
+            if domains:
+                loader = {'chrome': browser_cookie3.chrome, 'firefox': browser_cookie3.firefox}[browser]
+                jar = None
+                for domain in domains:
+                    log_debug(f"Пробуем домен {domain} в {browser}")
+                    jar = loader(domain_name=domain)
+                    if jar:
+                        break
+            else:
+                from yt_dlp.cookies import extract_cookies_from_browser
+                jar = extract_cookies_from_browser(browser)
+        except Exception as e:
+            log_debug(f"get_browser_cookie_jar: {key} не удалось прочитать: {e}")
+            raise
+        with _BROWSER_JARS_LOCK:
+            _BROWSER_JARS[key] = (time.time(), jar)
+        log_debug(f"get_browser_cookie_jar: {key} прочитан за {time.time() - started:.2f}s")
+        return jar
+
+def cookie_domains_for(platform: str, url: str = None) -> list:
+    """Домены, куки которых нужны для platform/url: известные домены платформы и хост самой ссылки."""
+    from urllib.parse import urlparse
+    domains = list(PLATFORM_COOKIE_DOMAINS.get(platform, []))
+    host = (urlparse(url).hostname or '').lower() if url else ''
+    if host.startswith('www.'):
+        host = host[4:]
+    if host and host not in domains:
+        domains.append(host)
+    return domains
+
+def _cookie_domain_matches(cookie_domain: str, domains) -> bool:
+    """Кука относится к одному из доменов: сам домен, его поддомен или родительский домен хоста."""
+    d = (cookie_domain or '').lstrip('.').lower()
+    return bool(d) and any(d == x or d.endswith('.' + x) or x.endswith('.' + d) for x in domains)
+
+def _purge_browser_cookie_files():
+    """
+    Удаляет файлы куков браузера, оставшиеся от прошлых запусков (например, после аварийного завершения):
+    старше BROWSER_COOKIE_CACHE_TTL, а при TTL = 0 — старше 12 часов (свежие могут принадлежать параллельному запуску).
+    """
+    max_age = BROWSER_COOKIE_CACHE_TTL if BROWSER_COOKIE_CACHE_TTL > 0 else 12 * 3600
+    try:
+        for path in CACHE_DIR.glob("browser_cookies_*.txt"):
+            try:
+                if time.time() - path.stat().st_mtime > max_age:
+                    path.unlink()
+                    log_debug(f"_purge_browser_cookie_files: удалён {path}")
+            except OSError:
+                continue
+    except OSError:
+        pass
+
+def browser_cookie_file(browser: str, domains, refresh: bool = False) -> str | None:
+    """
+    Возвращает путь к Netscape-файлу с куками браузера для передачи yt-dlp (вместо cookiesfrombrowser).
+    В файл попадают только куки доменов domains (см. cookie_domains_for), а не все куки браузера.
+    Файл (права 0600) пересоздаётся, только когда браузер прочитан заново, и удаляется при выходе;
+    при BROWSER_COOKIE_CACHE_TTL > 0 он переиспользуется и в следующих запусках, пока не устарел.
+    None — куки браузера получить не удалось.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    import hashlib
+    domains = tuple(sorted(set(domains)))
+    if not domains:
+        return None
+    key = (browser, domains)
+    tag = hashlib.sha1('|'.join(domains).encode('utf-8')).hexdigest()[:10]
+    path = CACHE_DIR / f"browser_cookies_{browser}_{tag}.txt"
+    with _BROWSER_JARS_LOCK:
+        first_use = not _BROWSER_COOKIE_FILES
+        ready = _BROWSER_COOKIE_FILES.get(key)
+    if first_use:
+        _purge_browser_cookie_files()
+    if ready and ready[0] is None and not refresh and Path(ready[1]).is_file():
+        return ready[1]  # файл из прошлого запуска (BROWSER_COOKIE_CACHE_TTL > 0)
+    try:
+        if (not ready and not refresh and BROWSER_COOKIE_CACHE_TTL > 0 and path.is_file()
+                and time.time() - path.stat().st_mtime < BROWSER_COOKIE_CACHE_TTL):
+            log_debug(f"browser_cookie_file: используем сохранённые куки {browser} ({path})")
+            with _BROWSER_JARS_LOCK:
+                _BROWSER_COOKIE_FILES[key] = (None, str(path))
+            return str(path)
+        jar = get_browser_cookie_jar(browser, refresh=refresh)
+        if ready and ready[0] is jar and Path(ready[1]).is_file():
+            return ready[1]
+        cookies = [c for c in jar if _cookie_domain_matches(c.domain, domains)]
+        if not cookies:
+            log_debug(f"browser_cookie_file: в {browser} нет куков для {domains}")
+            return None
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        # куки — секрет: файл доступен только владельцу
+        os.close(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+        try:
+            mozilla_cj = http.cookiejar.MozillaCookieJar(str(tmp))
+            for cookie in cookies:
+                mozilla_cj.set_cookie(cookie)
+            mozilla_cj.save(ignore_discard=True, ignore_expires=True)
+            os.replace(tmp, path)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        if BROWSER_COOKIE_CACHE_TTL <= 0 and not ready:
+            atexit.register(lambda: path.unlink(missing_ok=True))
+        log_debug(f"browser_cookie_file: {len(cookies)} куков {browser} для {domains} -> {path}")
+    except Exception as e:
+        log_debug(f"browser_cookie_file: куки {browser} недоступны: {e}")
+        return None
+    with _BROWSER_JARS_LOCK:
+        _BROWSER_COOKIE_FILES[key] = (jar, str(path))
+    return str(path)
+
+def get_cookies_for_platform(platform: str, cookie_file: str, url: str = None, force_browser: bool = False,
+                             refresh_browser: bool = False) -> str | None:
     """
     Пытается получить куки: сначала из файла, затем из браузера.
     Возвращает путь к файлу куков, если куки успешно получены/загружены, иначе None.
+    refresh_browser=True — браузер читается заново, даже если его куки недавно уже читались.
     Safari на MacOS не поддерживается.
     Поддержка: Windows, MacOS, Linux.
     """
@@ -1516,26 +2566,12 @@ def get_cookies_for_platform(platform: str, cookie_file: str, url: str = None, f
     if system == "darwin":
         print(Fore.YELLOW + "Safari не поддерживается для автоматического получения куков. Используйте Chrome или Firefox, либо экспортируйте куки вручную." + Style.RESET_ALL)
     browsers_to_try = ['chrome', 'firefox']
-    browser_functions = {
-        'chrome': browser_cookie3.chrome,
-        'firefox': browser_cookie3.firefox,
-    }
-
-    # Словарь доменов для каждой платформы
-    platform_domains = {
-        'youtube':  ['youtube.com', 'google.com'],  # fallback
-        'facebook': ['facebook.com'],
-        'vimeo':    ['vimeo.com'],
-        'rutube':   ['rutube.ru'],
-        'vk':       ['vk.com'],
-        'telegram': ['t.me', 'telegram.me'], 
-    }
 
     print(Fore.YELLOW + f"Примечание: Для автоматического получения куков из браузера (Chrome/Firefox), "
           f"убедитесь, что он закрыт или неактивен." + Style.RESET_ALL)
 
     # Получаем список доменов для текущей платформы
-    domains = platform_domains.get(platform, [])
+    domains = PLATFORM_COOKIE_DOMAINS.get(platform, [])
     extracted_cj = None
 
     # Перебираем браузеры для попытки извлечения куков
@@ -1544,12 +2580,8 @@ def get_cookies_for_platform(platform: str, cookie_file: str, url: str = None, f
             print(Fore.GREEN + f"Пытаемся получить куки для {platform.capitalize()} из браузера ({browser})." + Style.RESET_ALL)
             log_debug(f"Попытка получить куки для {platform.capitalize()} из браузера: {browser}")
 
-            # Перебираем домены, пробуем получить куки
-            for domain in domains:
-                log_debug(f"Пробуем домен {domain} в {browser}")
-                extracted_cj = browser_functions[browser](domain_name=domain)
-                if extracted_cj:
-                    break
+            # Перебираем домены, пробуем получить куки (недавно прочитанные куки браузера берутся из памяти)
+            extracted_cj = get_browser_cookie_jar(browser, domains, refresh=refresh_browser) if domains else None
 
             # Если удалось получить куки — сохраняем их в файл
             if extracted_cj:
@@ -1562,7 +2594,7 @@ def get_cookies_for_platform(platform: str, cookie_file: str, url: str = None, f
                     log_debug("Не удалось сохранить извлеченные куки в файл.")
                     return None
 
-        except BrowserCookieError as e:
+        except browser_cookie3.BrowserCookieError as e:
             # Ошибка специфична для browser_cookie3 — выводим причину
             print(Fore.RED + f"Не удалось получить куки из браузера ({browser}) для {platform.capitalize()}: {e}" + Style.RESET_ALL)
             log_debug(f"BrowserCookieError при получении куков из {browser} для {platform.capitalize()}:\n{traceback.format_exc()}")
@@ -1578,12 +2610,326 @@ def get_cookies_for_platform(platform: str, cookie_file: str, url: str = None, f
     log_debug(f"Автоматическое получение куков для {platform.capitalize()} не удалось.")
     return None
 
-def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None):
+# --- Признак фонового потока ---
+# В фоновых потоках (предзагрузка информации) нельзя спрашивать пользователя и печатать сообщения
+# вперемешку с прогрессом загрузки: такие запросы делают одну «тихую» попытку, а при неудаче
+# основной цикл повторяет их обычным образом.
+_THREAD_STATE = threading.local()
+
+def in_background_thread() -> bool:
+    """Возвращает True, если текущий поток помечен как фоновый (без диалогов с пользователем)."""
+    return getattr(_THREAD_STATE, 'background', False)
+
+# --- Пул экземпляров YoutubeDL ---
+# Создание YoutubeDL заново на каждый запрос перечитывает куки, пересобирает список экстракторов
+# и теряет пул HTTP-соединений. Экземпляры с одинаковыми эффективными опциями переиспользуются:
+# pooled_ydl() выдаёт свободный экземпляр с той же сигнатурой опций или создаёт новый.
+# YoutubeDL загружает куки-файл при создании и записывает свой jar обратно в close(), поэтому в сигнатуру
+# входит отпечаток содержимого куки-файла: после обновления файла старый экземпляр не переиспользуется,
+# а при закрытии не затирает новые куки своими (см. _close_ydl).
+_YDL_POOL = []  # [(сигнатура, экземпляр)] — свободные экземпляры, от давно использованных к недавним
+_YDL_POOL_LOCK = threading.Lock()
+
+def _ydl_signature(opts: dict) -> str:
     """
-    Получает информацию о видео/плейлисте через yt-dlp.
+    Сигнатура опций YoutubeDL: служебные ключи скрипта ('_tried_missing_pot' и т.п.) не учитываются,
+    объекты (logger, хуки) сравниваются по идентичности, куки-файл — по содержимому.
+    """
+    import hashlib
+    clean = {k: v for k, v in opts.items() if not k.startswith('_')}
+    if clean.get('cookiefile'):
+        clean['cookiefile'] = cookie_file_fingerprint(clean['cookiefile']) or clean['cookiefile']
+    raw = json.dumps(clean, sort_keys=True, default=lambda o: f"{type(o).__name__}@{id(o)}")
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _ydl_opts_snapshot(opts: dict) -> dict:
+    """
+    Копия опций для YoutubeDL: он хранит переданный dict как есть, а скрипт между попытками
+    меняет ydl_opts (merge_extractor_args и т.п.) — без копии изменения «протекли» бы в уже созданный экземпляр.
+    """
+    snap = dict(opts)
+    for key in ('extractor_args', 'http_headers'):
+        if isinstance(snap.get(key), dict):
+            snap[key] = json.loads(json.dumps(snap[key], default=str))
+    return snap
+
+def new_ydl(opts: dict):
+    """
+    Создаёт YoutubeDL по снимку опций и запоминает отпечаток куки-файла, с которым он загрузил куки.
     Поддержка: Windows, MacOS, Linux.
     """
-    log_debug(f"get_video_info: Итоговая платформа: {platform}, URL: {url}")
+    ydl = yt_dlp.YoutubeDL(_ydl_opts_snapshot(opts))
+    cookiefile = ydl.params.get('cookiefile')
+    ydl._vdl_cookie_fp = cookie_file_fingerprint(cookiefile) if cookiefile else None
+    return ydl
+
+@contextmanager
+def pooled_ydl(opts: dict):
+    """
+    Контекстный менеджер: экземпляр YoutubeDL из пула (или новый) для опций opts.
+    После использования экземпляр возвращается в пул; при исключении, отличном от DownloadError, — закрывается.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    sig = _ydl_signature(opts)
+    ydl = None
+    with _YDL_POOL_LOCK:
+        for i in range(len(_YDL_POOL) - 1, -1, -1):
+            if _YDL_POOL[i][0] == sig:
+                ydl = _YDL_POOL.pop(i)[1]
+                break
+    if ydl is None:
+        ydl = new_ydl(opts)
+    else:
+        log_debug(f"pooled_ydl: повторное использование YoutubeDL ({sig[:10]})")
+    reusable = True
+    try:
+        yield ydl
+    except DownloadError:
+        raise
+    except BaseException:
+        reusable = False
+        raise
+    finally:
+        evicted = []
+        if reusable and YDL_POOL_MAX_IDLE > 0:
+            ydl._download_retcode = 0
+            with _YDL_POOL_LOCK:
+                _YDL_POOL.append((sig, ydl))
+                while len(_YDL_POOL) > YDL_POOL_MAX_IDLE:
+                    evicted.append(_YDL_POOL.pop(0)[1])
+        else:
+            evicted.append(ydl)
+        for old in evicted:
+            _close_ydl(old)
+
+def _close_ydl(ydl):
+    """
+    Закрывает экземпляр YoutubeDL (сохранение куков, закрытие соединений), не пропуская исключений.
+    Если куки-файл изменился после создания экземпляра (обновлён из браузера), устаревший jar в него не записывается.
+    """
+    try:
+        cookiefile = ydl.params.get('cookiefile')
+        if cookiefile and cookie_file_fingerprint(cookiefile) != getattr(ydl, '_vdl_cookie_fp', None):
+            log_debug(f"_close_ydl: куки-файл {cookiefile} изменился, устаревшие куки экземпляра не сохраняются")
+            ydl.params['cookiefile'] = None
+        ydl.close()
+    except Exception as e:
+        log_debug(f"_close_ydl: {e}")
+
+@atexit.register
+def close_ydl_pool():
+    """Закрывает все экземпляры YoutubeDL из пула (вызывается при выходе)."""
+    with _YDL_POOL_LOCK:
+        items = list(_YDL_POOL)
+        _YDL_POOL.clear()
+    for _, ydl in items:
+        _close_ydl(ydl)
+
+# --- Дисковый кэш метаданных get_video_info ---
+# Ключ — URL + опции, влияющие на результат (extract_flat, extractor_args, файл куков / браузер).
+# Списки плейлистов живут METADATA_TTL_LISTING, полная информация о видео — METADATA_TTL_VIDEO
+# (но не дольше параметра expire= в ссылках на потоки). Трансляции не кэшируются.
+# Использование отмечается mtime файла; при превышении METADATA_CACHE_MAX_MB удаляются самые старые записи.
+
+def _metadata_cache_key(url: str, ydl_opts: dict, cookie_file_path=None, cookiesfrombrowser=None) -> str:
+    import hashlib
+    ident = {
+        'url': url,
+        'extract_flat': bool(ydl_opts.get('extract_flat')),
+        'extractor_args': ydl_opts.get('extractor_args') or {},
+        'cookiefile': str(Path(cookie_file_path).resolve()) if cookie_file_path else None,
+        'cookiesfrombrowser': list(cookiesfrombrowser) if cookiesfrombrowser else None,
+    }
+    return hashlib.sha1(json.dumps(ident, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _metadata_expiry(info: dict, now: float) -> float | None:
+    """Момент, до которого запись можно отдавать из кэша; None — не кэшировать (трансляции и т.п.)."""
+    if info.get('is_live') or info.get('live_status') in ('is_live', 'is_upcoming', 'post_live'):
+        return None
+    if info.get('_type') == 'playlist':
+        return now + METADATA_TTL_LISTING
+    expires = now + METADATA_TTL_VIDEO
+    # Ссылки YouTube/googlevideo содержат expire=<unix time> — не отдаём запись дольше (с запасом 5 минут)
+    for fmt in info.get('formats') or []:
+        m = re.search(r'[?&/]expire[=/](\d{9,11})', str(fmt.get('url') or ''))
+        if m:
+            expires = min(expires, int(m.group(1)) - 300)
+    return expires if expires > now else None
+
+def _metadata_cache_get(key: str):
+    """Возвращает info из кэша или None (запись отсутствует, устарела или повреждена)."""
+    import gzip
+    path = METADATA_CACHE_DIR / f"{key}.json.gz"
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_debug(f"_metadata_cache_get: повреждённая запись {path.name}: {e}")
+        path.unlink(missing_ok=True)
+        return None
+    if time.time() >= float(record.get('expires') or 0):
+        path.unlink(missing_ok=True)
+        return None
+    if SYNC_MODE and (record.get('info') or {}).get('_type') == 'playlist':
+        return None  # при синхронизации список видео всегда свежий, иначе новые загрузки не будут видны
+    try:
+        os.utime(path)  # отметка использования для вытеснения по давности
+    except OSError:
+        pass
+    return record.get('info')
+
+_SECRET_HEADERS = ('cookie', 'authorization', 'proxy-authorization')  # заголовки, которые не пишутся в кэш метаданных
+
+def _strip_info_secrets(obj):
+    """
+    Убирает из info (рекурсивно: formats, requested_formats, entries…) значения куков сессии,
+    которые yt-dlp кладёт в поле 'cookies' и заголовок Cookie, — в кэш на диске они не попадают.
+    При загрузке из кэша yt-dlp заново берёт куки из своего cookiejar.
+    """
+    if isinstance(obj, dict):
+        clean = {}
+        for k, v in obj.items():
+            if k == 'cookies':
+                continue
+            if k == 'http_headers' and isinstance(v, dict):
+                clean[k] = {hk: hv for hk, hv in v.items() if str(hk).lower() not in _SECRET_HEADERS}
+            else:
+                clean[k] = _strip_info_secrets(v)
+        return clean
+    if isinstance(obj, list):
+        return [_strip_info_secrets(v) for v in obj]
+    return obj
+
+def _metadata_cache_put(key: str, url: str, info: dict):
+    """Сохраняет info в кэш (gzip JSON, атомарно, права 0600) и при необходимости вытесняет старые записи."""
+    import gzip
+    import io
+    now = time.time()
+    expires = _metadata_expiry(info, now)
+    if expires is None:
+        return
+    try:
+        if not METADATA_CACHE_DIR.is_dir():
+            METADATA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            os.chmod(METADATA_CACHE_DIR, 0o700)  # на POSIX — каталог доступен только владельцу
+        path = METADATA_CACHE_DIR / f"{key}.json.gz"
+        tmp = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        record = {'url': url, 'saved': now, 'expires': expires,
+                  'info': _strip_info_secrets(yt_dlp.YoutubeDL.sanitize_info(info))}
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as gz, \
+                io.TextIOWrapper(gz, encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        log_debug(f"_metadata_cache_put: не удалось сохранить {url}: {e}")
+        return
+    _metadata_cache_evict()
+
+def _metadata_cache_evict():
+    """Удаляет давно не использованные записи, пока кэш не станет меньше 90% от METADATA_CACHE_MAX_MB."""
+    limit = METADATA_CACHE_MAX_MB * 1024 * 1024
+    try:
+        files = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(METADATA_CACHE_DIR)
+                 if e.name.endswith('.json.gz')]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in files)
+    if total <= limit:
+        return
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= limit * 0.9:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            continue
+    log_debug(f"_metadata_cache_evict: удалено записей: {removed}, размер кэша {total // 1024} КБ")
+
+# --- Архив скачанных видео (SQLite) ---
+# После каждой успешной загрузки download_video записывает (платформа, id видео) в ARCHIVE_FILE.
+# В режиме --sync видео, уже присутствующие в архиве, отбрасываются сразу после плоского списка
+# плейлиста/канала — для них не делается ни одного запроса, скачиваются только новые.
+_ARCHIVE_CONN = None
+_ARCHIVE_LOCK = threading.Lock()
+
+def _archive_conn():
+    """Открывает (однократно) базу архива и создаёт таблицу при первом запуске."""
+    global _ARCHIVE_CONN
+    if _ARCHIVE_CONN is None:
+        Path(ARCHIVE_FILE).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(ARCHIVE_FILE), timeout=10, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " platform TEXT NOT NULL, video_id TEXT NOT NULL, url TEXT, title TEXT, path TEXT,"
+            " downloaded_at REAL NOT NULL, PRIMARY KEY (platform, video_id))"
+        )
+        conn.commit()
+        _ARCHIVE_CONN = conn
+    return _ARCHIVE_CONN
+
+def archive_record(platform: str, video_id, url=None, title=None, path=None):
+    """
+    Записывает видео в архив скачанных (повторная запись обновляет путь и время).
+    Поддержка: Windows, MacOS, Linux.
+    """
+    if not video_id:
+        return
+    try:
+        with _ARCHIVE_LOCK:
+            conn = _archive_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO downloads (platform, video_id, url, title, path, downloaded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (platform, str(video_id), url, title, str(path) if path else None, time.time()),
+            )
+            conn.commit()
+        log_debug(f"archive_record: {platform}/{video_id} -> {path}")
+    except Exception as e:
+        log_debug(f"archive_record: не удалось записать {platform}/{video_id}: {e}")
+
+def archive_known_ids(platform: str) -> set:
+    """
+    Возвращает множество id видео платформы, уже записанных в архив.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    if not Path(ARCHIVE_FILE).is_file():
+        return set()
+    try:
+        with _ARCHIVE_LOCK:
+            rows = _archive_conn().execute("SELECT video_id FROM downloads WHERE platform = ?", (platform,)).fetchall()
+        return {r[0] for r in rows}
+    except Exception as e:
+        log_debug(f"archive_known_ids: ошибка чтения архива: {e}")
+        return set()
+
+def archive_prune_entries(entries, platform: str, title=None):
+    """
+    В режиме --sync убирает из плоского списка видео те, что уже есть в архиве; иначе возвращает список как есть.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    if not SYNC_MODE or not entries:
+        return entries
+    known = archive_known_ids(platform)
+    if isinstance(entries, PlaylistStream):
+        # список ещё не получен — видео из архива отбрасываются по мере поступления
+        entries.skip_ids = known
+        entries.title = title or entries.title
+        return entries
+    kept = [e for e in entries if not (e.get('id') and str(e.get('id')) in known)]
+    skipped = len(entries) - len(kept)
+    if skipped:
+        where = f" в «{title}»" if title else ""
+        print(Fore.GREEN + f"Синхронизация{where}: {skipped} видео уже скачаны ранее и пропущены, новых: {len(kept)}" + Style.RESET_ALL)
+    log_debug(f"archive_prune_entries: {title}: пропущено {skipped} из {len(entries)}")
+    return kept
+
+def _info_ydl_opts(url, platform, cookie_file_path=None) -> dict:
+    """Опции yt-dlp для получения информации (get_video_info, PlaylistStream)."""
     ydl_opts = {'quiet': True, 'skip_download': True}
 
     # --- Добавляем extractor_args для YouTube через централизованную функцию ---
@@ -1598,15 +2944,39 @@ def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None
                 log_debug(f"get_video_info: добавлены extractor_args для youtube (env token): {xa}")
         else:
             log_debug("get_video_info: пропущены extractor_args для youtube (используется deferred AUTO_PO_TOKEN/retry в download_video).")
-    if platform == "youtube" and ("list=" in url or "/playlist" in url):
+    if platform == "youtube" and is_youtube_flat_playlist_url(url):
         ydl_opts['extract_flat'] = True
     if cookie_file_path:
         ydl_opts['cookiefile'] = cookie_file_path
         log_debug(f"get_video_info: Используем cookiefile: {cookie_file_path}")
+    return ydl_opts
+
+def is_youtube_flat_playlist_url(url: str) -> bool:
+    """Ссылка на плейлист YouTube (list= или /playlist), список которого получается без запроса к каждому видео."""
+    return "list=" in url or "/playlist" in url
+
+def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None):
+    """
+    Получает информацию о видео/плейлисте через yt-dlp.
+    Результат кэшируется на диске (METADATA_CACHE) — см. _metadata_cache_get/_metadata_cache_put.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    log_debug(f"get_video_info: Итоговая платформа: {platform}, URL: {url}")
+    ydl_opts = _info_ydl_opts(url, platform, cookie_file_path)
     if cookiesfrombrowser:
         ydl_opts['cookiesfrombrowser'] = cookiesfrombrowser
         log_debug(f"get_video_info: Пробуем cookiesfrombrowser: {cookiesfrombrowser}")
 
+    cache_key = None
+    if METADATA_CACHE:
+        cache_key = _metadata_cache_key(url, ydl_opts, cookie_file_path, cookiesfrombrowser)
+        cached = _metadata_cache_get(cache_key)
+        if cached:
+            log_debug(f"get_video_info: info из кэша метаданных ({cache_key[:12]}) для {url}")
+            if cookie_file_path:
+                cached['__cookiefile__'] = cookie_file_path
+            return cached
+
     log_debug(f"get_video_info: Запрос информации для URL: {url} с опциями: {ydl_opts}")
 
     # Дополнительные флаги для локальных обходов SABR внутри get_video_info
@@ -1615,10 +2985,11 @@ def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None
     ydl_opts.setdefault('_sabr_tries', 0)
     SABR_INDICATORS = ("sabr", "web only has sabr", "gvs po token", "po_token", "formats=missing_pot", "nsig", "challenge solving failed", "Only images are available")
 
+    retry = RetryPolicy()
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             log_debug("get_video_info: Перед вызовом ydl.extract_info")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with pooled_ydl(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False)
             log_debug("get_video_info: После вызова ydl.extract_info")
             if info is None:
@@ -1629,13 +3000,14 @@ def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None
             log_debug(f"get_video_info: extractor={extractor}, _type={info_type}, title={info.get('title', 'N/A')}, id={info.get('id', 'N/A')}")
             if cookie_file_path:
                 info['__cookiefile__'] = cookie_file_path
+            if cache_key:
+                _metadata_cache_put(cache_key, url, info)
             return info
         except DownloadError as e:
             err_text = str(e).lower()
-            retriable = any(key in err_text for key in (
-                "got error:", "read,", "read timed out", "retry", "http error 5", "http error 429", "too many requests"
-            ))
-            log_debug(f"get_video_info: Ошибка при вызове ydl.extract_info: {e}\n{traceback.format_exc()}")
+            err_class = classify_download_error(e)
+            retriable = err_class in ('transport', 'throttle')
+            log_debug(f"get_video_info: Ошибка при вызове ydl.extract_info ({err_class}): {e}\n{traceback.format_exc()}")
 
             # Специальная обработка SABR/PO-token ошибок прямо в get_video_info
             if platform == 'youtube' and any(ind in err_text for ind in SABR_INDICATORS):
@@ -1650,18 +3022,20 @@ def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None
                     ydl_opts['_sabr_tries'] += 1
                     continue
 
-                # b) попробовать отложенный/автоматически найденный токен (AUTO_PO_TOKEN или retrieve)
+                # b) попробовать отложенный/автоматически найденный токен (фоновый поиск или ожидание его результата)
                 if not ydl_opts.get('_tried_auto_po') and ydl_opts['_sabr_tries'] < 3:
-                    token_to_try = AUTO_PO_TOKEN or retrieve_po_token_auto(timeout=6)
+                    token_to_try = get_auto_po_token(timeout=30, test_url=url)
                     if token_to_try:
                         merge_extractor_args(ydl_opts, {'youtube': {'po_token': [token_to_try]}})
                         ydl_opts['_tried_auto_po'] = True
                         ydl_opts['_sabr_tries'] += 1
                         log_debug("get_video_info: SABR -> использован автоматический PO token, повторный запрос.")
-                        try:
-                            print(Fore.YELLOW + "Автоматически получен PO token — повтор запроса информации..." + Style.RESET_ALL)
-                        except Exception:
-                            pass
+                        # в фоновых потоках (предзагрузка, параллельный обход) — только в лог, см. log_debug выше
+                        if not in_background_thread():
+                            try:
+                                print(Fore.YELLOW + "Автоматически получен PO token — повтор запроса информации..." + Style.RESET_ALL)
+                            except Exception:
+                                pass
                         time.sleep(0.5)
                         continue
 
@@ -1673,15 +3047,16 @@ def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None
                     ydl_opts['_tried_missing_pot'] = True
                     ydl_opts['_sabr_tries'] += 1
                     log_debug("get_video_info: SABR -> применён extractor-arg formats=missing_pot и повторяем.")
-                    try:
-                        print(Fore.YELLOW + "Обнаружен SABR. Попытка получить форматы через formats=missing_pot..." + Style.RESET_ALL)
-                    except Exception:
-                        pass
+                    if not in_background_thread():
+                        try:
+                            print(Fore.YELLOW + "Обнаружен SABR. Попытка получить форматы через formats=missing_pot..." + Style.RESET_ALL)
+                        except Exception:
+                            pass
                     time.sleep(0.5)
                     continue
 
                 # d) если всё выше не помогло — один раз попросим пользователя (если интерактивно)
-                if ydl_opts['_sabr_tries'] < 3:
+                if ydl_opts['_sabr_tries'] < 3 and not in_background_thread():
                     try:
                         ans = input(Fore.CYAN + "yt-dlp сообщил о SABR/PO-token проблеме при получении информации. Ввести PO token сейчас (или 'missing' для formats=missing_pot), Enter — пропустить: " + Style.RESET_ALL).strip()
                     except Exception:
@@ -1700,10 +3075,11 @@ def get_video_info(url, platform, cookie_file_path=None, cookiesfrombrowser=None
                         time.sleep(0.5)
                         continue
 
-            # стандартная логика повторов для сетевых ошибок
-            if retriable and attempt < MAX_RETRIES:
-                print(Fore.YELLOW + f"Ошибка получения информации о видео (попытка {attempt}/{MAX_RETRIES}) – повтор через 5 с…" + Style.RESET_ALL)
-                time.sleep(5)
+            # стандартная логика повторов для сетевых ошибок (в фоне не повторяем — это сделает основной цикл)
+            delay = retry.next_delay(err_class, retry_after_seconds(e)) if retriable and not in_background_thread() else None
+            if delay is not None and attempt < MAX_RETRIES:
+                print(Fore.YELLOW + f"Ошибка получения информации о видео (попытка {attempt}/{MAX_RETRIES}) – повтор через {delay:.0f} с…" + Style.RESET_ALL)
+                time.sleep(delay)
                 continue
             else:
                 # не удалось обработать / исчерпаны попытки — пробрасываем
@@ -1725,6 +3101,88 @@ def is_video_unavailable_error(err):
         "has been deleted", "is no longer available"
     ])
 
+# Признаки классов ошибок yt-dlp/HTTP (текст ошибки в нижнем регистре); проверяются по порядку словаря
+ERROR_CLASS_MARKERS = {
+    'sabr':      ("web only has sabr", "sabr", "gvs po token", "po_token", "formats=missing_pot", "nsig", "challenge solving failed"),
+    'throttle':  ("http error 429", "too many requests", "rate limit", "rate-limit"),
+    'auth':      ("http error 401", "http error 403", "403: forbidden", "login required", "log in", "login", "sign in",
+                  "unauthorized", "authentication", "cookies are no longer valid"),
+    'transport': ("got error:", "read,", "timed out", "timeout", "connection", "reset by peer", "broken pipe",
+                  "http error 5", "incomplete", "temporary failure", "ssl", "retry"),
+}
+
+def classify_download_error(err) -> str:
+    """
+    Относит ошибку загрузки к одному из классов:
+    'unavailable' (видео удалено/скрыто/премьера), 'sabr' (SABR/PO token YouTube), 'throttle' (429),
+    'auth' (401/403, требуется вход), 'transport' (обрывы, таймауты, 5xx) или 'other'.
+    От класса зависит реакция: куки обновляются только для 'auth', 'transport' сразу идёт на повтор.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    if is_video_unavailable_error(err):
+        return 'unavailable'
+    err_text = str(err).lower()
+    for err_class, markers in ERROR_CLASS_MARKERS.items():
+        if any(m in err_text for m in markers):
+            return err_class
+    return 'other'
+
+def retry_after_seconds(source) -> float | None:
+    """
+    Извлекает Retry-After (секунды) из ответа requests или из исключения yt-dlp/requests (в т.ч. вложенного).
+    Поддерживаются оба формата заголовка: число секунд и HTTP-дата. None — заголовка нет.
+    """
+    from email.utils import parsedate_to_datetime
+    seen = set()
+    while source is not None and id(source) not in seen:
+        seen.add(id(source))
+        response = source if hasattr(source, 'headers') and not isinstance(source, BaseException) else getattr(source, 'response', None)
+        headers = getattr(response, 'headers', None)
+        value = None
+        try:
+            value = headers.get('Retry-After') if headers is not None else None
+        except Exception:
+            value = None
+        if value:
+            value = str(value).strip()
+            if value.isdigit():
+                return float(value)
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except Exception:
+                return None
+        exc_info = getattr(source, 'exc_info', None)
+        source = (exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None) \
+            or getattr(source, 'cause', None) or getattr(source, '__cause__', None)
+    return None
+
+class RetryPolicy:
+    """
+    Расписание повторов для одного цикла попыток: экспоненциальная пауза со случайным разбросом
+    (RETRY_BASE_DELAYS, RETRY_MAX_DELAY), учёт Retry-After и отдельный запас попыток для каждого класса
+    ошибки (RETRY_BUDGETS; классы — см. classify_download_error, плюс 'fragment' для HLS-фрагментов).
+    Поддержка: Windows, MacOS, Linux.
+    """
+
+    def __init__(self, budgets=None):
+        self.budgets = {**RETRY_BUDGETS, **(budgets or {})}
+        self.used = {}
+
+    def next_delay(self, err_class: str, retry_after=None) -> float | None:
+        """Пауза перед следующим повтором (сек) или None, если запас попыток для класса исчерпан."""
+        used = self.used.get(err_class, 0) + 1
+        if used > self.budgets.get(err_class, self.budgets.get('other', 0)):
+            log_debug(f"RetryPolicy: запас повторов для '{err_class}' исчерпан ({used - 1})")
+            return None
+        self.used[err_class] = used
+        base = RETRY_BASE_DELAYS.get(err_class, RETRY_BASE_DELAYS.get('other', 2.0))
+        delay = min(RETRY_MAX_DELAY, base * 2 ** (used - 1))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after:
+            delay = max(delay, min(float(retry_after), RETRY_AFTER_MAX))
+        log_debug(f"RetryPolicy: '{err_class}' повтор {used}, пауза {delay:.1f}s (Retry-After={retry_after})")
+        return delay
+
 def safe_get_video_info(url: str, platform: str, cookie_file_to_use=None):
     """
     Безопасно получает информацию о видео, пробует разные куки и режимы.
@@ -1733,18 +3191,23 @@ def safe_get_video_info(url: str, platform: str, cookie_file_to_use=None):
     # Если путь к куки-файлу уже получен — используем его
     if cookie_file_to_use:
         try:
-            print(Fore.CYAN + "Получение информации о видео..." + Style.RESET_ALL)
+            if not in_background_thread():
+                print(Fore.CYAN + "Получение информации о видео..." + Style.RESET_ALL)
             return get_video_info(url, platform, cookie_file_to_use)
         except DownloadError as err:
             err_l = str(err).lower()
             need_login = any(x in err_l for x in ("login", "403", "private", "sign in", "unauthorized"))
-            if not need_login:
+            # В фоне куки из браузера не трогаем (возможен системный запрос доступа) — это сделает основной цикл
+            if not need_login or in_background_thread():
                 raise
             # Если требуется авторизация, пробуем cookiesfrombrowser
             for browser in ("chrome", "firefox"):
                 try:
                     log_debug(f"safe_get_video_info: Пробуем cookiesfrombrowser: {browser}")
-                    return get_video_info(url, platform, cookiesfrombrowser=browser)
+                    browser_cookies = browser_cookie_file(browser, cookie_domains_for(platform, url))
+                    if not browser_cookies:
+                        continue
+                    return get_video_info(url, platform, browser_cookies)
                 except DownloadError as err2:
                     log_debug(f"safe_get_video_info: cookiesfrombrowser {browser} не сработал: {err2}")
                     continue
@@ -1782,11 +3245,16 @@ def safe_get_video_info(url: str, platform: str, cookie_file_to_use=None):
                 if not need_login:
                     raise          # ошибка не про авторизацию → пробрасываем
                 continue           # иначе переходим к след. cookie-файлу
+        if in_background_thread():
+            raise DownloadError("generic: требуется авторизация, куки из браузера в фоне не запрашиваются")
         # (аналогично добавить попытку cookiesfrombrowser)
         for browser in ("chrome", "firefox"):
             try:
                 log_debug(f"safe_get_video_info: generic: Пробуем cookiesfrombrowser: {browser}")
-                return get_video_info(url, platform, cookiesfrombrowser=browser)
+                browser_cookies = browser_cookie_file(browser, cookie_domains_for(platform, url))
+                if not browser_cookies:
+                    continue
+                return get_video_info(url, platform, browser_cookies)
             except DownloadError as err2:
                 log_debug(f"safe_get_video_info: generic: cookiesfrombrowser {browser} не сработал: {err2}")
                 continue
@@ -2524,16 +3992,85 @@ def merge_extractor_args(ydl_opts: dict, new_args: dict):
                 cur[extractor][k] = v
     ydl_opts['extractor_args'] = cur
 
+def _is_full_video_info(info) -> bool:
+    """True, если info — полный результат извлечения одного видео (с форматами), а не плоская запись плейлиста."""
+    return (isinstance(info, dict)
+            and info.get('_type', 'video') == 'video'
+            and bool(info.get('formats') or info.get('url')))
+
+class _YTDLPLogger:
+    """
+    Logger для yt-dlp: сообщения попадают в debug.log по источникам DEBUG_LEVELS
+    ('ytdlp' — служебные, 'progress' — строки [download] NN.N%).
+    Строки прогресса прореживаются: не чаще одной за DEBUG_PROGRESS_SAMPLE_SEC (100% пишется всегда).
+    """
+    def __init__(self):
+        self._last_progress = 0.0
+        self._skipped = 0
+
+    def _progress(self, msg: str):
+        if not debug_enabled('progress', 'info'):
+            return
+        now = time.monotonic()
+        if DEBUG_PROGRESS_SAMPLE_SEC and now - self._last_progress < DEBUG_PROGRESS_SAMPLE_SEC and '100%' not in msg:
+            self._skipped += 1
+            return
+        suffix = f" (пропущено строк прогресса: {self._skipped})" if self._skipped else ""
+        self._last_progress = now
+        self._skipped = 0
+        log_debug("yt-dlp PROGRESS: " + msg + suffix, source='progress', level='info')
+
+    def debug(self, msg):
+        try:
+            msg = str(msg)
+            if msg.startswith('[download]') and '%' in msg:
+                self._progress(msg)
+            elif msg.startswith('[debug] '):
+                log_debug("yt-dlp DEBUG: " + msg, source='ytdlp', level='debug')
+            else:
+                log_debug("yt-dlp INFO: " + msg, source='ytdlp', level='info')
+        except Exception:
+            pass
+
+    def info(self, msg):
+        self.debug(msg)
+
+    def warning(self, msg):
+        try:
+            log_debug("yt-dlp WARNING: " + str(msg), source='ytdlp', level='warning')
+        except Exception:
+            pass
+
+    def error(self, msg):
+        try:
+            log_debug("yt-dlp ERROR: " + str(msg), source='ytdlp', level='error')
+        except Exception:
+            pass
+
 def download_video(
         url, video_id, audio_id,
         output_path, output_name,
         merge_format, platform,
         cookie_file_path=None,
-        subtitle_options=None):
+        subtitle_options=None,
+        info=None):
     """
     Скачивает (и, при необходимости, сливает) выбранные потоки.
+    info — уже полученный get_video_info/safe_get_video_info словарь: если передан, видео
+    не извлекается повторно, а первая попытка загрузки идёт прямо по нему (process_ie_result).
+    Любая успешная загрузка (yt-dlp или ручное скачивание HLS-фрагментов) записывается в архив.
     Возвращает путь к итоговому файлу либо None.
     """
+    meta = {}
+    path = _download_video_impl(url, video_id, audio_id, output_path, output_name, merge_format, platform,
+                                cookie_file_path, subtitle_options, info, meta)
+    if path:
+        archive_record(platform, meta.get('id'), url, meta.get('title'), path)
+    return path
+
+def _download_video_impl(url, video_id, audio_id, output_path, output_name, merge_format, platform,
+                         cookie_file_path, subtitle_options, info, meta):
+    """Тело download_video; meta заполняется id и названием видео для архива."""
     full_tmpl = str(Path(output_path) / f"{output_name}.%(ext)s")
     log_debug(f"yt-dlp outtmpl: {full_tmpl}")
 
@@ -2552,7 +4089,9 @@ def download_video(
     # (будет выставлен при реальной попытке применить formats=missing_pot)
 
     # --- Если выбран m3u8/HLS, используем ручное скачивание ---
-    info = get_video_info(url, platform, cookie_file_path)
+    if not _is_full_video_info(info):
+        info = get_video_info(url, platform, cookie_file_path)
+    meta.update(id=info.get('id'), title=info.get('title'))
     hls_formats = [f for f in info.get('formats', []) if f.get('ext') == 'm3u8' and f.get('url')]
     if hls_formats:
         m3u8_url = hls_formats[-1]['url']
@@ -2587,29 +4126,11 @@ def download_video(
         '_tried_missing_pot': False,  # флаг: уже пробовали formats=missing_pot        
     }
 
-    # --- Добавляем простой logger для yt-dlp, чтобы получить подробный вывод в debug.log ---
-    class _YTDLPLogger:
-        def debug(self, msg):
-            try:
-                log_debug("yt-dlp DEBUG: " + str(msg))
-            except Exception:
-                pass
-        def warning(self, msg):
-            try:
-                log_debug("yt-dlp WARNING: " + str(msg))
-            except Exception:
-                pass
-        def error(self, msg):
-            try:
-                log_debug("yt-dlp ERROR: " + str(msg))
-            except Exception:
-                pass
-
-    # Включаем verbose и наш logger — это добавит внутренние сообщения yt-dlp в debug.log.
-    # (Если потребуется — можно потом удалить/выключить)
+    # Наш logger отправляет сообщения yt-dlp в debug.log с фильтрацией по DEBUG_LEVELS.
+    # verbose включаем, только если внутренние debug-сообщения yt-dlp действительно будут записаны.
     try:
         ydl_opts['logger'] = _YTDLPLogger()
-        ydl_opts['verbose'] = True
+        ydl_opts['verbose'] = debug_enabled('ytdlp', 'debug')
     except Exception:
         pass
 
@@ -2646,7 +4167,6 @@ def download_video(
 
     # --- live_from_start для трансляций ---
     try:
-        info = get_video_info(url, platform, cookie_file_path)
         # Если это трансляция (is_live) или формат m3u8 — добавляем опцию
         if info.get('is_live') or (isinstance(info.get('formats'), list) and any(f.get('ext') == 'm3u8' for f in info['formats'])):
             ydl_opts['live_from_start'] = True
@@ -2671,169 +4191,212 @@ def download_video(
     # ---------------- 3. progress-hook & подготовка --------------------
     Path(output_path).mkdir(parents=True, exist_ok=True)
     last_file = [None]
-    ydl_opts['progress_hooks'] = [lambda d: phook(d, last_file, subtitle_options, output_name, output_path)]
- 
+
+    def remember_meta(d):
+        # id/название скачиваемого видео (для архива), если в info их не было
+        if not meta.get('id'):
+            src = d.get('info_dict') or {}
+            meta.update(id=src.get('id'), title=src.get('title'))
+
+    ydl_opts['progress_hooks'] = [
+        lambda d: phook(d, last_file, subtitle_options, output_name, output_path),
+        remember_meta,
+    ]
+
+
     # ---------------- 4. Загрузка с повторами --------------------------
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            log_debug(f"Запуск yt-dlp, попытка {attempt}/{MAX_RETRIES}: {ydl_opts}")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+    logged_opts = None  # полный ydl_opts пишем в журнал только при первой попытке и при изменениях
+    # Первая попытка — по уже извлечённому info (без повторного запроса к сайту).
+    # При повторах извлекаем заново по URL: ссылки на потоки могли устареть, а опции (куки, extractor_args) — измениться.
+    use_info = _is_full_video_info(info)
+    ydl, ydl_sig = None, None  # экземпляр YoutubeDL живёт между попытками, пока опции не изменились
+    retry = RetryPolicy()
+    try:
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                opts_repr = repr(ydl_opts)
+                if opts_repr != logged_opts:
+                    log_debug(f"Запуск yt-dlp, попытка {attempt}/{MAX_RETRIES}: {ydl_opts}")
+                    logged_opts = opts_repr
+                else:
+                    log_debug(f"Запуск yt-dlp, попытка {attempt}/{MAX_RETRIES} (опции без изменений)")
+                sig = _ydl_signature(ydl_opts)
+                if ydl is None or sig != ydl_sig:
+                    if ydl is not None:
+                        _close_ydl(ydl)
+                    ydl = new_ydl(ydl_opts)
+                    ydl_sig = sig
+                else:
+                    ydl._download_retcode = 0
+                if use_info:
+                    use_info = False
+                    log_debug("download_video: загрузка по ранее извлечённому info (process_ie_result)")
+                    ydl.process_ie_result(ydl.sanitize_info(info), download=True)
+                else:
+                    ydl.download([url])
 
-            # ---- поиск итогового файла ----
-            candidate = last_file[0] or full_tmpl.replace('%(ext)s', merge_format)
-            if Path(candidate).is_file():
-                return candidate
+                # ---- поиск итогового файла ----
+                candidate = last_file[0] or full_tmpl.replace('%(ext)s', merge_format)
+                if Path(candidate).is_file():
+                    return candidate
 
-            base_low = output_name.lower()
-            for fn in Path(output_path).iterdir():
-                if fn.name.lower().startswith(base_low) and fn.name.lower().endswith(f'.{merge_format}'):
-                    return str(fn.resolve())
+                base_low = output_name.lower()
+                for fn in Path(output_path).iterdir():
+                    if fn.name.lower().startswith(base_low) and fn.name.lower().endswith(f'.{merge_format}'):
+                        return str(fn.resolve())
 
-            return None
+                return None
+
+            except DownloadError as e:
+                err_text = str(e).lower()
+                log_debug(f"download_video: DownloadError -> {err_text}")
+
+                # 1) Быстрый fallback для Facebook: при "cannot parse data" попробовать одиночный видеоформат (встроенный звук)
+                if platform == 'facebook' and "cannot parse data" in err_text:
+                    cur_fmt = ydl_opts.get('format', '')
+                    if '+' in cur_fmt and not ydl_opts.get('_tried_fb_simple'):
+                        solo = cur_fmt.split('+', 1)[0]
+                        log_debug(f"download_video: Facebook parse error — changing format {cur_fmt} -> {solo} and retrying.")
+                        ydl_opts['format'] = solo
+                        ydl_opts['_tried_fb_simple'] = True
+                        time.sleep(0.8)
+                        continue
 
-        except DownloadError as e:
-            err_text = str(e).lower()
-            log_debug(f"download_video: DownloadError -> {err_text}")
-
-            # 1) Быстрый fallback для Facebook: при "cannot parse data" попробовать одиночный видеоформат (встроенный звук)
-            if platform == 'facebook' and "cannot parse data" in err_text:
-                cur_fmt = ydl_opts.get('format', '')
-                if '+' in cur_fmt and not ydl_opts.get('_tried_fb_simple'):
-                    solo = cur_fmt.split('+', 1)[0]
-                    log_debug(f"download_video: Facebook parse error — changing format {cur_fmt} -> {solo} and retrying.")
-                    ydl_opts['format'] = solo
-                    ydl_opts['_tried_fb_simple'] = True
-                    time.sleep(0.8)
-                    continue
+                # 2) Специальная обработка SABR/PO-token для YouTube — пробуем несколько автоматических обходов перед окончательным raise
+                sabr_indicators = ("sabr", "web only has sabr", "gvs po token", "po_token", "formats=missing_pot", "nsig")
+                if platform == 'youtube' and any(ind in err_text for ind in sabr_indicators):
+                    current_xa = ydl_opts.get('extractor_args') or {}
 
-            # 2) Специальная обработка SABR/PO-token для YouTube — пробуем несколько автоматических обходов перед окончательным raise
-            sabr_indicators = ("sabr", "web only has sabr", "gvs po token", "po_token", "formats=missing_pot", "nsig")
-            if platform == 'youtube' and any(ind in err_text for ind in sabr_indicators):
-                current_xa = ydl_opts.get('extractor_args') or {}
+                    # a) Если есть токен в окружении — применяем и повторяем
+                    if po_token and (not current_xa.get('youtube') or not _ensure_list_simple(current_xa['youtube'].get('po_token'))):
+                        merge_extractor_args(ydl_opts, {'youtube': {'po_token': [po_token]}})
+                        log_debug("download_video: SABR detected — using YTDLP_PO_TOKEN from env and retrying.")
+                        time.sleep(1)
+                        continue
 
-                # a) Если есть токен в окружении — применяем и повторяем
-                if po_token and (not current_xa.get('youtube') or not _ensure_list_simple(current_xa['youtube'].get('po_token'))):
-                    merge_extractor_args(ydl_opts, {'youtube': {'po_token': [po_token]}})
-                    log_debug("download_video: SABR detected — using YTDLP_PO_TOKEN from env and retrying.")
-                    time.sleep(1)
-                    continue
+                    # b) Однократная попытка использовать отложенный токен или автополучить его
+                    if not ydl_opts.get('_tried_auto_po'):
+                        token_to_try = get_auto_po_token(timeout=30, test_url=url)
+                        if token_to_try:
+                            merge_extractor_args(ydl_opts, {'youtube': {'po_token': [token_to_try]}})
+                            ydl_opts['_tried_auto_po'] = True
+                            log_debug("download_video: obtained PO token automatically — retrying with it.")
+                            try:
+                                print(Fore.YELLOW + "Автоматически получен PO token — повтор загрузки..." + Style.RESET_ALL)
+                            except Exception:
+                                pass
+                            if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
+                                os.environ[YTDLP_PO_TOKEN_ENV] = token_to_try
+                            time.sleep(1)
+                            continue
 
-                # b) Однократная попытка использовать отложенный токен или автополучить его
-                if not ydl_opts.get('_tried_auto_po'):
-                    token_to_try = AUTO_PO_TOKEN or retrieve_po_token_auto(timeout=8)
-                    if token_to_try:
-                        merge_extractor_args(ydl_opts, {'youtube': {'po_token': [token_to_try]}})
-                        ydl_opts['_tried_auto_po'] = True
-                        log_debug("download_video: obtained PO token automatically — retrying with it.")
+                    # c) Если разрешён missing_pot через env — применяем немедленно
+                    if allow_missing_pot and not ydl_opts.get('_tried_missing_pot'):
+                        merge_extractor_args(ydl_opts, {'youtube': {'formats': 'missing_pot'}})
+                        ydl_opts['_tried_missing_pot'] = True
+                        log_debug("download_video: applying formats=missing_pot (env allowed) and retrying.")
                         try:
-                            print(Fore.YELLOW + "Автоматически получен PO token — повтор загрузки..." + Style.RESET_ALL)
+                            print(Fore.YELLOW + "Обнаружен SABR. Повтор с extractor-arg formats=missing_pot..." + Style.RESET_ALL)
                         except Exception:
                             pass
-                        if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
-                            os.environ[YTDLP_PO_TOKEN_ENV] = token_to_try
                         time.sleep(1)
                         continue
 
-                # c) Если разрешён missing_pot через env — применяем немедленно
-                if allow_missing_pot and not ydl_opts.get('_tried_missing_pot'):
-                    merge_extractor_args(ydl_opts, {'youtube': {'formats': 'missing_pot'}})
-                    ydl_opts['_tried_missing_pot'] = True
-                    log_debug("download_video: applying formats=missing_pot (env allowed) and retrying.")
-                    try:
-                        print(Fore.YELLOW + "Обнаружен SABR. Повтор с extractor-arg formats=missing_pot..." + Style.RESET_ALL)
-                    except Exception:
-                        pass
-                    time.sleep(1)
-                    continue
+                    # d) Автоматическая одноразовая попытка fallback (если включено)
+                    if AUTO_TRY_MISSING_POT_AS_FALLBACK and not ydl_opts.get('_tried_missing_pot'):
+                        merge_extractor_args(ydl_opts, {'youtube': {'formats': 'missing_pot'}})
+                        ydl_opts['_tried_missing_pot'] = True
+                        log_debug("download_video: automatic fallback formats=missing_pot applied (one-time) and retrying.")
+                        try:
+                            print(Fore.YELLOW + "Обнаружен SABR. Автоматическая попытка применить formats=missing_pot..." + Style.RESET_ALL)
+                        except Exception:
+                            pass
+                        time.sleep(1)
+                        continue
 
-                # d) Автоматическая одноразовая попытка fallback (если включено)
-                if AUTO_TRY_MISSING_POT_AS_FALLBACK and not ydl_opts.get('_tried_missing_pot'):
-                    merge_extractor_args(ydl_opts, {'youtube': {'formats': 'missing_pot'}})
-                    ydl_opts['_tried_missing_pot'] = True
-                    log_debug("download_video: automatic fallback formats=missing_pot applied (one-time) and retrying.")
+                    # e) В конце — интерактивный ввод от пользователя (если запущено интерактивно)
                     try:
-                        print(Fore.YELLOW + "Обнаружен SABR. Автоматическая попытка применить formats=missing_pot..." + Style.RESET_ALL)
+                        ans = input(Fore.CYAN + "yt-dlp сообщил о SABR/PO-token проблеме. Ввести PO token сейчас (или 'missing' для formats=missing_pot), Enter — пропустить: " + Style.RESET_ALL).strip()
                     except Exception:
-                        pass
-                    time.sleep(1)
-                    continue
-
-                # e) В конце — интерактивный ввод от пользователя (если запущено интерактивно)
-                try:
-                    ans = input(Fore.CYAN + "yt-dlp сообщил о SABR/PO-token проблеме. Ввести PO token сейчас (или 'missing' для formats=missing_pot), Enter — пропустить: " + Style.RESET_ALL).strip()
-                except Exception:
-                    ans = ""
-                if ans.lower() == "missing":
-                    merge_extractor_args(ydl_opts, {'youtube': {'formats': 'missing_pot'}})
-                    ydl_opts['_tried_missing_pot'] = True
-                    log_debug("download_video: user selected formats=missing_pot — retrying.")
-                    time.sleep(1)
-                    continue
-                elif ans:
-                    merge_extractor_args(ydl_opts, {'youtube': {'po_token': [ans]}})
-                    log_debug("download_video: user provided PO token — retrying.")
-                    time.sleep(1)
-                    continue
-
-            # --- Далее существующая обработка ретраев/subtitles/HTTP416 и т.д. ---
-            retriable = any(key in err_text for key in (
-                "got error:", "read,", "read timed out", "retry", "http error 5",
-            ))
-
-            # Повтор для ошибок загрузки субтитров
-            is_subtitle_error = "subtitles" in err_text or "caption" in err_text
-            retriable_sub = any(key in err_text for key in (
-                "http error 429", "too many requests", "http error 5", "timed out", "connection", "retry"
-            ))
-
-            log_debug(f"DownloadError: {err_text} (retriable={retriable})")
+                        ans = ""
+                    if ans.lower() == "missing":
+                        merge_extractor_args(ydl_opts, {'youtube': {'formats': 'missing_pot'}})
+                        ydl_opts['_tried_missing_pot'] = True
+                        log_debug("download_video: user selected formats=missing_pot — retrying.")
+                        time.sleep(1)
+                        continue
+                    elif ans:
+                        merge_extractor_args(ydl_opts, {'youtube': {'po_token': [ans]}})
+                        log_debug("download_video: user provided PO token — retrying.")
+                        time.sleep(1)
+                        continue
 
-            if is_subtitle_error and retriable_sub and attempt < MAX_RETRIES:
-                if "http error 429" in err_text or "too many requests" in err_text:
-                    print(Fore.YELLOW + f"Слишком много запросов к субтитрам (429). Ждём 60 секунд..." + Style.RESET_ALL)
-                    log_debug("Получен HTTP 429 при скачивании субтитров, увеличиваем паузу до 60 секунд.")
-                    time.sleep(60)
-                else:
-                    print(Fore.YELLOW + f"Ошибка загрузки субтитров (попытка {attempt}/{MAX_RETRIES}) – повтор через 5 с…" + Style.RESET_ALL)
-                    time.sleep(5)
-                continue
+                # --- Далее существующая обработка ретраев/subtitles/HTTP416 и т.д. ---
+                # Сетевые сбои и 429 повторяем как есть; ошибку авторизации — один раз, предварительно обновив куки
+                err_class = classify_download_error(e)
+                retriable = err_class in ('transport', 'throttle', 'auth')
+
+                # Повтор для ошибок загрузки субтитров
+                is_subtitle_error = "subtitles" in err_text or "caption" in err_text
+                retriable_sub = any(key in err_text for key in (
+                    "http error 429", "too many requests", "http error 5", "timed out", "connection", "retry"
+                ))
+
+                log_debug(f"DownloadError: {err_text} (class={err_class}, retriable={retriable})")
+
+                if is_subtitle_error and retriable_sub and attempt < MAX_RETRIES:
+                    sub_class = 'throttle' if ("http error 429" in err_text or "too many requests" in err_text) else 'transport'
+                    delay = retry.next_delay(sub_class, retry_after_seconds(e))
+                    if delay is not None:
+                        if sub_class == 'throttle':
+                            print(Fore.YELLOW + f"Слишком много запросов к субтитрам (429). Ждём {delay:.0f} секунд..." + Style.RESET_ALL)
+                            log_debug(f"Получен HTTP 429 при скачивании субтитров, пауза {delay:.1f} секунд.")
+                        else:
+                            print(Fore.YELLOW + f"Ошибка загрузки субтитров (попытка {attempt}/{MAX_RETRIES}) – повтор через {delay:.0f} с…" + Style.RESET_ALL)
+                        time.sleep(delay)
+                        continue
 
-            # Обработка HTTP 416 и блокировок .part (оставлена без изменений — переиспользует существующие механизмы)
-            if "http error 416" in err_text or "requested range not satisfiable" in err_text:
-                # (существующий код обработки .part-файлов остаётся здесь — не изменяем)
-                # Далее логика проверки .part-файлов, переименования и т.д.
-                # ... (тот же блок, что и раньше) ...
-                pass
+                # Обработка HTTP 416 и блокировок .part (оставлена без изменений — переиспользует существующие механизмы)
+                if "http error 416" in err_text or "requested range not satisfiable" in err_text:
+                    # (существующий код обработки .part-файлов остаётся здесь — не изменяем)
+                    # Далее логика проверки .part-файлов, переименования и т.д.
+                    # ... (тот же блок, что и раньше) ...
+                    pass
 
-            # Обновление куков перед повтором
-            if retriable and attempt < MAX_RETRIES:
-                cookie_map = {
-                    "youtube": COOKIES_YT,
-                    "facebook": COOKIES_FB,
-                    "vimeo": COOKIES_VI,
-                    "rutube": COOKIES_RT,
-                    "vk": COOKIES_VK,
-                }
-                if platform in cookie_map:
-                    new_cookie_file = get_cookies_for_platform(platform, cookie_map[platform], url)
-                    if new_cookie_file:
-                        cookie_file_path = new_cookie_file
-                        ydl_opts['cookiefile'] = cookie_file_path
-                        log_debug(f"Перед повтором обновили cookiefile: {cookie_file_path}")
-                print(Fore.YELLOW + f"Обрыв загрузки (попытка {attempt}/{MAX_RETRIES}) – повтор через 5 с…" + Style.RESET_ALL)
-                time.sleep(5)
-                continue
+                # Обновление куков перед повтором — только при ошибке авторизации
+                delay = retry.next_delay(err_class, retry_after_seconds(e)) if retriable and attempt < MAX_RETRIES else None
+                if delay is not None:
+                    cookie_map = {
+                        "youtube": COOKIES_YT,
+                        "facebook": COOKIES_FB,
+                        "vimeo": COOKIES_VI,
+                        "rutube": COOKIES_RT,
+                        "vk": COOKIES_VK,
+                    }
+                    if err_class == 'auth' and platform in cookie_map:
+                        # сайт отверг куки — прежний положительный вердикт проверки больше не действителен
+                        forget_cookie_verdict(cookie_file_path or cookie_map[platform])
+                        new_cookie_file = get_cookies_for_platform(platform, cookie_map[platform], url, refresh_browser=True)
+                        if new_cookie_file:
+                            cookie_file_path = new_cookie_file
+                            ydl_opts['cookiefile'] = cookie_file_path
+                            log_debug(f"Перед повтором обновили cookiefile: {cookie_file_path}")
+                    print(Fore.YELLOW + f"Обрыв загрузки (попытка {attempt}/{MAX_RETRIES}) – повтор через {delay:.0f} с…" + Style.RESET_ALL)
+                    time.sleep(delay)
+                    continue
 
-            # Никакие фолбэки не сработали — пробрасываем исключение вверх
-            raise
+                # Никакие фолбэки не сработали — пробрасываем исключение вверх
+                raise
 
-        except Exception as e:
-            # Любая другая ошибка – пробрасываем после логирования
-            log_debug(f"Непредвиденная ошибка (попытка {attempt}): {e}\n{traceback.format_exc()}")
-            raise
+            except Exception as e:
+                # Любая другая ошибка – пробрасываем после логирования
+                log_debug(f"Непредвиденная ошибка (попытка {attempt}): {e}\n{traceback.format_exc()}")
+                raise
 
-    return None  # если вышли из цикла без успеха
+        return None  # если вышли из цикла без успеха
+    finally:
+        if ydl is not None:
+            _close_ydl(ydl)
 
 def download_hls_fragments(m3u8_url, output_path, output_name, cookie_file_path=None, max_retries=None):
     """
@@ -2846,14 +4409,9 @@ def download_hls_fragments(m3u8_url, output_path, output_name, cookie_file_path=
     temp_folder = Path(output_path) / f"{output_name}_frags"
     temp_folder.mkdir(parents=True, exist_ok=True)
 
-    # --- Загружаем куки, если указаны ---
-    cookies = None
-    if cookie_file_path and Path(cookie_file_path).is_file():
-        cj = http.cookiejar.MozillaCookieJar(cookie_file_path)
-        cj.load(ignore_discard=True, ignore_expires=True)
-        cookies = requests.utils.dict_from_cookiejar(cj)
-
-    m3u8_resp = requests.get(m3u8_url, timeout=15, cookies=cookies)
+    # --- Куки берём из общего хранилища (файл разбирается один раз, куки отбираются по хосту) ---
+    session = http_session()
+    m3u8_resp = session.get(m3u8_url, timeout=15, cookies=COOKIE_STORE.cookies_for(cookie_file_path, m3u8_url))
     if not m3u8_resp.ok:
         print(Fore.RED + f"Не удалось получить m3u8: {m3u8_url}" + Style.RESET_ALL)
         return None
@@ -2861,45 +4419,43 @@ def download_hls_fragments(m3u8_url, output_path, output_name, cookie_file_path=
     fragment_urls = [line.strip() for line in lines if line and not line.startswith("#")]
     print(Fore.YELLOW + f"Всего фрагментов: {len(fragment_urls)}" + Style.RESET_ALL)
 
-    for idx, frag_url in enumerate(fragment_urls, 1):
-        frag_name = f"frag_{idx:04d}.ts"
-        frag_path = temp_folder / frag_name
-        success = False
+    def fetch_fragment(idx, frag_url, frag_path):
+        # До max_retries попыток; паузы — по RetryPolicy (при 429 — класс 'throttle' с учётом Retry-After)
+        retry = RetryPolicy(budgets={'fragment': max_retries - 1, 'throttle': max_retries - 1})
         for attempt in range(1, max_retries + 1):
+            err_class, retry_after = 'fragment', None
             try:
-                frag_resp = requests.get(frag_url, timeout=15, cookies=cookies)
+                frag_resp = session.get(frag_url, timeout=15, cookies=COOKIE_STORE.cookies_for(cookie_file_path, frag_url))
                 if frag_resp.ok and frag_resp.content:
                     with open(frag_path, "wb") as f:
                         f.write(frag_resp.content)
                     print(Fore.GREEN + f"Фрагмент {idx}/{len(fragment_urls)} скачан." + Style.RESET_ALL)
-                    success = True
-                    break
-                else:
-                    print(Fore.YELLOW + f"Фрагмент {idx} не скачан (попытка {attempt})." + Style.RESET_ALL)
+                    return True
+                print(Fore.YELLOW + f"Фрагмент {idx} не скачан (попытка {attempt})." + Style.RESET_ALL)
+                if frag_resp.status_code in (429, 503):
+                    err_class, retry_after = 'throttle', retry_after_seconds(frag_resp)
             except Exception as e:
                 print(Fore.RED + f"Ошибка скачивания фрагмента {idx} (попытка {attempt}): {e}" + Style.RESET_ALL)
-            time.sleep(2)
+            if attempt >= max_retries:
+                break
+            delay = retry.next_delay(err_class, retry_after)
+            if delay is None:
+                break
+            time.sleep(delay)
+        return False
+
+    for idx, frag_url in enumerate(fragment_urls, 1):
+        frag_name = f"frag_{idx:04d}.ts"
+        frag_path = temp_folder / frag_name
+        success = fetch_fragment(idx, frag_url, frag_path)
         if not success:
             print(Fore.RED + f"Не удалось скачать фрагмент {idx} после {max_retries} попыток." + Style.RESET_ALL)
             while True:
                 user_input = input(Fore.CYAN + f"Повторить попытки для фрагмента {idx}? (1 — да, 0 — прервать, Enter = 1): " + Style.RESET_ALL).strip()
                 if user_input in ("", "1"):
                     print(Fore.YELLOW + f"Повторяем попытки для фрагмента {idx}..." + Style.RESET_ALL)
-                    # Снова пробуем max_retries раз
-                    for attempt in range(1, max_retries + 1):
-                        try:
-                            frag_resp = requests.get(frag_url, timeout=15, cookies=cookies)
-                            if frag_resp.ok and frag_resp.content:
-                                with open(frag_path, "wb") as f:
-                                    f.write(frag_resp.content)
-                                print(Fore.GREEN + f"Фрагмент {idx}/{len(fragment_urls)} скачан." + Style.RESET_ALL)
-                                success = True
-                                break
-                            else:
-                                print(Fore.YELLOW + f"Фрагмент {idx} не скачан (попытка {attempt})." + Style.RESET_ALL)
-                        except Exception as e:
-                            print(Fore.RED + f"Ошибка скачивания фрагмента {idx} (попытка {attempt}): {e}" + Style.RESET_ALL)
-                        time.sleep(2)
+                    # Снова пробуем max_retries раз (с новым запасом попыток)
+                    success = fetch_fragment(idx, frag_url, frag_path)
                     if success:
                         break  # выходим из while True, продолжаем цикл по фрагментам
                 elif user_input == "0":
@@ -2909,16 +4465,24 @@ def download_hls_fragments(m3u8_url, output_path, output_name, cookie_file_path=
                     print(Fore.YELLOW + "Некорректный ввод. Введите 1 (повторить) или 0 (прервать)." + Style.RESET_ALL)
     # Объединяем фрагменты через ffmpeg
     concat_file = temp_folder / "frags.txt"
-    with open(concat_file, "w", encoding="utf-8") as f:
-        for idx in range(1, len(fragment_urls) + 1):
-            f.write(f"file '{temp_folder / f'frag_{idx:04d}.ts'}'\n")
+    frag_paths = [str(temp_folder / f'frag_{idx:04d}.ts') for idx in range(1, len(fragment_urls) + 1)]
     final_file = Path(output_path) / f"{output_name}.mp4"
     ffmpeg_bin = str(detect_ffmpeg_path() or "ffmpeg")
-    ffmpeg_cmd = [
-         ffmpeg_bin, "-y", "-f", "concat", "-safe", "0",
-         "-i", str(concat_file),
-         "-c", "copy", str(final_file)
-     ]
+    concat_input = "concat:" + "|".join(frag_paths)
+    if ffmpeg_supports('protocols', 'concat') and len(concat_input) < 8000:
+        # MPEG-TS фрагменты можно склеить протоколом concat (побайтово, без разбора списка демуксером);
+        # ограничение длины — из-за лимита командной строки Windows
+        ffmpeg_cmd = [ffmpeg_bin, "-y", "-i", concat_input, "-c", "copy", str(final_file)]
+        log_debug(f"HLS: склейка {len(frag_paths)} фрагментов через протокол concat")
+    else:
+        with open(concat_file, "w", encoding="utf-8") as f:
+            for frag in frag_paths:
+                f.write(f"file '{frag}'\n")
+        ffmpeg_cmd = [
+             ffmpeg_bin, "-y", "-f", "concat", "-safe", "0",
+             "-i", str(concat_file),
+             "-c", "copy", str(final_file)
+         ]
     print(Fore.YELLOW + "Объединение фрагментов..." + Style.RESET_ALL)
     try:
         subprocess.run(ffmpeg_cmd, check=True)
@@ -2929,7 +4493,7 @@ def download_hls_fragments(m3u8_url, output_path, output_name, cookie_file_path=
                 frag_file.unlink()
             except Exception:
                 pass
-        concat_file.unlink()
+        concat_file.unlink(missing_ok=True)
         temp_folder.rmdir()
         return str(final_file)
     except Exception as e:
@@ -2971,6 +4535,11 @@ def parse_args():
     parser.add_argument('--auto', '-a', action='store_true', help='Автоматический режим (не задавать вопросов)')
     parser.add_argument('--bestvideo', action='store_true', help='Использовать bestvideo')
     parser.add_argument('--bestaudio', action='store_true', help='Использовать bestaudio')
+    parser.add_argument('--sync', action='store_true', help='Синхронизация канала/плейлиста: скачивать только видео, которых нет в архиве')
+    parser.add_argument('--profile-startup', action='store_true', help='Показать, сколько времени заняла каждая фаза запуска')
+    parser.add_argument('--profile-startup-json', metavar='PATH', help='Записать профиль запуска в JSON-файл')
+    parser.add_argument('--check-lazy-imports', action='store_true',
+                        help='Проверить в отдельном процессе, что тяжёлые модули не импортируются при запуске (код выхода 1 — регрессия)')
     # Для совместимости с одиночным тире и без тире
     # Собираем все sys.argv, ищем вручную
     args, unknown = parser.parse_known_args()
@@ -3315,18 +4884,10 @@ def mux_mkv_with_subs_and_chapters(
 
     return True
 
-def wait_input(flag):
-    """
-    Ожидает нажатие Enter в отдельном потоке, устанавливает флаг при вводе.
-    Используется для кроссплатформенного ожидания ввода с таймаутом.
-    Поддержка: Windows, MacOS, Linux.
-    """
-    input()
-    flag[0] = True
-
-def wait_keys(wait_only_enter, enter_pressed, timeout):
+def wait_keys(wait_only_enter, enter_pressed, timeout, typed=None):
     """
     Ожидает нажатие клавиши Enter или таймаут, поддерживает паузу по Space.
+    Если передан typed, можно ввести строку (например, номера видео) и нажать Enter — она попадёт в typed[0].
     Поддержка: Windows, MacOS, Linux.
     """
     system = platform.system().lower()
@@ -3346,6 +4907,24 @@ def wait_keys(wait_only_enter, enter_pressed, timeout):
                         print()
                         enter_pressed[0] = True
                         return
+                    elif typed is not None and ch.isprintable() and ch != ' ':
+                        # Начат ввод строки — таймер останавливается, читаем до Enter
+                        buf = [ch]
+                        print("\r" + " " * 30 + "\r" + ch, end='', flush=True)
+                        while True:
+                            ch2 = msvcrt.getwch()
+                            if ch2 in ('\r', '\n'):
+                                print()
+                                typed[0] = ''.join(buf).strip()
+                                enter_pressed[0] = True
+                                return
+                            if ch2 == '\b':
+                                if buf:
+                                    buf.pop()
+                                    print("\b \b", end='', flush=True)
+                            elif ch2.isprintable():
+                                buf.append(ch2)
+                                print(ch2, end='', flush=True)
                     elif ch == ' ':
                         wait_only_enter[0] = True
                         print(Fore.CYAN + "\nПауза: нажмите Enter для продолжения..." + Style.RESET_ALL)
@@ -3362,16 +4941,16 @@ def wait_keys(wait_only_enter, enter_pressed, timeout):
                     return
                 time.sleep(0.05)
         else:
-            # Кроссплатформенный вариант: input с таймаутом через поток
-            import threading
-            flag = [False]
-            input_thread = threading.Thread(target=wait_input, args=(flag,))
-            input_thread.daemon = True
-            input_thread.start()
+            # MacOS/Linux: опрашиваем stdin через select — строка читается, только пока ждёт эта страница,
+            # и после таймаута не остаётся потока с input(), перехватывающего ввод следующих запросов
+            import select
             for left in range(timeout, 0, -1):
                 print(f"\rОжидание... {left} сек. ", end='', flush=True)
-                input_thread.join(1)
-                if flag[0]:
+                ready, _, _ = select.select([sys.stdin], [], [], 1)
+                if ready:
+                    text = sys.stdin.readline()
+                    if typed is not None:
+                        typed[0] = text.strip()
                     print()
                     enter_pressed[0] = True
                     return
@@ -3381,79 +4960,253 @@ def wait_keys(wait_only_enter, enter_pressed, timeout):
         print()
         return
 
-def print_playlist_paginated(entries, page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=None, auto_mode=False):
+class PlaylistStream:
+    """
+    Плоский список видео плейлиста, получаемый по мере перебора.
+    yt-dlp извлекает плейлист без обработки (process=False): шапка и первая страница приходят сразу,
+    следующие страницы запрашиваются, только когда до них доходит перебор (print_playlist_paginated
+    выводит первые видео, не дожидаясь всего списка). Полученные записи запоминаются — список можно
+    перебирать повторно; materialize() дочитывает его целиком. Полностью прочитанный список сохраняется
+    в кэш метаданных, и следующий запуск берёт его оттуда.
+    skip_ids — id видео, которые не попадают в список (режим --sync, см. archive_prune_entries).
+    Поддержка: Windows, MacOS, Linux.
+    """
+
+    def __init__(self, url, platform, cookie_file_path=None, title=None):
+        self.url = url
+        self.platform = platform
+        self.cookie_file_path = cookie_file_path
+        self.title = title
+        self.info = None      # шапка плейлиста (без entries); None — ещё не открыт
+        self.items = []       # полученные записи (без пропущенных по skip_ids)
+        self.done = False
+        self.skip_ids = None
+        self.skipped = 0
+        self._all = []        # все полученные записи — для кэша
+        self._entries = None
+        self._ydl = None
+        self._from_cache = False
+        self._opts = dict(_info_ydl_opts(url, platform, cookie_file_path), extract_flat=True)
+        self._cache_key = _metadata_cache_key(url, self._opts, cookie_file_path) if METADATA_CACHE else None
+
+    def open(self) -> bool:
+        """Получает шапку плейлиста; False — ссылка не плейлист или недоступна (тогда список пуст)."""
+        if self.info is not None or self.done:
+            return self.info is not None
+        cached = _metadata_cache_get(self._cache_key) if self._cache_key else None
+        if cached and cached.get('_type') == 'playlist':
+            log_debug(f"PlaylistStream: список из кэша метаданных для {self.url}")
+            self._from_cache = True
+            self.info = {k: v for k, v in cached.items() if k != 'entries'}
+            self.info['__cookiefile__'] = self.cookie_file_path
+            self._entries = iter(cached.get('entries') or [])
+            return True
+        ydl = new_ydl(self._opts)
+        try:
+            result = ydl.extract_info(self.url, download=False, process=False)
+            for _ in range(3):  # переадресации (url / url_transparent) на сам плейлист
+                if not result or result.get('_type') not in ('url', 'url_transparent'):
+                    break
+                result = ydl.extract_info(result['url'], download=False, process=False, ie_key=result.get('ie_key'))
+        except Exception as e:
+            log_debug(f"PlaylistStream: не удалось открыть {self.url}: {e}")
+            result = None
+        if not result or result.get('_type') != 'playlist':
+            _close_ydl(ydl)
+            self.done = True
+            return False
+        self._ydl = ydl
+        self.info = {k: v for k, v in result.items() if k != 'entries'}
+        self.info['__cookiefile__'] = self.cookie_file_path
+        entries = result.get('entries')
+        self._entries = iter(entries if entries is not None else [])
+        log_debug(f"PlaylistStream: открыт {self.url} ({self.info.get('title')})")
+        return True
+
+    def _pull(self):
+        """Следующая запись (пропуская skip_ids) или None, если список кончился."""
+        while not self.done and self.open():
+            try:
+                entry = next(self._entries)
+            except StopIteration:
+                self._finish(complete=True)
+                break
+            except Exception as e:
+                print(Fore.YELLOW + f"Список видео получен не полностью: {e}" + Style.RESET_ALL)
+                log_debug(f"PlaylistStream: ошибка при получении списка {self.url}: {e}\n{traceback.format_exc()}")
+                self._finish(complete=False)
+                break
+            if not isinstance(entry, dict):
+                continue
+            self._all.append(entry)
+            if self.skip_ids and entry.get('id') and str(entry['id']) in self.skip_ids:
+                self.skipped += 1
+                continue
+            self.items.append(entry)
+            return entry
+        return None
+
+    def _finish(self, complete: bool):
+        self.done = True
+        if self._ydl is not None:
+            _close_ydl(self._ydl)
+            self._ydl = None
+        if self.skip_ids is not None:
+            where = f" в «{self.title}»" if self.title else ""
+            if self.skipped:
+                print(Fore.GREEN + f"Синхронизация{where}: {self.skipped} видео уже скачаны ранее и пропущены, новых: {len(self.items)}" + Style.RESET_ALL)
+            log_debug(f"PlaylistStream: {self.title}: пропущено {self.skipped} из {len(self._all)}")
+        if complete and self._cache_key and not self._from_cache:
+            head = {k: v for k, v in self.info.items() if k != '__cookiefile__'}
+            _metadata_cache_put(self._cache_key, self.url, dict(head, entries=self._all))
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self.items):
+                yield self.items[i]
+                i += 1
+            elif self._pull() is None:
+                return
+
+    def __bool__(self):
+        # пока список не дочитан, считаем его непустым
+        return bool(self.items) or not self.done
+
+    def materialize(self) -> list:
+        """Дочитывает список до конца и возвращает все записи."""
+        for _ in self:
+            pass
+        return self.items
+
+def videos_count_label(videos) -> str:
+    """« (N видео)» для уже полученного списка; для ещё не дочитанного PlaylistStream — пустая строка."""
+    if isinstance(videos, PlaylistStream):
+        return f" ({len(videos.items)} видео)" if videos.done else ""
+    return f" ({len(videos)} видео)"
+
+def section_count_label(section) -> str:
+    """« (N видео)» для раздела канала, если число видео известно без запроса списка."""
+    if section.get('entries') is not None:
+        return f" ({len(section['entries'])} видео)"
+    if section.get('playlist_count') is not None:
+        return f" ({section['playlist_count']} видео)"
+    return ""
+
+def section_videos(section, title, platform, cookie_file_path=None):
+    """
+    Видео раздела канала: уже полученный список или PlaylistStream по ссылке раздела.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    if section.get('entries') is not None or not section.get('url'):
+        return section.get('entries') or []
+    return PlaylistStream(section['url'], platform, cookie_file_path, title=title)
+
+def print_playlist_paginated(entries, page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=None, auto_mode=False, selection=None):
     """
     Выводит список видео плейлиста порциями по page_size.
+    entries может быть списком или итератором/генератором — страницы выводятся по мере поступления записей.
     После каждой порции ждёт Enter или timeout секунд.
     Если нажата Space — таймер останавливается, ждём только Enter.
-    После полного вывода спрашивает, сохранить ли список в файл.
+    Если передан selection (список из одного элемента), на любой странице можно сразу ввести номера видео:
+    вывод прекращается, введённая строка сохраняется в selection[0].
+    Строки списка по ходу вывода пишутся во временный файл; после вывода спрашивает, сохранить ли список.
     Возвращает путь к сохранённому файлу списка (или None).
     Поддержка: Windows, MacOS, Linux.
     """
-    log_debug(f"print_playlist_paginated: entries_count={len(entries)}, title={playlist_title}")
-    total = len(entries)
-    all_lines = []
+    import tempfile
+    total = len(entries) if hasattr(entries, '__len__') else None
+    log_debug(f"print_playlist_paginated: entries_count={total if total is not None else 'поток'}, title={playlist_title}")
     saved_list_path = None
+    if playlist_title:
+        default_filename = f"{playlist_title}.txt"
+    else:
+        default_filename = "playlist.txt"
 
-    # --- Определяем основной канал (channel_id) ---
+    # Основной канал — первый встреченный channel_id; видео других каналов помечаются номером в квадратных скобках
     main_channel_id = None
-    for entry in entries:
-        if entry.get('channel_id'):
-            main_channel_id = entry['channel_id']
-            break
-
-    # --- Проверяем наличие чужих видео ---
-    has_other_channel = False
-    for entry in entries:
-        if entry.get('channel_id') and main_channel_id and entry['channel_id'] != main_channel_id:
-            has_other_channel = True
-            break
-
-    if has_other_channel:
-        print(Fore.YELLOW + "В плейлисте присутствуют видео с других каналов, номер — в квадратных скобках" + Style.RESET_ALL)
+    other_channel_noted = False
+    if total is not None:
+        # список уже целиком в памяти — как и раньше, предупреждаем о чужих видео до вывода
+        main_channel_id = next((e['channel_id'] for e in entries if e.get('channel_id')), None)
+        if any(e.get('channel_id') and e['channel_id'] != main_channel_id for e in entries):
+            print(Fore.YELLOW + "В плейлисте присутствуют видео с других каналов, номер — в квадратных скобках" + Style.RESET_ALL)
+            other_channel_noted = True
+
+    list_file = None
+    try:
+        list_file = tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False, dir='.',
+                                                prefix='.vdl_list_', suffix='.txt')
+    except Exception as e:
+        log_debug(f"print_playlist_paginated: не удалось создать временный файл списка: {e}")
 
-    for start in range(0, total, page_size):
-        end = min(start + page_size, total)
-        for idx in range(start, end):
-            entry = entries[idx]
+    # Временный файл удаляется при любом выходе (в т.ч. по исключению или Ctrl+C), если список не сохранён
+    try:
+        shown = 0
+        count = 0
+        printing = True
+        for idx, entry in enumerate(entries):
+            count = idx + 1
+            if printing and idx and idx % page_size == 0:
+                left = f" из {total}" if total is not None else ""
+                hint = ", номера видео и Enter — выбрать сразу" if selection is not None else ""
+                print(Fore.CYAN + f"\nПоказано {idx}{left}. Enter — далее, Space — пауза{hint}, или ожидание {timeout} сек..." + Style.RESET_ALL)
+                wait_only_enter = [False]
+                enter_pressed = [False]
+                typed = [None] if selection is not None else None
+                wait_keys(wait_only_enter, enter_pressed, timeout, typed)
+                if typed and typed[0]:
+                    selection[0] = typed[0]
+                    printing = False
+                    log_debug(f"print_playlist_paginated: выбор введён во время вывода: {typed[0]}")
             title = entry.get('title') or entry.get('id') or f'Видео {idx+1}'
+            channel_id = entry.get('channel_id')
+            if channel_id and main_channel_id is None:
+                main_channel_id = channel_id
             # --- Если видео с другого канала, выводим номер в квадратных скобках ---
-            if entry.get('channel_id') and main_channel_id and entry['channel_id'] != main_channel_id:
+            if channel_id and channel_id != main_channel_id:
                 line = f"[{idx+1}]. {title}"
+                if printing and not other_channel_noted:
+                    print(Fore.YELLOW + "В плейлисте присутствуют видео с других каналов, номер — в квадратных скобках" + Style.RESET_ALL)
+                    other_channel_noted = True
             else:
                 line = f"{idx+1}. {title}"
-            print(line)
-            all_lines.append(line)
-        if end < total:
-            print(Fore.CYAN + f"\nПоказано {end} из {total}. Enter — далее, Space — пауза, или ожидание {timeout} сек..." + Style.RESET_ALL)
-            wait_only_enter = [False]
-            enter_pressed = [False]
-
-            wait_keys(wait_only_enter, enter_pressed, timeout)
-    # --- После полного вывода ---
-    if playlist_title:
-        default_filename = f"{playlist_title}.txt"
-    else:
-        default_filename = "playlist.txt"
-
-    save_list = True  # по умолчанию сохраняем
-    if auto_mode:
-        answer = "1"
-    else:
-        answer = input(
-            Fore.CYAN + f"\nСохранить список видео в файл '{default_filename}'? (Enter — сохранить, 0 или - — не сохранять): " + Style.RESET_ALL
-        ).strip()
-    if answer in ("0", "-"):
-        save_list = False
-    if save_list:
-        try:
-            with open(default_filename, "w", encoding="utf-8") as f:
-                for line in all_lines:
-                    f.write(line + "\n")
-            print(Fore.GREEN + f"Список сохранён в файл: {default_filename}" + Style.RESET_ALL)
-            saved_list_path = str(Path(default_filename).resolve())
-        except Exception as e:
-            print(Fore.RED + f"Ошибка при сохранении файла: {e}" + Style.RESET_ALL)
+            if printing:
+                print(line)
+                shown = count
+            if list_file:
+                list_file.write(line + "\n")
+        if list_file:
+            list_file.close()
+        if not printing:
+            print(Fore.CYAN + f"Показано {shown} из {count}, выбор: {selection[0]}" + Style.RESET_ALL)
+
+        # --- После полного вывода ---
+        save_list = bool(list_file)
+        if save_list:
+            if auto_mode:
+                answer = "1"
+            else:
+                answer = input(
+                    Fore.CYAN + f"\nСохранить список видео в файл '{default_filename}'? (Enter — сохранить, 0 или - — не сохранять): " + Style.RESET_ALL
+                ).strip()
+            if answer in ("0", "-"):
+                save_list = False
+        if save_list:
+            try:
+                # NamedTemporaryFile создаёт файл с правами 0600 — сохранённый список получает обычные права (по umask)
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(list_file.name, 0o666 & ~umask)
+                os.replace(list_file.name, default_filename)
+                print(Fore.GREEN + f"Список сохранён в файл: {default_filename}" + Style.RESET_ALL)
+                saved_list_path = str(Path(default_filename).resolve())
+            except Exception as e:
+                print(Fore.RED + f"Ошибка при сохранении файла: {e}" + Style.RESET_ALL)
+    finally:
+        if list_file and not saved_list_path:
+            list_file.close()
+            Path(list_file.name).unlink(missing_ok=True)
     return saved_list_path
 
 def check_mkv_integrity(filepath, expected_video_codec=None, expected_audio_codec=None, expected_sub_langs=None, expected_chapters=False):
@@ -3465,7 +5218,7 @@ def check_mkv_integrity(filepath, expected_video_codec=None, expected_audio_code
     Поддержка: Windows, MacOS, Linux.
     """
     try:
-        probe = ffmpeg.probe(filepath)
+        probe = ffmpeg.probe(filepath, cmd=get_ffmpeg_info().get('ffprobe') or 'ffprobe')
         streams = probe.get('streams', [])
         video_ok = audio_ok = subs_ok = chaps_ok = True
 
@@ -3487,24 +5240,126 @@ def check_mkv_integrity(filepath, expected_video_codec=None, expected_audio_code
         log_debug(f"check_mkv_integrity: не удалось выполнить ffprobe/probe: {e}\n{traceback.format_exc()}")
         return True
 
-def expand_channel_entries(entries, platform, cookie_file_to_use, level=0):
+_PLAYLIST_FETCH_SLOTS = threading.BoundedSemaphore(max(1, PLAYLIST_FETCH_MAX))  # общий предел на все уровни обхода
+
+def fetch_infos_concurrently(urls, platform, cookie_file_to_use, memo=None, errors=None):
+    """
+    Получает информацию для списка ссылок (плейлистов) параллельно и возвращает её в том же порядке.
+    Одновременно выполняется не более PLAYLIST_FETCH_WORKERS запросов из этого списка и не более
+    PLAYLIST_FETCH_MAX запросов всего. memo — общий словарь {url: info} обхода: повторяющиеся ссылки
+    запрашиваются один раз. Параллельные запросы идут в фоновом режиме (без диалогов, повторов и куков
+    из браузера — см. in_background_thread); неудавшиеся повторяются по очереди в вызывающем потоке обычным образом.
+    Первая по порядку ошибка пробрасывается, как при последовательном обходе;
+    если передан словарь errors, ошибки складываются в него {url: исключение}, а вместо info возвращается None.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    memo = {} if memo is None else memo
+    pending = [u for u in dict.fromkeys(urls) if u not in memo]
+
+    def fetch(url):
+        with _PLAYLIST_FETCH_SLOTS:
+            return safe_get_video_info(url, platform, cookie_file_to_use)
+
+    def fetch_background(url):
+        _THREAD_STATE.background = True
+        return fetch(url)
+
+    failed = {}
+    if len(pending) == 1:
+        try:
+            memo[pending[0]] = fetch(pending[0])
+        except Exception as e:
+            failed[pending[0]] = e
+    elif pending:
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(PLAYLIST_FETCH_WORKERS, len(pending))),
+                                thread_name_prefix="vdl-playlist") as pool:
+            futures = {pool.submit(fetch_background, u): u for u in pending}
+            for fut in as_completed(futures):
+                try:
+                    memo[futures[fut]] = fut.result()
+                except Exception as e:
+                    failed[futures[fut]] = e
+        log_debug(f"fetch_infos_concurrently: {len(pending)} запросов за {time.time() - started:.2f}s, "
+                  f"неудачных в фоне: {len(failed)}")
+        for u in [u for u in pending if u in failed]:
+            try:
+                memo[u] = fetch(u)
+                del failed[u]
+            except Exception as e:
+                failed[u] = e
+    if errors is not None:
+        errors.update(failed)
+    else:
+        for u in pending:
+            if u in failed:
+                raise failed[u]
+    return [memo.get(u) for u in urls]
+
+def list_playlists_with_counts(playlists_entries, platform, cookie_file_to_use, memo=None):
+    """
+    Возвращает [(номер, название, число видео)] для меню выбора плейлистов канала.
+    Если плоский список уже содержит число видео (playlist_count / n_entries), запрос не делается;
+    остальные плейлисты запрашиваются параллельно (fetch_infos_concurrently), полученная информация
+    остаётся в memo и повторно используется collect_playlists. Недоступный плейлист показывается с 0 видео.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    def known_count(pl):
+        for key in ('playlist_count', 'n_entries'):
+            if isinstance(pl.get(key), int):
+                return pl[key]
+        return None
+
+    memo = {} if memo is None else memo
+    to_fetch = [pl.get('url') or pl.get('webpage_url') for pl in playlists_entries if known_count(pl) is None]
+    errors = {}
+    fetch_infos_concurrently([u for u in to_fetch if u], platform, cookie_file_to_use, memo, errors=errors)
+    for url, err in errors.items():
+        log_debug(f"list_playlists_with_counts: не удалось получить {url}: {err}")
+    playlist_infos = []
+    for idx, pl in enumerate(playlists_entries, 1):
+        pl_title = pl.get('title') or pl.get('id') or pl.get('url') or f"Плейлист {idx}"
+        count = known_count(pl)
+        if count is None:
+            pl_info = memo.get(pl.get('url') or pl.get('webpage_url'))
+            count = len(pl_info.get('entries', [])) if pl_info else 0
+        playlist_infos.append((idx, pl_title, count))
+    return playlist_infos
+
+def expand_channel_entries(entries, platform, cookie_file_to_use, level=0, memo=None, _ancestors=frozenset(),
+                           _expanded=None):
     """
     Рекурсивно раскрывает только разделы/плейлисты, но НЕ делает запросов к каждому видео.
     Возвращает список элементов, где каждый — это видео (url/id/title), но без подробной info.
+    Плейлисты одного уровня запрашиваются параллельно (fetch_infos_concurrently), порядок сохраняется;
+    плейлист, встреченный повторно (в любой ветке обхода) или внутри самого себя, повторно не раскрывается.
     Поддержка: Windows, MacOS, Linux.
     """
+    memo = {} if memo is None else memo
+    _expanded = set() if _expanded is None else _expanded  # уже раскрытые плейлисты — общий для всего обхода
     expanded = []
     indent = "  " * level
+
+    def is_section(entry):
+        return entry.get('_type') == 'playlist' or ('url' in entry and not entry.get('formats') and not entry.get('ie_key') == 'Youtube')
+
+    section_urls = [entry.get('url') or entry.get('webpage_url') for entry in entries if is_section(entry)]
+    section_urls = [u for u in dict.fromkeys(u for u in section_urls if u) if u not in _ancestors]
+    fetched = dict(zip(section_urls, fetch_infos_concurrently(section_urls, platform, cookie_file_to_use, memo)))
+
     for entry in entries:
         # Если это раздел/плейлист — раскрываем его
-        if entry.get('_type') == 'playlist' or ('url' in entry and not entry.get('formats') and not entry.get('ie_key') == 'Youtube'):
+        if is_section(entry):
             title = entry.get('title') or entry.get('id') or entry.get('url')
             url = entry.get('url') or entry.get('webpage_url')
-            if url:
-                info = safe_get_video_info(url, platform, cookie_file_to_use)
-                subentries = info.get('entries', [])
+            if url in fetched and url not in _expanded:
+                _expanded.add(url)
+                subentries = fetched[url].get('entries', [])
                 print(Fore.MAGENTA + f"{indent}→ Найден раздел/плейлист: {title} ({len(subentries)} видео)" + Style.RESET_ALL)
-                expanded.extend(expand_channel_entries(subentries, platform, cookie_file_to_use, level=level+1))
+                expanded.extend(expand_channel_entries(subentries, platform, cookie_file_to_use, level=level+1,
+                                                       memo=memo, _ancestors=_ancestors | {url}, _expanded=_expanded))
+            elif url:
+                log_debug(f"expand_channel_entries: плейлист {url} уже раскрыт или содержит сам себя — пропуск")
         # Если это видео (url/id/title), но НЕ плейлист — просто добавляем, не раскрываем!
         elif entry.get('_type') == 'url' or ('url' in entry and not entry.get('_type')):
             expanded.append(entry)
@@ -3520,12 +5375,16 @@ def has_nested_playlists(pls):
     """
     return any(pl.get("sub_playlists") for pl in pls)
 
-def collect_playlists(entries, platform, cookie_file_to_use, level=0):
+def collect_playlists(entries, platform, cookie_file_to_use, level=0, memo=None, _ancestors=frozenset()):
     """
     Рекурсивно строит структуру: [{title, videos, sub_playlists}]
     Корректно различает настоящие видео и плейлисты для YouTube /playlists.
+    Плейлисты одного уровня запрашиваются параллельно, порядок в результате совпадает с исходным;
+    информация о плейлисте, встреченном в нескольких местах, запрашивается один раз, а ссылка плейлиста
+    на самого себя (или на предка) не раскрывается.
     Поддержка: Windows, MacOS, Linux.
     """
+    memo = {} if memo is None else memo
     log_debug(f"collect_playlists: level={level}, entries_count={len(entries)}")
     playlists = []
     videos = []
@@ -3541,16 +5400,19 @@ def collect_playlists(entries, platform, cookie_file_to_use, level=0):
         elif e.get('_type') in ('url', 'video') or ('formats' in e):
             video_entries.append(e)
 
-    for entry in playlist_entries:
+    playlist_entries = [e for e in playlist_entries if (e.get('url') or e.get('webpage_url')) not in _ancestors]
+    urls = [e.get('url') or e.get('webpage_url') for e in playlist_entries]
+    infos = fetch_infos_concurrently(urls, platform, cookie_file_to_use, memo)
+
+    for entry, url, info in zip(playlist_entries, urls, infos):
         title = entry.get('title') or entry.get('id') or entry.get('url')
-        url = entry.get('url') or entry.get('webpage_url')
-        info = safe_get_video_info(url, platform, cookie_file_to_use)
         subentries = info.get('entries', [])
         log_debug(f"collect_playlists: subentries для '{title}' (count={len(subentries)})")
         # Разделяем вложенные плейлисты и видео
         sub_playlist_entries = [e for e in subentries if (e.get('_type') == 'playlist' or (e.get('_type') == 'url' and 'playlist?list=' in (e.get('url') or '')))]
         sub_video_entries = [e for e in subentries if e.get('_type') in ('url', 'video') or ('formats' in e)]
-        sub_playlists = collect_playlists(subentries, platform, cookie_file_to_use, level=level+1) if sub_playlist_entries else []
+        sub_playlists = collect_playlists(subentries, platform, cookie_file_to_use, level=level+1,
+                                          memo=memo, _ancestors=_ancestors | {url}) if sub_playlist_entries else []
         only_videos = len(subentries) == len(sub_video_entries)
         if only_videos:
             playlists.append({
@@ -3584,8 +5446,15 @@ def process_playlists(playlists, output_path, auto_mode, platform, args, cookie_
         print(Fore.MAGENTA + f"\nНачало обработки плейлиста: {pl_title}" + Style.RESET_ALL)        
         folder = Path(output_path) / re.sub(r'[<>:"/\\|?*!]', '', pl_title)
         if pl["videos"]:
-            print(Fore.CYAN + f"\nПлейлист: {pl_title} ({len(pl['videos'])} видео)" + Style.RESET_ALL)
-            saved_list_path = print_playlist_paginated(pl["videos"], page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=pl_title)
+            print(Fore.CYAN + f"\nПлейлист: {pl_title}{videos_count_label(pl['videos'])}" + Style.RESET_ALL)
+            early_selection = [None]
+            saved_list_path = print_playlist_paginated(pl["videos"], page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=pl_title,
+                                                       selection=early_selection)
+            # список мог выводиться по мере получения (PlaylistStream) — дальше нужен готовый список
+            pl = dict(pl, videos=list(pl["videos"]))
+            if not pl["videos"] and not pl["sub_playlists"]:
+                print(Fore.YELLOW + f"В плейлисте '{pl_title}' нет видео. Пропуск плейлиста." + Style.RESET_ALL)
+                continue
             if saved_list_path and Path(saved_list_path).is_file():
                 try:
                     dest_path = folder / Path(saved_list_path).name
@@ -3594,8 +5463,11 @@ def process_playlists(playlists, output_path, auto_mode, platform, args, cookie_
                     print(Fore.GREEN + f"Список видео перемещён в папку плейлиста: {dest_path}" + Style.RESET_ALL)
                 except Exception as e:
                     print(Fore.RED + f"Не удалось переместить файл списка: {e}" + Style.RESET_ALL)
-            print(Fore.CYAN + "\nВведите номера видео для скачивания (через запятую, пробелы, диапазоны через тире).\nEnter или 0 — скачать все:" + Style.RESET_ALL)
-            sel = input(Fore.CYAN + "Ваш выбор: " + Style.RESET_ALL)
+            if early_selection[0]:
+                sel = early_selection[0]
+            else:
+                print(Fore.CYAN + "\nВведите номера видео для скачивания (через запятую, пробелы, диапазоны через тире).\nEnter или 0 — скачать все:" + Style.RESET_ALL)
+                sel = input(Fore.CYAN + "Ваш выбор: " + Style.RESET_ALL)
             selected_indexes = parse_selection(sel, len(pl["videos"]))
             selected_indexes = sorted(selected_indexes)
             if not selected_indexes:
@@ -3683,7 +5555,7 @@ def process_playlists(playlists, output_path, auto_mode, platform, args, cookie_
                         output_name = get_unique_filename(safe_title, folder, output_format)
                         downloaded_file = download_video(
                             entry_url, video_id_auto, audio_id_auto, folder, output_name, output_format,
-                            platform, cookie_file_to_use, subtitle_options=subtitle_download_options
+                            platform, cookie_file_to_use, subtitle_options=subtitle_download_options, info=entry_info
                         )
                         if downloaded_file:
                             print(Fore.GREEN + f"Видео {idx} успешно скачано: {downloaded_file}" + Style.RESET_ALL)
@@ -3729,7 +5601,7 @@ def process_playlists(playlists, output_path, auto_mode, platform, args, cookie_
                         output_name = get_unique_filename(safe_title, folder, output_format)
                         downloaded_file = download_video(
                             entry_url, video_id, audio_id, folder, output_name, output_format,
-                            platform, cookie_file_to_use, subtitle_options=subtitle_download_options
+                            platform, cookie_file_to_use, subtitle_options=subtitle_download_options, info=entry_info
                         )
                         if downloaded_file:
                             print(Fore.GREEN + f"Видео {idx} успешно скачано: {downloaded_file}" + Style.RESET_ALL)
@@ -3748,7 +5620,7 @@ def print_playlists_tree(playlists, level=0):
     log_debug(f"print_playlists_tree: level={level}, playlists_count={len(playlists)}")
     for pl in playlists:
         indent = "  " * level
-        print(f"{indent}- {pl['title'] or 'Без названия'} ({len(pl['videos'])} видео)")
+        print(f"{indent}- {pl['title'] or 'Без названия'}{videos_count_label(pl['videos'])}")
         if pl["sub_playlists"]:
             print_playlists_tree(pl["sub_playlists"], level+1)
 
@@ -3765,6 +5637,7 @@ def collect_user_choices_for_playlists(playlists, output_path, auto_mode, platfo
     for pl in playlists:
         pl_title = pl["title"] or "playlist"
         print(Fore.MAGENTA + f"\nНачало обработки плейлиста: {pl_title}" + Style.RESET_ALL)        
+        pl = dict(pl, videos=archive_prune_entries(pl["videos"], platform, pl_title))
         folder = Path(output_path) / re.sub(r'[<>:"/\\|?*!]', '', pl_title)
         add_index_prefix = True
         if pl["videos"]:
@@ -3775,8 +5648,15 @@ def collect_user_choices_for_playlists(playlists, output_path, auto_mode, platfo
                 add_index_prefix = False
             log_debug(f"add_index_prefix для плейлиста '{pl_title}' = {add_index_prefix}")
 
-            print(Fore.CYAN + f"\nПлейлист: {pl_title} ({len(pl['videos'])} видео)" + Style.RESET_ALL)
-            saved_list_path = print_playlist_paginated(pl["videos"], page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=pl_title)
+            print(Fore.CYAN + f"\nПлейлист: {pl_title}{videos_count_label(pl['videos'])}" + Style.RESET_ALL)
+            early_selection = [None]
+            saved_list_path = print_playlist_paginated(pl["videos"], page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=pl_title,
+                                                       selection=early_selection)
+            # список мог выводиться по мере получения (PlaylistStream) — дальше нужен готовый список
+            pl = dict(pl, videos=list(pl["videos"]))
+            if not pl["videos"] and not pl["sub_playlists"]:
+                print(Fore.YELLOW + f"В плейлисте '{pl_title}' нет видео. Пропуск плейлиста." + Style.RESET_ALL)
+                continue
             if saved_list_path and Path(saved_list_path).is_file():
                 try:
                     dest_path = folder / Path(saved_list_path).name
@@ -3785,8 +5665,11 @@ def collect_user_choices_for_playlists(playlists, output_path, auto_mode, platfo
                     print(Fore.GREEN + f"Список видео перемещён в папку плейлиста: {dest_path}" + Style.RESET_ALL)
                 except Exception as e:
                     print(Fore.RED + f"Не удалось переместить файл списка: {e}" + Style.RESET_ALL)
-            print(Fore.CYAN + "\nВведите номера видео для скачивания (через запятую, пробелы, диапазоны через тире).\nEnter или 0 — скачать все:" + Style.RESET_ALL)
-            sel = input(Fore.CYAN + "Ваш выбор: " + Style.RESET_ALL)
+            if early_selection[0]:
+                sel = early_selection[0]
+            else:
+                print(Fore.CYAN + "\nВведите номера видео для скачивания (через запятую, пробелы, диапазоны через тире).\nEnter или 0 — скачать все:" + Style.RESET_ALL)
+                sel = input(Fore.CYAN + "Ваш выбор: " + Style.RESET_ALL)
             selected_indexes = parse_selection(sel, len(pl["videos"]))
             selected_indexes = sorted(selected_indexes)
             if not selected_indexes:
@@ -3865,6 +5748,8 @@ def collect_user_choices_for_playlists(playlists, output_path, auto_mode, platfo
                                 "add_index_prefix": add_index_prefix,
                                 "index_number": idx,
                                 "safe_title": safe_title,
+                                # info уже извлечён только для первого видео — передаём его, чтобы не извлекать повторно
+                                "info": entry_info if idx == first_idx else None,
                             })
                 else:
                     # Ручной режим: параметры для каждого видео
@@ -3912,6 +5797,7 @@ def collect_user_choices_for_playlists(playlists, output_path, auto_mode, platfo
                             "add_index_prefix": add_index_prefix,
                             "index_number": idx,
                             "safe_title": safe_title,
+                            "info": entry_info,
                         })
         # Рекурсивно для подплейлистов
         if pl["sub_playlists"]:
@@ -3920,20 +5806,98 @@ def collect_user_choices_for_playlists(playlists, output_path, auto_mode, platfo
             ))
     return tasks
 
+def _task_entry_url(task):
+    """Ссылка на видео из задачи скачивания (или None)."""
+    entry = task["entry"]
+    return entry.get('url') or entry.get('webpage_url') or entry.get('id')
+
+class _InfoPrefetcher:
+    """
+    Фоновая предзагрузка информации о видео для следующих задач скачивания.
+    Пока качается задача idx, для задач idx+1 … idx+INFO_PREFETCH_AHEAD информация запрашивается в пуле потоков;
+    число одновременных запросов к одной платформе ограничено INFO_PREFETCH_WORKERS.
+    Фоновый запрос делается один раз и «тихо» — при ошибке задача обрабатывается основным циклом как раньше.
+    """
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.ahead = max(0, INFO_PREFETCH_AHEAD)
+        self.futures = {}
+        self.limits = {}
+        self.pool = ThreadPoolExecutor(max_workers=self.ahead, thread_name_prefix="vdl-info") if self.ahead else None
+
+    def _platform_limit(self, platform):
+        if platform not in self.limits:
+            n = INFO_PREFETCH_WORKERS.get(platform, INFO_PREFETCH_WORKERS.get('default', 1))
+            self.limits[platform] = threading.BoundedSemaphore(n) if n > 0 else None
+        return self.limits[platform]
+
+    def _fetch(self, task, url):
+        _THREAD_STATE.background = True
+        sem = self.limits[task["platform"]]
+        with sem:
+            started = time.time()
+            info = safe_get_video_info(url, task["platform"], task["cookie_file_to_use"])
+            log_debug(f"Предзагрузка информации: {url} ({time.time() - started:.2f}s)")
+            return info
+
+    def _schedule(self, idx):
+        if idx >= len(self.tasks) or idx in self.futures:
+            return
+        task = self.tasks[idx]
+        url = _task_entry_url(task)
+        if task.get("info") or not url or self._platform_limit(task["platform"]) is None:
+            return
+        self.futures[idx] = self.pool.submit(self._fetch, task, url)
+
+    def take(self, idx):
+        """
+        Возвращает заранее полученную информацию для задачи idx (или None) и ставит в очередь следующие задачи.
+        """
+        if not self.pool:
+            return None
+        for nxt in range(idx + 1, idx + 1 + self.ahead):
+            self._schedule(nxt)
+        fut = self.futures.pop(idx, None)
+        if fut is None:
+            return None
+        try:
+            return fut.result()
+        except Exception as e:
+            log_debug(f"Предзагрузка информации для задачи {idx + 1} не удалась, повторим в основном цикле: {e}")
+            return None
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
 def download_tasks(tasks):
     """
     Выполняет скачивание по списку задач, собранных collect_user_choices_for_playlists.
+    Информация о следующих видео запрашивается в фоне, пока скачивается текущее (см. INFO_PREFETCH_AHEAD).
     Поддержка: Windows, MacOS, Linux.
     """
-    for task in tasks:
-        entry = task["entry"]
-        entry_url = entry.get('url') or entry.get('webpage_url') or entry.get('id')
+    prefetcher = _InfoPrefetcher(tasks)
+    try:
+        _download_tasks_loop(tasks, prefetcher)
+    finally:
+        prefetcher.close()
+
+def _download_tasks_loop(tasks, prefetcher):
+    """Основной цикл download_tasks: задачи скачиваются строго по порядку."""
+    for idx, task in enumerate(tasks):
+        prefetched = prefetcher.take(idx)
+        entry_url = _task_entry_url(task)
         if not entry_url:
             print(Fore.RED + "Не удалось получить ссылку для видео. Пропуск." + Style.RESET_ALL)
             continue
 
-        entry_info = None
+        # Если info уже извлечён при сборе задач или заранее в фоне — повторно не запрашиваем
+        entry_info = task.get("info") or prefetched
+        retry = RetryPolicy()
         for attempt in range(1, MAX_RETRIES + 1):
+            if entry_info:
+                break
             try:
                 entry_info = safe_get_video_info(entry_url, task["platform"], task["cookie_file_to_use"])
                 break
@@ -3947,12 +5911,17 @@ def download_tasks(tasks):
                     "extractorerror" in err_text or
                     "unsupported site" in err_text or
                     "unsupported url" in err_text):
-                    fallback_download(entry_url)
+                    if fallback_download(entry_url):
+                        # для --sync: видео плейлиста, скачанное со страницы, тоже попадает в архив
+                        archive_record(task["platform"], task["entry"].get('id'), entry_url, task["entry"].get('title'))
                     break
                 if "network" in err_text or "timeout" in err_text or "connection" in err_text or "http error" in err_text:
                     print(Fore.RED + f"Ошибка сети при получении информации о видео (попытка {attempt}/{MAX_RETRIES}). Проверьте интернет и попробуйте снова." + Style.RESET_ALL)
-                    if attempt < MAX_RETRIES:
-                        time.sleep(5)
+                    err_class = classify_download_error(e)
+                    delay = retry.next_delay(err_class if err_class in ('throttle', 'auth') else 'transport',
+                                             retry_after_seconds(e)) if attempt < MAX_RETRIES else None
+                    if delay is not None:
+                        time.sleep(delay)
                         continue
                     else:
                         break
@@ -4015,7 +5984,8 @@ def download_tasks(tasks):
 
         downloaded_file = download_video(
             entry_url, video_id_final, audio_id_final, task["folder"], output_name, task["output_format"],
-            task["platform"], task["cookie_file_to_use"], subtitle_options=task["subtitle_options"]
+            task["platform"], task["cookie_file_to_use"], subtitle_options=task["subtitle_options"],
+            info=entry_info
         )
         if downloaded_file:
             print(Fore.GREEN + f"Видео успешно скачано: {downloaded_file}" + Style.RESET_ALL)
@@ -4210,6 +6180,47 @@ def normalize_srt_file(inp: str, overwrite: bool = True, backup: bool = False):
     write_srt(target, norm)
     print(f"Processed {inp} -> {target} ({len(norm)} blocks)")
 
+def report_startup_profile(print_table: bool = False, json_path: str | None = None):
+    """
+    Отчёт профилировщика запуска: фазы по убыванию длительности и доля каждой от общего времени.
+    «прочее» — время, не попавшее ни в одну фазу (импорт stdlib, определения функций и т.п.).
+    print_table — вывести таблицу в консоль, json_path — записать отчёт в JSON.
+    Поддержка: Windows, MacOS, Linux.
+    """
+    total = time.perf_counter() - _STARTUP_T0
+    phases = sorted(_STARTUP_PHASES, key=lambda x: x[1], reverse=True)
+    other = max(0.0, total - sum(sec for _, sec in phases))
+    rows = phases + [("прочее", other)]
+    log_debug("Профиль запуска: " + ", ".join(f"{name}={sec:.3f}s" for name, sec in rows) + f"; всего {total:.3f}s")
+
+    if print_table:
+        width = max(len(name) for name, _ in rows)
+        print(Fore.CYAN + f"\nПрофиль запуска (всего {total:.3f} с):" + Style.RESET_ALL)
+        for name, sec in rows:
+            share = (sec / total * 100) if total else 0.0
+            print(f"  {name.ljust(width)}  {sec:8.3f} с  {share:5.1f}%")
+        if _EAGER_HEAVY_IMPORTS:
+            print(Fore.YELLOW + "  Внимание: при запуске уже импортированы модули, которые должны загружаться отложенно: "
+                  + ", ".join(_EAGER_HEAVY_IMPORTS) + Style.RESET_ALL)
+        print()
+
+    if json_path:
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': system,
+            'yt_dlp': getattr(getattr(yt_dlp, 'version', None), '__version__', None),
+            'total_sec': round(total, 4),
+            'phases': [{'name': name, 'sec': round(sec, 4)} for name, sec in rows],
+            'eager_heavy_imports': _EAGER_HEAVY_IMPORTS,
+        }
+        try:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(Fore.GREEN + f"Профиль запуска записан в {json_path}" + Style.RESET_ALL)
+        except Exception as e:
+            print(Fore.RED + f"Не удалось записать профиль запуска в {json_path}: {e}" + Style.RESET_ALL)
+
 def main():
     """
     Главная функция: запускает обработку, парсинг, скачивание.
@@ -4219,11 +6230,21 @@ def main():
     global USER_SELECTED_SUB_LANGS, USER_SELECTED_SUB_FORMAT, USER_INTEGRATE_SUBS, USER_KEEP_SUB_FILES
     global USER_INTEGRATE_CHAPTERS, USER_KEEP_CHAPTER_FILE, USER_SELECTED_VIDEO_CODEC, USER_SELECTED_AUDIO_CODEC
     global USER_SELECTED_OUTPUT_FORMAT, USER_SELECTED_CHAPTER_FILENAME, USER_SELECTED_OUTPUT_NAME, USER_SELECTED_OUTPUT_PATH
+    global SYNC_MODE
 
     print(Fore.YELLOW + "Universal Video Downloader")
    
+    args = parse_args()
+    SYNC_MODE = bool(args.sync)
+    if args.check_lazy_imports:
+        sys.exit(check_lazy_imports_isolated())
+
     # Проверка наличия ffmpeg
+    t_phase = time.perf_counter()
     ffmpeg_path = detect_ffmpeg_path()
+    record_startup_phase("поиск ffmpeg", t_phase)
+    if args.profile_startup or args.profile_startup_json:
+        report_startup_profile(print_table=args.profile_startup, json_path=args.profile_startup_json)
     if not ffmpeg_path:
         print(
             "\nДля работы необходима утилита ffmpeg.\n"
@@ -4236,7 +6257,6 @@ def main():
         )
         sys.exit(1)
 
-    args = parse_args()
     auto_mode = args.auto
     raw_url = args.url
     while True:
@@ -4251,6 +6271,10 @@ def main():
         platform, url = extract_platform_and_url(raw_url)
         log_debug(f"Определена платформа: {platform}, очищенный URL: {url}")
 
+        # PO token нужен только YouTube — начинаем искать его в фоне, пока проверяются куки и метаданные
+        if platform == 'youtube':
+            start_po_token_prefetch(test_url=url)
+
         # --- Единоразовая проверка куки и ссылки с повторными попытками ---
         cookie_map = {
             "youtube":  COOKIES_YT,
@@ -4262,6 +6286,7 @@ def main():
         }
         cookie_file_to_use = None
         info = None
+        retry = RetryPolicy()
         for attempt in range(1, MAX_RETRIES + 1):
             try:
                 if platform in cookie_map:
@@ -4288,8 +6313,13 @@ def main():
                                     pass
                             else:
                                 log_debug("main: YTDLP_PO_TOKEN в окружении невалиден — попробуем автополучить новый токен.")
-                                # Попытка получить новый токен автоматически
-                                new_tok = retrieve_po_token_auto(timeout=8)
+                                # Невалидный токен убираем из окружения (и из кэша, если он там же), иначе поиск
+                                # вернул бы его же; новый токен берём из фонового поиска (запускается здесь же,
+                                # если ещё не идёт) и ждём его недолго — при SABR-ошибке get_auto_po_token дождётся сам
+                                os.environ.pop(YTDLP_PO_TOKEN_ENV, None)
+                                if PO_TOKEN_CACHE and _load_json_cache(PO_TOKEN_CACHE_FILE).get('token') == env_tok:
+                                    invalidate_cached_po_token("совпадает с невалидным токеном из окружения")
+                                new_tok = get_auto_po_token(timeout=8, test_url=test_url_for_validation)
                                 if new_tok:
                                     masked = _mask_po_token(new_tok)
                                     os.environ[YTDLP_PO_TOKEN_ENV] = new_tok
@@ -4307,14 +6337,15 @@ def main():
                                 else:
                                     log_debug("main: не удалось автополучить PO token (env был невалиден). Будем продолжать без токена.")
                         else:
-                            # Нет токена в окружении — попытка использовать ранее автоматически найденный AUTO_PO_TOKEN (deferred)
-                            if AUTO_PO_TOKEN:
-                                # Пробуем валидацию отложенного токена
+                            # Нет токена в окружении — берём результат фонового поиска, если он уже готов.
+                            # Не ждём его здесь: при SABR-ошибке get_auto_po_token() дождётся токена сам.
+                            auto_tok = get_auto_po_token(timeout=0)
+                            if auto_tok:
                                 log_debug("main: в окружении нет YTDLP_PO_TOKEN, но есть AUTO_PO_TOKEN (deferred) — валидируем.")
-                                valid = validate_po_token(AUTO_PO_TOKEN, test_url_for_validation, cookie_file=cookie_file_to_use, timeout=8)
+                                valid = validate_po_token(auto_tok, test_url_for_validation, cookie_file=cookie_file_to_use, timeout=8)
                                 if valid:
-                                    os.environ[YTDLP_PO_TOKEN_ENV] = AUTO_PO_TOKEN
-                                    masked = _mask_po_token(AUTO_PO_TOKEN)
+                                    os.environ[YTDLP_PO_TOKEN_ENV] = auto_tok
+                                    masked = _mask_po_token(auto_tok)
                                     log_debug(f"main: отложенный AUTO_PO_TOKEN валиден — установлен в os.environ -> {masked}")
                                     try:
                                         print(Fore.GREEN + f"PO token применён из отложенного результата: {masked}" + Style.RESET_ALL)
@@ -4322,32 +6353,15 @@ def main():
                                         pass
                                     if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
                                         try:
-                                            subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, AUTO_PO_TOKEN], check=False)
+                                            subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, auto_tok], check=False)
                                             log_debug("main: AUTO_PO_TOKEN сохранён в системные переменные через setx (Windows).")
                                         except Exception as e:
                                             log_debug(f"main: не удалось выполнить setx для AUTO_PO_TOKEN: {e}")
                                 else:
                                     log_debug("main: AUTO_PO_TOKEN не прошёл валидацию.")
+                                    invalidate_cached_po_token("main: AUTO_PO_TOKEN не прошёл валидацию")
                             else:
-                                # Пробуем получить автоматически (если env пустой)
-                                log_debug("main: YTDLP_PO_TOKEN не задан — пробуем автоматически получить PO token (retrieve_po_token_auto).")
-                                new_tok = retrieve_po_token_auto(timeout=8)
-                                if new_tok:
-                                    os.environ[YTDLP_PO_TOKEN_ENV] = new_tok
-                                    masked = _mask_po_token(new_tok)
-                                    log_debug(f"main: Автоматически получен PO token и установлен в os.environ -> {masked}")
-                                    try:
-                                        print(Fore.GREEN + f"Автоматически получен PO token и установлен в окружении: {masked}" + Style.RESET_ALL)
-                                    except Exception:
-                                        pass
-                                    if BGUTIL_PERSIST_TOKEN and os.name == 'nt':
-                                        try:
-                                            subprocess.run(["setx", YTDLP_PO_TOKEN_ENV, new_tok], check=False)
-                                            log_debug("main: PO token сохранён в системные переменные через setx (Windows).")
-                                        except Exception as e:
-                                            log_debug(f"main: не удалось выполнить setx для PO token: {e}")
-                                else:
-                                    log_debug("main: Автоматическое получение PO token не дало результата.")
+                                log_debug("main: YTDLP_PO_TOKEN не задан, PO token ищется в фоне — будет применён при SABR-ошибке.")
                     except Exception as e:
                         log_debug(f"main: исключение при проверке/получении PO token: {e}\n{traceback.format_exc()}")
 
@@ -4370,8 +6384,11 @@ def main():
                     break
                 if "network" in err_text or "timeout" in err_text or "connection" in err_text or "http error" in err_text:
                     print(Fore.RED + f"Ошибка сети при получении информации о видео (попытка {attempt}/{MAX_RETRIES}). Проверьте интернет и попробуйте снова." + Style.RESET_ALL)
-                    if attempt < MAX_RETRIES:
-                        time.sleep(5)
+                    err_class = classify_download_error(e)
+                    delay = retry.next_delay(err_class if err_class in ('throttle', 'auth') else 'transport',
+                                             retry_after_seconds(e)) if attempt < MAX_RETRIES else None
+                    if delay is not None:
+                        time.sleep(delay)
                         continue
                     else:
                         raw_url = None
@@ -4416,8 +6433,14 @@ def main():
         if is_youtube_playlists_url(url):
             channel_url = re.sub(r'/playlists/?$', '', url)
         print(Fore.YELLOW + "Получаем информацию по разделам канала..." + Style.RESET_ALL)
-        info_channel = safe_get_video_info(channel_url, platform, cookie_file_to_use)
-        channel_entries = info_channel.get('entries', [])
+        channel_stream = PlaylistStream(channel_url, platform, cookie_file_to_use)
+        if channel_stream.open():
+            # разделы канала приходят ссылками — видео каждого раздела получаются потоком при выводе
+            info_channel = channel_stream.info
+            channel_entries = channel_stream.materialize()
+        else:
+            info_channel = safe_get_video_info(channel_url, platform, cookie_file_to_use)
+            channel_entries = info_channel.get('entries', [])
         sections = []
         for idx, entry in enumerate(channel_entries, 1):
             title = entry.get('title') or entry.get('id') or entry.get('url') or f"Раздел {idx}"
@@ -4426,6 +6449,7 @@ def main():
         playlists_struct = []
         info_playlists = None
         section_playlists = []
+        playlist_memo = {}  # {url плейлиста: info} — полученное для меню повторно используется при обходе
 
         # --- Сперва плейлисты, если ссылка на /playlists ---
         if is_youtube_playlists_url(url):
@@ -4434,19 +6458,8 @@ def main():
             print(Fore.YELLOW + "Получаем информацию по плейлистам канала..." + Style.RESET_ALL)
             info_playlists = safe_get_video_info(playlists_url, platform, cookie_file_to_use)
             playlists_entries = info_playlists.get('entries', [])
-            # Выводим список плейлистов
-            playlist_infos = []
-            for idx, pl in enumerate(playlists_entries, 1):
-                pl_title = pl.get('title') or pl.get('id') or pl.get('url') or f"Плейлист {idx}"
-                pl_url = pl.get('url') or pl.get('webpage_url')
-                count = 0
-                if pl_url:
-                    try:
-                        pl_info = safe_get_video_info(pl_url, platform, cookie_file_to_use)
-                        count = len(pl_info.get('entries', []))
-                    except Exception:
-                        count = 0
-                playlist_infos.append((idx, pl_title, count))
+            # Выводим список плейлистов (число видео — из плоского списка или параллельными запросами)
+            playlist_infos = list_playlists_with_counts(playlists_entries, platform, cookie_file_to_use, playlist_memo)
             print(Fore.MAGENTA + "\nПлейлисты канала:" + Style.RESET_ALL)
             for idx, pl_title, count in playlist_infos:
                 print(f"{idx}: {pl_title} ({count} видео)")
@@ -4456,7 +6469,8 @@ def main():
             else:
                 selected_pl_indexes = parse_selection(sel_pl, len(playlists_entries))
                 selected_playlists = [pl for idx, pl in enumerate(playlists_entries, 1) if idx in selected_pl_indexes]
-            playlists_struct = collect_playlists(selected_playlists, platform, info_playlists.get('__cookiefile__'))
+            playlists_struct = collect_playlists(selected_playlists, platform, info_playlists.get('__cookiefile__'),
+                                                 memo=playlist_memo)
 
             # После выбора плейлистов спрашиваем про разделы
             answer = input(Fore.CYAN + "\nХотите также скачать видео из других разделов канала (Видео, Shorts и т.д.), которые не входят в плейлисты? (1 — да, 0 — нет, Enter = 0): " + Style.RESET_ALL).strip()
@@ -4464,8 +6478,7 @@ def main():
             if want_sections:
                 print(Fore.MAGENTA + "\nРазделы канала:" + Style.RESET_ALL)
                 for idx, title, entry in sections:
-                    count = len(entry.get('entries', [])) if entry.get('entries') else 0
-                    print(f"{idx}: {title} ({count} видео)")
+                    print(f"{idx}: {title}{section_count_label(entry)}")
                 sel = input(Fore.CYAN + "Введите номера разделов для скачивания (через запятую, Enter — все): " + Style.RESET_ALL).strip()
                 if not sel:
                     selected_sections = [entry for _, _, entry in sections]
@@ -4474,10 +6487,9 @@ def main():
                     selected_sections = [entry for idx, _, entry in sections if idx in selected_indexes]
                 for idx, section in enumerate(selected_sections, 1):
                     title = section.get('title') or section.get('id') or section.get('url') or f"Раздел {idx}"
-                    section_entries = section.get('entries', [])
                     section_playlists.append({
                         "title": title,
-                        "videos": section_entries,
+                        "videos": section_videos(section, title, platform, info_channel.get('__cookiefile__')),
                         "sub_playlists": []
                     })
         else:
@@ -4485,8 +6497,7 @@ def main():
             print(Fore.YELLOW + "\nОбнаружена ссылка на канал YouTube." + Style.RESET_ALL)
             print(Fore.MAGENTA + "\nРазделы канала:" + Style.RESET_ALL)
             for idx, title, entry in sections:
-                count = len(entry.get('entries', [])) if entry.get('entries') else 0
-                print(f"{idx}: {title} ({count} видео)")
+                print(f"{idx}: {title}{section_count_label(entry)}")
             sel = input(Fore.CYAN + "Введите номера разделов для скачивания (через запятую, Enter — все): " + Style.RESET_ALL).strip()
             if not sel:
                 selected_sections = [entry for _, _, entry in sections]
@@ -4495,10 +6506,9 @@ def main():
                 selected_sections = [entry for idx, _, entry in sections if idx in selected_indexes]
             for idx, section in enumerate(selected_sections, 1):
                 title = section.get('title') or section.get('id') or section.get('url') or f"Раздел {idx}"
-                section_entries = section.get('entries', [])
                 section_playlists.append({
                     "title": title,
-                    "videos": section_entries,
+                    "videos": section_videos(section, title, platform, info_channel.get('__cookiefile__')),
                     "sub_playlists": []
                 })
             # После выбора разделов спрашиваем про плейлисты
@@ -4509,18 +6519,7 @@ def main():
                 print(Fore.YELLOW + "Получаем информацию по плейлистам канала..." + Style.RESET_ALL)
                 info_playlists = safe_get_video_info(playlists_url, platform, cookie_file_to_use)
                 playlists_entries = info_playlists.get('entries', [])
-                playlist_infos = []
-                for idx, pl in enumerate(playlists_entries, 1):
-                    pl_title = pl.get('title') or pl.get('id') or pl.get('url') or f"Плейлист {idx}"
-                    pl_url = pl.get('url') or pl.get('webpage_url')
-                    count = 0
-                    if pl_url:
-                        try:
-                            pl_info = safe_get_video_info(pl_url, platform, cookie_file_to_use)
-                            count = len(pl_info.get('entries', []))
-                        except Exception:
-                            count = 0
-                    playlist_infos.append((idx, pl_title, count))
+                playlist_infos = list_playlists_with_counts(playlists_entries, platform, cookie_file_to_use, playlist_memo)
                 print(Fore.MAGENTA + "\nПлейлисты канала:" + Style.RESET_ALL)
                 for idx, pl_title, count in playlist_infos:
                     print(f"{idx}: {pl_title} ({count} видео)")
@@ -4530,7 +6529,8 @@ def main():
                 else:
                     selected_pl_indexes = parse_selection(sel_pl, len(playlists_entries))
                     selected_playlists = [pl for idx, pl in enumerate(playlists_entries, 1) if idx in selected_pl_indexes]
-                playlists_struct = collect_playlists(selected_playlists, platform, info_playlists.get('__cookiefile__'))
+                playlists_struct = collect_playlists(selected_playlists, platform, info_playlists.get('__cookiefile__'),
+                                                 memo=playlist_memo)
 
         # Собираем задачи
         all_tasks = []
@@ -4551,68 +6551,91 @@ def main():
             print(Fore.YELLOW + "Нет выбранных видео для скачивания." + Style.RESET_ALL)
         return
 
-    info = safe_get_video_info(url, platform, cookie_file_to_use)
+    # Плейлист YouTube открывается без обработки: список выводится, пока yt-dlp получает следующие страницы
+    playlist_stream = None
+    if platform == "youtube" and is_youtube_flat_playlist_url(url):
+        playlist_stream = PlaylistStream(url, platform, cookie_file_to_use)
+        if not playlist_stream.open():
+            playlist_stream = None
+    info = playlist_stream.info if playlist_stream else safe_get_video_info(url, platform, cookie_file_to_use)
     cookie_file_to_use = info.get('__cookiefile__')
 
     # --- Обработка плейлиста ---
     if info.get('_type') == 'playlist' or 'entries' in info:
         entries = info.get('entries', [])
         log_debug(f"main: entries (type={type(entries)}, len={len(entries) if hasattr(entries, '__len__') else 'N/A'}): {str(entries)[:500]}")
-        # --- Строим структуру плейлистов ---
-        print(Fore.YELLOW + "\nАнализируем структуру канала/плейлиста, ищем вложенные плейлисты..." + Style.RESET_ALL)
-        playlists_struct = collect_playlists(info.get('entries', []), platform, cookie_file_to_use)
-        log_debug(f"main: playlists_struct (type={type(playlists_struct)}, len={len(playlists_struct) if hasattr(playlists_struct, '__len__') else 'N/A'}): {str(playlists_struct)[:500]}")
-
-        if playlists_struct and all(
-            pl.get("videos") == [] and pl.get("sub_playlists") == [] and pl.get("url")
-            for pl in playlists_struct
-        ):
-            log_debug("main: Ветка — только плейлисты верхнего уровня (страница /playlists)")
-            print(Fore.YELLOW + "\nОбнаружены плейлисты канала! Будет произведён обход по каждому из них." + Style.RESET_ALL)
-            output_path = select_output_folder(auto_mode=False)
-            USER_SELECTED_OUTPUT_PATH = output_path
-            print(Fore.YELLOW + "\nНайдены плейлисты:" + Style.RESET_ALL)
-            print_playlists_tree(playlists_struct)
-            tasks = collect_user_choices_for_playlists(playlists_struct, output_path, auto_mode, platform, args, cookie_file_to_use, selected_video_ids={})
-            print(Fore.YELLOW + "\nВсе параметры выбраны. Начинается скачивание всех выбранных видео..." + Style.RESET_ALL)
-            download_tasks(tasks)
-            print(Fore.CYAN + "\nВсе выбранные видео из всех плейлистов обработаны." + Style.RESET_ALL)
-            return
-
-        if not has_nested_playlists(playlists_struct) and len(playlists_struct) == 1:
-            log_debug("main: Ветка — один плейлист, без вложенных")
-            pl = playlists_struct[0]
-            # Обычный режим, когда videos — это видео
-            all_videos = []
-            for pl in playlists_struct:
-                all_videos.extend(pl["videos"])
-            log_debug(f"main: all_videos (len={len(all_videos)}): {str(all_videos)[:500]}")
-            print(Fore.YELLOW + f"\nВсего найдено видео: {len(all_videos)}" + Style.RESET_ALL)
-            if not all_videos:
-                print(Fore.RED + "В канале не найдено ни одного видео." + Style.RESET_ALL)
-                return
+        early_selection = [None]  # номера видео, введённые прямо во время вывода списка
+        if playlist_stream is not None:
+            log_debug("main: Ветка — плейлист YouTube, список получается потоком")
             playlist_title = info.get('title') or "playlist"
-            saved_list_path = print_playlist_paginated(all_videos, page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=playlist_title)
+            stream = archive_prune_entries(playlist_stream, platform, info.get('title'))
+            saved_list_path = print_playlist_paginated(stream, page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=playlist_title,
+                                                       selection=early_selection)
+            entries = stream.materialize()
+            print(Fore.YELLOW + f"\nВсего найдено видео: {len(entries)}" + Style.RESET_ALL)
+            if not entries:
+                print(Fore.RED + "В плейлисте не найдено ни одного видео." + Style.RESET_ALL)
+                return
         else:
-            # Есть вложенные плейлисты
-            log_debug("main: Ветка — есть вложенные плейлисты")
-            log_debug(f"main: playlists_struct (подробно): {str(playlists_struct)[:1000]}")
-            print(Fore.YELLOW + "\nОбнаружены вложенные плейлисты! Будет произведён обход по каждому из них." + Style.RESET_ALL)
-            output_path = select_output_folder(auto_mode=False)
-            USER_SELECTED_OUTPUT_PATH = output_path
-
-            # Выводим список всех плейлистов с количеством видео
-            print(Fore.YELLOW + "\nНайдены вложенные плейлисты:" + Style.RESET_ALL)
-
-            print_playlists_tree(playlists_struct)
+            # --- Строим структуру плейлистов ---
+            print(Fore.YELLOW + "\nАнализируем структуру канала/плейлиста, ищем вложенные плейлисты..." + Style.RESET_ALL)
+            playlists_struct = collect_playlists(info.get('entries', []), platform, cookie_file_to_use)
+            log_debug(f"main: playlists_struct (type={type(playlists_struct)}, len={len(playlists_struct) if hasattr(playlists_struct, '__len__') else 'N/A'}): {str(playlists_struct)[:500]}")
+
+            if playlists_struct and all(
+                pl.get("videos") == [] and pl.get("sub_playlists") == [] and pl.get("url")
+                for pl in playlists_struct
+            ):
+                log_debug("main: Ветка — только плейлисты верхнего уровня (страница /playlists)")
+                print(Fore.YELLOW + "\nОбнаружены плейлисты канала! Будет произведён обход по каждому из них." + Style.RESET_ALL)
+                output_path = select_output_folder(auto_mode=False)
+                USER_SELECTED_OUTPUT_PATH = output_path
+                print(Fore.YELLOW + "\nНайдены плейлисты:" + Style.RESET_ALL)
+                print_playlists_tree(playlists_struct)
+                tasks = collect_user_choices_for_playlists(playlists_struct, output_path, auto_mode, platform, args, cookie_file_to_use, selected_video_ids={})
+                print(Fore.YELLOW + "\nВсе параметры выбраны. Начинается скачивание всех выбранных видео..." + Style.RESET_ALL)
+                download_tasks(tasks)
+                print(Fore.CYAN + "\nВсе выбранные видео из всех плейлистов обработаны." + Style.RESET_ALL)
+                return
 
-            # process_playlists(playlists_struct, output_path, auto_mode, platform, args, cookie_file_to_use)
-            # --- Сначала собираем все задачи, потом скачиваем ---
-            tasks = collect_user_choices_for_playlists(playlists_struct, output_path, auto_mode, platform, args, cookie_file_to_use, selected_video_ids={})
-            print(Fore.YELLOW + "\nВсе параметры выбраны. Начинается скачивание всех выбранных видео..." + Style.RESET_ALL)
-            download_tasks(tasks)
-            print(Fore.CYAN + "\nВсе выбранные видео из всех плейлистов обработаны." + Style.RESET_ALL)
-            return
+            if not has_nested_playlists(playlists_struct) and len(playlists_struct) == 1:
+                log_debug("main: Ветка — один плейлист, без вложенных")
+                pl = playlists_struct[0]
+                # Обычный режим, когда videos — это видео
+                all_videos = []
+                for pl in playlists_struct:
+                    all_videos.extend(pl["videos"])
+                if SYNC_MODE:
+                    # дальше номера выбора относятся к entries — оставляем в нём только новые видео
+                    entries = all_videos = archive_prune_entries(all_videos, platform, info.get('title'))
+                log_debug(f"main: all_videos (len={len(all_videos)}): {str(all_videos)[:500]}")
+                print(Fore.YELLOW + f"\nВсего найдено видео: {len(all_videos)}" + Style.RESET_ALL)
+                if not all_videos:
+                    print(Fore.RED + "В канале не найдено ни одного видео." + Style.RESET_ALL)
+                    return
+                playlist_title = info.get('title') or "playlist"
+                saved_list_path = print_playlist_paginated(all_videos, page_size=PAGE_SIZE, timeout=PAGE_TIMEOUT, playlist_title=playlist_title,
+                                                           selection=early_selection)
+            else:
+                # Есть вложенные плейлисты
+                log_debug("main: Ветка — есть вложенные плейлисты")
+                log_debug(f"main: playlists_struct (подробно): {str(playlists_struct)[:1000]}")
+                print(Fore.YELLOW + "\nОбнаружены вложенные плейлисты! Будет произведён обход по каждому из них." + Style.RESET_ALL)
+                output_path = select_output_folder(auto_mode=False)
+                USER_SELECTED_OUTPUT_PATH = output_path
+
+                # Выводим список всех плейлистов с количеством видео
+                print(Fore.YELLOW + "\nНайдены вложенные плейлисты:" + Style.RESET_ALL)
+
+                print_playlists_tree(playlists_struct)
+
+                # process_playlists(playlists_struct, output_path, auto_mode, platform, args, cookie_file_to_use)
+                # --- Сначала собираем все задачи, потом скачиваем ---
+                tasks = collect_user_choices_for_playlists(playlists_struct, output_path, auto_mode, platform, args, cookie_file_to_use, selected_video_ids={})
+                print(Fore.YELLOW + "\nВсе параметры выбраны. Начинается скачивание всех выбранных видео..." + Style.RESET_ALL)
+                download_tasks(tasks)
+                print(Fore.CYAN + "\nВсе выбранные видео из всех плейлистов обработаны." + Style.RESET_ALL)
+                return
         # --- Спрашиваем про добавление индекса к имени файла ---
         add_index_prefix = True
         answer = input(Fore.CYAN + "\nДобавлять номер видео в начале имени файла? (1 — да, 0 — нет, Enter = 1): " + Style.RESET_ALL).strip()
@@ -4620,8 +6643,11 @@ def main():
             add_index_prefix = False
         log_debug(f"add_index_prefix = {add_index_prefix}")
 
-        print(Fore.CYAN + "\nВведите номера видео для скачивания (через запятую, пробелы, диапазоны через тире).\nEnter или 0 — скачать все:" + Style.RESET_ALL)
-        sel = input(Fore.CYAN + "Ваш выбор: " + Style.RESET_ALL)
+        if early_selection[0]:
+            sel = early_selection[0]
+        else:
+            print(Fore.CYAN + "\nВведите номера видео для скачивания (через запятую, пробелы, диапазоны через тире).\nEnter или 0 — скачать все:" + Style.RESET_ALL)
+            sel = input(Fore.CYAN + "Ваш выбор: " + Style.RESET_ALL)
         selected_indexes = parse_selection(sel, len(entries))
         selected_indexes = sorted(selected_indexes)  # всегда список, чтобы можно было обращаться по индексу
         if not selected_indexes:
@@ -4755,7 +6781,7 @@ def main():
             log_debug(f"subtitle_options переданы: {subtitle_download_options}")
             downloaded_file = download_video(
                 entry_url, video_id, audio_id, output_path, output_name, output_format,
-                platform, cookie_file_to_use, subtitle_options=subtitle_download_options
+                platform, cookie_file_to_use, subtitle_options=subtitle_download_options, info=entry_info
             )
             if downloaded_file:
                 print(Fore.GREEN + f"Видео {first_idx} успешно скачано: {downloaded_file}" + Style.RESET_ALL)
@@ -4811,7 +6837,7 @@ def main():
                     log_debug(f"subtitle_options переданы: {subtitle_download_options}")
                     downloaded_file = download_video(
                         entry_url, video_id_auto, audio_id_auto, output_path, output_name, output_format,
-                        platform, cookie_file_to_use, subtitle_options=subtitle_download_options
+                        platform, cookie_file_to_use, subtitle_options=subtitle_download_options, info=entry_info
                     )
                     if downloaded_file:
                         print(Fore.GREEN + f"Видео {idx} успешно скачано: {downloaded_file}" + Style.RESET_ALL)
@@ -4981,7 +7007,7 @@ def main():
                     log_debug(f"subtitle_options переданы: {subtitle_download_options}")
                     downloaded_file = download_video(
                         entry_url, video_id, audio_id, output_path, output_name, output_format,
-                        platform, cookie_file_to_use, subtitle_options=subtitle_download_options
+                        platform, cookie_file_to_use, subtitle_options=subtitle_download_options, info=entry_info
                     )
                     if downloaded_file:
                         print(Fore.GREEN + f"Видео {idx} успешно скачано: {downloaded_file}" + Style.RESET_ALL)
@@ -5135,7 +7161,8 @@ def main():
             output_path, output_name,
             output_format, platform,
             cookie_file_to_use,
-            subtitle_download_options
+            subtitle_download_options,
+            info=info
         )
         if downloaded_file:
             print(Fore.GREEN + f"\nВидео успешно скачано: {downloaded_file}" + Style.RESET_ALL)